@@ -19,7 +19,7 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 logger = logging.getLogger(__name__)
 
 try:
-    from llm_client import create_client, get_config, analyze_image
+    from llm_client import create_client, get_config, analyze_image, get_cache_stats
 except ImportError as e:
     logger.error(f"Missing required dependencies: {e}")
     logger.error("Please install: pip install openai")
@@ -145,6 +145,9 @@ def process_folder_to_json(folder_path: str, output_folder: str = "output") -> L
             saved_files.append(str(output_file_path))
     
     logger.info(f"Processing complete! Saved {len(saved_files)} files to {output_folder}")
+    cache_stats = get_cache_stats()
+    if cache_stats:
+        logger.info(f"LLM cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
     return saved_files
 
 
@@ -4,9 +4,9 @@ Simple conformity checker script that uses LLM to check requirements against rap
 This script reads the rapport.md file and uses the LLM client to check conformity.
 """
 
-import os
 import sys
 from pathlib import Path
+from typing import List
 
 # Add the project root to the path to import the LLM client
 # Get the absolute path to the project root (two levels up from this file)
@@ -14,28 +14,11 @@ script_dir = Path(__file__).resolve().parent
 project_root = str(script_dir.parent.parent)
 sys.path.insert(0, project_root)
 
-from client.llm_client import create_client, simple_query, get_config
-
-
-def read_rapport_data(rapport_path: str) -> str:
-    """
-    Read the rapport.md file content.
-    
-    Args:
-        rapport_path (str): Path to the rapport.md file
-        
-    Returns:
-        str: Content of the rapport file
-    """
-    try:
-        with open(rapport_path, 'r', encoding='utf-8') as file:
-            return file.read()
-    except FileNotFoundError:
-        print(f"Error: Rapport file not found at {rapport_path}")
-        return ""
-    except Exception as e:
-        print(f"Error reading rapport file: {e}")
-        return ""
+from client.llm_client import get_shared_client, simple_query, get_config
+from retrieval import ReportRetriever
+from agents.tt_exigence_1_page.requirement_checker import (
+    ConformityRunner, fit_rapport_content, load_retriever, load_rapport_content
+)
 
 
 def create_conformity_prompt(rapport_content: str, requirement_text: str) -> str:
@@ -83,6 +66,7 @@ EXTRACTION GUIDELINES:
 - Include units in the Value field when they appear with the number
 - Mark as "TRUE" when  unit and SASB Unit of Measurement are equal
 - Mark as "FALSE" when data is partial or missing key elements
+- When the rapport data is split into sections labelled [Page N | file], use N for the Page column
 
 OUTPUT FORMAT:
 Start your response with the CSV header row, then provide the extracted data rows. If no relevant data is found, output only the header row.
@@ -101,29 +85,27 @@ Focus on:
     return prompt
 
 
-def check_conformity(requirement_text: str, rapport_path: str = None) -> str:
+def check_conformity(requirement_text: str, rapport_path: str = None,
+                     retriever: ReportRetriever = None, top_k: int = 8) -> str:
     """
     Check conformity of a requirement against the rapport data using LLM.
     
     Args:
         requirement_text (str): The requirement text to check
         rapport_path (str, optional): Path to rapport.md file. Defaults to data-parsed/manuel/rapport.md
+        retriever (ReportRetriever, optional): When given, only the top_k report chunks
+            relevant to the requirement are sent, each labelled with its page
+        top_k (int): Number of report chunks to send when using a retriever
         
     Returns:
         str: LLM response with conformity analysis
     """
-    # Set default rapport path if not provided
-    if rapport_path is None:
-        script_dir = Path(__file__).resolve().parent
-        project_root = script_dir.parent.parent
-        rapport_path = str(project_root / "data-parsed" / "manuel" / "rapport.md")
-    
-    # Read rapport data
-    print(f"Reading rapport data from: {rapport_path}")
-    rapport_content = read_rapport_data(rapport_path)
-    
+    rapport_content = load_rapport_content(requirement_text, rapport_path, retriever, top_k)
     if not rapport_content:
         return "Error: Could not read rapport data"
+    # Budget against this script's own prompt, which differs from the requirement checker's
+    rapport_content = fit_rapport_content(rapport_content, 2000,
+                                          create_conformity_prompt("", requirement_text), reserve=0)
     
     # Get LLM configuration
     config = get_config()
@@ -132,9 +114,9 @@ def check_conformity(requirement_text: str, rapport_path: str = None) -> str:
     print(f"Connecting to LLM at: {config['endpoint_url']}")
     print(f"Using model: {config['model_name']}")
     
-    client = create_client(
+    # Reuse the pooled client so each requirement does not open new connections
+    client = get_shared_client(
         endpoint_url=config['endpoint_url'],
-        model_name=config['model_name'],
         api_key=config['api_key']
     )
     
@@ -154,32 +136,63 @@ def check_conformity(requirement_text: str, rapport_path: str = None) -> str:
     return response
 
 
+def check_conformity_batch(requirement_texts: List[str], rapport_path: str = None,
+                           retriever: ReportRetriever = None, batch_size: int = 4,
+                           max_workers: int = 1) -> List[str]:
+    """
+    Check several requirements with this checker's prompt, sending requirements that
+    share a topic (or report chunks when a retriever is given) in the same prompt.
+    
+    Args:
+        requirement_texts (List[str]): Requirement texts ("TOPIC: ... CODE: ...")
+        rapport_path (str, optional): Path to rapport.md file. Defaults to data-parsed/manuel/rapport.md
+        retriever (ReportRetriever, optional): Send only the relevant report chunks
+        batch_size (int): Maximum requirements per LLM call
+        max_workers (int): Number of LLM calls in parallel
+        
+    Returns:
+        List[str]: CSV result per requirement, in input order
+    """
+    runner = ConformityRunner(rapport_path=rapport_path, retriever=retriever,
+                              prompt_factory=create_conformity_prompt)
+    return runner.check_many(requirement_texts, max_workers=max_workers, batch_size=batch_size)
+
+
 def main():
     """
     Main function to run the conformity checker.
     """
     print("=== ESG Rapport Conformity Checker ===\n")
     
-    # Example requirement text (you can modify this)
-    requirement_text = """
+    # Example requirement texts (you can modify these)
+    requirement_texts = [
+        """
     TOPIC: Financed Emissions
     METRIC: Absolute gross financed emissions, disaggregated by (1) Scope 1, (2) Scope 2, and (3) Scope 3
     CATEGORY: Quantitative
     UNIT OF MEASURE: Metric tonnes (t) CO2-e     
     CODE: FN-IN-410c.1
+    """,
+        """
+    TOPIC: Financed Emissions
+    METRIC: Percentage of gross exposure included in the financed emissions calculation
+    CATEGORY: Quantitative
+    UNIT OF MEASURE: Percentage (%)
+    CODE: FN-IN-410c.3
     """
+    ]
     
-    print("REQUIREMENT TO CHECK:")
-    print(requirement_text)
-    print("\n" + "="*50 + "\n")
-    
-    # Check conformity
-    result = check_conformity(requirement_text)
+    # Check conformity in one batched prompt (retrieval is used when RAPPORT_PARSED_DIR is set)
+    results = check_conformity_batch(requirement_texts, retriever=load_retriever())
     
-    print("EXTRACTED DATA IN CSV FORMAT:")
-    print("="*50)
-    print(result)
-    print("\n" + "="*50)
+    for requirement_text, result in zip(requirement_texts, results):
+        print("REQUIREMENT TO CHECK:")
+        print(requirement_text)
+        print("\n" + "="*50 + "\n")
+        print("EXTRACTED DATA IN CSV FORMAT:")
+        print("="*50)
+        print(result)
+        print("\n" + "="*50)
     print("Note: The output above should be in CSV format with columns:")
     print("CID,Industry,Topic,Metric,Code,Page,Heading or Fragment,Value,Unit,SASB Unit of Measurement,Complete")
 
@@ -18,6 +18,7 @@ Usage: python pdf_to_markdown_parser.py
 
 import os
 import sys
+import time
 import logging
 from pathlib import Path
 import fitz  # PyMuPDF
@@ -26,34 +27,37 @@ from datetime import datetime
 # Add the parent directory to the path to import client modules
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
-from client.llm_client import create_client, simple_query, get_config, analyze_image, create_image_message, multimodal_chat_completion
+from client.llm_client import create_client, simple_query, get_config, analyze_image, analyze_image_data, create_image_message, multimodal_chat_completion, get_cache_stats
+from client.telemetry import track, write_report, get_summary, start_metrics_server_from_env
+from pdf_image import PDFDocumentSession, ConversionManifest
 from agents.where_is_tables.table_detector import detect_tables_in_pdf
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Page images for the vision model: resolution fitted to the page, margins cropped,
+# pages too dense for one image split into strips
+PAGE_IMAGE_OPTIONS = {'tile': True, 'max_tiles': 3}
 
-def extract_page_as_image(pdf_path: Path, page_num: int) -> str:
+
+def extract_page_as_image(pdf_path: Path, page_num: int, session: PDFDocumentSession = None) -> str:
     """
     Extract a specific page from PDF as image and save to temporary file for LLM processing.
     
     Args:
         pdf_path (Path): Path to the PDF file
         page_num (int): Page number (1-indexed)
+        session (PDFDocumentSession, optional): Open session to render from instead of reopening the PDF
         
     Returns:
         str: Path to the saved image file, or None if error
     """
     try:
-        pdf_document = fitz.open(pdf_path)
-        page = pdf_document[page_num - 1]  # Convert to 0-indexed
-        
         # Render page as image
-        pix = page.get_pixmap()
-        img_data = pix.tobytes("png")
-        
-        pdf_document.close()
+        img_data = render_page_to_bytes(pdf_path, page_num, session)
+        if img_data is None:
+            return None
         
         # Create temporary image file
         temp_dir = Path("temp_images")
@@ -76,7 +80,56 @@ def extract_page_as_image(pdf_path: Path, page_num: int) -> str:
         return None
 
 
-def parse_page_with_llm(llm_client, model_name: str, pdf_path: Path, page_num: int, img_path: str) -> str:
+def render_page_to_bytes(pdf_path: Path, page_num: int, session: PDFDocumentSession = None) -> bytes:
+    """
+    Render a specific PDF page to PNG bytes in memory, without a temporary file.
+    
+    Args:
+        pdf_path (Path): Path to the PDF file
+        page_num (int): Page number (1-indexed)
+        session (PDFDocumentSession, optional): Open session to render from instead of reopening the PDF
+        
+    Returns:
+        bytes: PNG image data, or None if error
+    """
+    try:
+        if session is None:
+            with PDFDocumentSession(pdf_path, cache_images=False) as own_session:
+                return own_session.get_page_image(page_num)
+        return session.get_page_image(page_num)
+        
+    except Exception as e:
+        logger.error(f"Error rendering page {page_num} in memory: {e}")
+        return None
+
+
+def prepare_page_for_llm(pdf_path: Path, page_num: int, session: PDFDocumentSession = None) -> list:
+    """
+    Render a page for the vision model, at a resolution fitted to its smallest font and text density.
+    
+    Args:
+        pdf_path (Path): Path to the PDF file
+        page_num (int): Page number (1-indexed)
+        session (PDFDocumentSession, optional): Open session to render from instead of reopening the PDF
+        
+    Returns:
+        list: Images of the page (PNG or JPEG, several for tiled pages, top to bottom), or None if error
+    """
+    try:
+        if session is None:
+            with PDFDocumentSession(pdf_path, cache_images=False) as own_session:
+                return prepare_page_for_llm(pdf_path, page_num, own_session)
+        images = session.get_page_images(page_num, **PAGE_IMAGE_OPTIONS)
+        logger.info(f"Page {page_num}: {len(images)} image(s) at {images[0].dpi} DPI, "
+                    f"~{sum(image.vision_tokens for image in images)} vision tokens")
+        return images
+        
+    except Exception as e:
+        logger.error(f"Error preparing page {page_num} images: {e}")
+        return None
+
+
+def parse_page_with_llm(llm_client, model_name: str, pdf_path: Path, page_num: int, img_path: str, img_data=None, on_delta=None) -> str:
     """
     Parse a PDF page using LLM with image analysis.
     
@@ -86,6 +139,8 @@ def parse_page_with_llm(llm_client, model_name: str, pdf_path: Path, page_num: i
         pdf_path (Path): Path to the PDF file
         page_num (int): Page number
         img_path (str): Path to the image file of the page
+        img_data (optional): In-memory image(s) of the page (bytes or prepare_page_for_llm images), used instead of img_path
+        on_delta (callable, optional): Called with each chunk of markdown as it is streamed
         
     Returns:
         str: Markdown content of the page
@@ -105,8 +160,27 @@ This page contains ONLY a table. Please:
 
 Focus on table accuracy and structure. Return only the markdown table content without any additional commentary or headers."""
 
+        # Tiled pages arrive as several images
+        if isinstance(img_data, list) and len(img_data) > 1:
+            prompt += f"""
+
+The page is split into {len(img_data)} horizontal strips given from top to bottom, with a small overlap.
+Treat them as one page: continue tables across strips and do not repeat overlapping lines."""
+        
         # Use the new image analysis function
-        if img_path and os.path.exists(img_path):
+        if img_data:
+            logger.info(f"Using in-memory image analysis for page {page_num}")
+            response = analyze_image_data(
+                llm_client,
+                model_name,
+                img_data,
+                prompt,
+                temperature=0.1,
+                max_tokens=4000,
+                on_delta=on_delta
+            )
+            return response
+        elif img_path and os.path.exists(img_path):
             logger.info(f"Using image analysis for page {page_num}")
             response = analyze_image(
                 llm_client, 
@@ -114,7 +188,8 @@ Focus on table accuracy and structure. Return only the markdown table content wi
                 img_path, 
                 prompt,
                 temperature=0.1, 
-                max_tokens=4000
+                max_tokens=4000,
+                on_delta=on_delta
             )
             return response
         else:
@@ -125,6 +200,14 @@ Focus on table accuracy and structure. Return only the markdown table content wi
         logger.error(f"Error parsing page {page_num} with LLM: {e}")
 
 
+def markdown_page_path(pdf_name: str, page_num: int, output_dir: Path) -> Path:
+    """
+    Get the markdown file path of a page: <pdf_name>_page_XXX.md in output_dir.
+    """
+    safe_pdf_name = pdf_name.replace('.pdf', '').replace(' ', '_')
+    return output_dir / f"{safe_pdf_name}_page_{page_num:03d}.md"
+
+
 def save_markdown_page(content: str, pdf_name: str, page_num: int, output_dir: Path) -> Path:
     """
     Save markdown content to a file.
@@ -138,14 +221,12 @@ def save_markdown_page(content: str, pdf_name: str, page_num: int, output_dir: P
     Returns:
         Path: Path to the saved file
     """
-    # Create filename: pdf_name_page_XX.md
-    safe_pdf_name = pdf_name.replace('.pdf', '').replace(' ', '_')
-    filename = f"{safe_pdf_name}_page_{page_num:03d}.md"
-    file_path = output_dir / filename
+    file_path = markdown_page_path(pdf_name, page_num, output_dir)
     
     try:
-        with open(file_path, 'w', encoding='utf-8') as f:
+        with track('file_write', kind='markdown') as span, open(file_path, 'w', encoding='utf-8') as f:
             f.write(content)
+            span['payload_bytes'] = len(content.encode('utf-8'))
         logger.info(f"Saved markdown: {file_path}")
         return file_path
     except Exception as e:
@@ -153,7 +234,7 @@ def save_markdown_page(content: str, pdf_name: str, page_num: int, output_dir: P
         return None
 
 
-def process_pdf_to_markdown(pdf_path: Path, llm_client, model_name: str, output_dir: Path) -> list:
+def process_pdf_to_markdown(pdf_path: Path, llm_client, model_name: str, output_dir: Path, in_memory: bool = True, session: PDFDocumentSession = None, resume: bool = True, stream: bool = True) -> list:
     """
     Process a PDF file: detect tables, parse ONLY pages with tables, and save as markdown.
     
@@ -162,15 +243,51 @@ def process_pdf_to_markdown(pdf_path: Path, llm_client, model_name: str, output_
         llm_client: LLM client instance
         model_name (str): Name of the model to use
         output_dir (Path): Directory to save markdown files
+        in_memory (bool): Render and encode pages in memory instead of via temp_images/
+        session (PDFDocumentSession, optional): Open session for the PDF; one is opened for the whole job if omitted
+        resume (bool): Skip pages already parsed for the same PDF content and model, per the PDF's manifest
+        stream (bool): Stream each page's markdown into a <page>.md.partial file while it is generated
         
     Returns:
         list: List of saved markdown file paths
     """
+    if session is None:
+        with PDFDocumentSession(pdf_path, cache_images=False) as own_session:
+            return process_pdf_to_markdown(pdf_path, llm_client, model_name, output_dir, in_memory, own_session, resume, stream)
+    
     logger.info(f"Processing PDF: {pdf_path.name}")
     
-    # Step 1: Detect pages with tables
+    # Manifest of pages already parsed, so reruns and crashed runs pick up where they stopped
+    manifest = None
+    if resume:
+        safe_pdf_name = pdf_path.stem.replace(' ', '_')
+        manifest = ConversionManifest(
+            output_dir / f"{safe_pdf_name}.manifest.json",
+            pdf_path,
+            {'parser': 'table_pages', 'model': model_name}
+        )
+        manifest.set_page_count(session.page_count)
+    
+    # Step 1: Detect pages with tables, among the pages the manifest has not settled yet
     logger.info("Step 1: Detecting pages with tables...")
-    pages_with_tables = detect_tables_in_pdf(pdf_path, llm_client, model_name)
+    all_pages = range(1, session.page_count + 1)
+    finished_pages = [page_num for page_num in all_pages if manifest and manifest.is_done(page_num)]
+    undecided_pages = [page_num for page_num in all_pages
+                       if page_num not in finished_pages and not (manifest and manifest.is_skipped(page_num))]
+    
+    decisions = {}
+    detected_pages = []
+    if undecided_pages:
+        detected_pages = detect_tables_in_pdf(pdf_path, llm_client, model_name, session,
+                                              page_numbers=undecided_pages, decisions=decisions)
+    if manifest:
+        logger.info(f"{len(finished_pages)} pages already parsed, detected tables on "
+                    f"{len(undecided_pages)} remaining pages")
+        for page_num, has_table in decisions.items():
+            if not has_table:
+                manifest.mark_skipped(page_num, "no table", save=False)
+        manifest.save()
+    pages_with_tables = sorted(finished_pages + detected_pages)
     
     if not pages_with_tables:
         logger.info(f"No tables found in {pdf_path.name} - skipping PDF")
@@ -180,22 +297,53 @@ def process_pdf_to_markdown(pdf_path: Path, llm_client, model_name: str, output_
     
     # Step 2: Process ONLY pages with tables
     logger.info("Step 2: Parsing ONLY pages with tables using LLM...")
+    
     saved_files = []
     
     for page_num in pages_with_tables:
         logger.info(f"Processing page {page_num} (has tables)...")
         
+        if manifest and manifest.is_done(page_num):
+            logger.info(f"Page {page_num} already parsed, skipping")
+            saved_files.append(manifest.get_output(page_num))
+            continue
+        
+        start_time = time.perf_counter()
+        
         # Extract page as image for LLM processing
-        img_path = extract_page_as_image(pdf_path, page_num)
+        if in_memory:
+            img_path = None
+            img_data = prepare_page_for_llm(pdf_path, page_num, session)
+        else:
+            img_path = extract_page_as_image(pdf_path, page_num, session)
+            img_data = None
         
         # Parse page with LLM using image analysis
-        markdown_content = parse_page_with_llm(llm_client, model_name, pdf_path, page_num, img_path)
+        if stream:
+            # Write the markdown as it arrives, the final page file replaces it once complete
+            partial_path = Path(f"{markdown_page_path(pdf_path.name, page_num, output_dir)}.partial")
+            with open(partial_path, 'w', encoding='utf-8') as partial_file:
+                def write_delta(delta: str) -> None:
+                    partial_file.write(delta)
+                    partial_file.flush()
+                
+                markdown_content = parse_page_with_llm(llm_client, model_name, pdf_path, page_num, img_path, img_data, write_delta)
+        else:
+            markdown_content = parse_page_with_llm(llm_client, model_name, pdf_path, page_num, img_path, img_data)
         
         # Save markdown file
         saved_file = save_markdown_page(markdown_content, pdf_path.name, page_num, output_dir)
+        if stream and saved_file:
+            partial_path.unlink(missing_ok=True)
         if saved_file:
             saved_files.append(saved_file)
         
+        if manifest:
+            if saved_file and markdown_content and not markdown_content.startswith("Error"):
+                manifest.mark_done(page_num, saved_file, time.perf_counter() - start_time)
+            else:
+                manifest.mark_failed(page_num, str(markdown_content), time.perf_counter() - start_time)
+        
         # Clean up temporary image file
         if img_path and os.path.exists(img_path):
             try:
@@ -245,6 +393,9 @@ def main():
     
     print(f"📁 Found {len(pdf_files)} PDF files")
     
+    # Serve live metrics when TELEMETRY_PORT is set
+    start_metrics_server_from_env()
+    
     # Setup LLM client
     try:
         config = get_config()
@@ -294,6 +445,16 @@ def main():
     else:
         print("No pages with tables found in any PDF files.")
     
+    cache_stats = get_cache_stats()
+    if cache_stats:
+        print(f"💾 LLM cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
+    
+    # Where the time went: rendering, LLM calls or file writes
+    telemetry_files = write_report(output_dir / "telemetry")
+    print(f"⏱️  Telemetry report: {telemetry_files['json']}")
+    for operation, stats in get_summary().items():
+        print(f"   {operation}: {stats['count']} x, {stats['total_seconds']}s total, p95 {stats['p95_seconds']}s")
+    
     # Clean up temporary images
     #cleanup_temp_images()
 
@@ -5,9 +5,13 @@ Simple script to read JSON file and display each row from the table data.
 This script reads the page_006.json file and iterates through each row in the table.
 """
 
+import csv
 import json
 import os
-from typing import Dict, List, Any
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, List, Any, Optional
 import sys
 from pathlib import Path
 
@@ -17,7 +21,13 @@ script_dir = Path(__file__).resolve().parent
 project_root = str(script_dir.parent.parent)
 sys.path.insert(0, project_root)
 
-from client.llm_client import create_client, simple_query, get_config
+from client.llm_client import get_shared_client, simple_query, get_config, count_tokens, truncate_to_tokens, get_context_limit
+from client.telemetry import track, write_report, get_summary, start_metrics_server_from_env
+from retrieval import ReportRetriever
+from agents.tt_exigence_1_page.result_parser import (
+    RESULT_COLUMNS, CONFORMITY_RESPONSE_FORMAT, JSON_OUTPUT_INSTRUCTIONS, ConformityParseError,
+    ConformityRecord, parse_conformity_response, repair_response, apply_requirement_defaults
+)
 
 
 def read_rapport_data(rapport_path: str) -> str:
@@ -41,27 +51,52 @@ def read_rapport_data(rapport_path: str) -> str:
         return ""
 
 
-def create_conformity_prompt(rapport_content: str, requirement_text: str) -> str:
+# Tokens kept free after the rapport for requirement texts not known yet (one rapport for a whole run)
+REQUIREMENT_RESERVE_TOKENS = 1000
+
+
+def fit_rapport_content(rapport_content: str, max_tokens: int = 2000, prompt: str = None,
+                        reserve: int = REQUIREMENT_RESERVE_TOKENS) -> str:
     """
-    Create a prompt for the LLM to check conformity between requirements and rapport data.
+    Trim rapport data so the prompt and the answer fit the model context.
     
     Args:
-        rapport_content (str): Content from the rapport.md file
-        requirement_text (str): The requirement text to check against
+        rapport_content (str): Whole rapport or retrieved chunks (most relevant first)
+        max_tokens (int): Tokens reserved for the answer
+        prompt (str, optional): The rest of the prompt sent with the rapport (instructions,
+            requirements). Defaults to the instructions of create_prompt_prefix
+        reserve (int): Tokens kept free for prompt parts missing from prompt
         
     Returns:
-        str: Formatted prompt for the LLM
+        str: The rapport data, cut at the token budget when it is too long
     """
-    prompt = f"""
-You are an expert in regulatory compliance and ESG (Environmental, Social, Governance) reporting.
+    if prompt is None:
+        prompt = create_prompt_prefix()
+    budget = get_context_limit() - count_tokens(prompt) - max_tokens - reserve
+    trimmed = truncate_to_tokens(rapport_content, budget)
+    if len(trimmed) < len(rapport_content):
+        print(f"Warning: rapport data trimmed to {budget} tokens to fit the {get_context_limit()}-token context")
+    return trimmed
 
-REQUIREMENT TO CHECK:
-{requirement_text}
 
-RAPPORT DATA TO ANALYZE:
-{rapport_content}
+def create_prompt_prefix(rapport_content: str = None) -> str:
+    """
+    Create the static part of the conformity prompt: instructions, then the rapport.
+    
+    The prefix is identical for every requirement of a run, so it is placed first
+    to let the inference server reuse its prefix (KV) cache between requests.
+    
+    Args:
+        rapport_content (str, optional): Content from the rapport.md file. Leave empty when
+            the rapport data varies per requirement (retrieval); it then goes in the suffix
+        
+    Returns:
+        str: Prompt prefix
+    """
+    prefix = """
+You are an expert in regulatory compliance and ESG (Environmental, Social, Governance) reporting.
 
-Your task is to extract and structure regulatory compliance data from the rapport content according to the given requirement. 
+Your task is to extract and structure regulatory compliance data from the rapport content according to the requirement given at the end. 
 
 You must output your results in the following CSV format with these exact columns:
 
@@ -86,6 +121,7 @@ EXTRACTION GUIDELINES:
 - Include units in the Value field when they appear with the number
 - Mark as "TRUE" when  unit and SASB Unit of Measurement are equal
 - Mark as "FALSE" when data is partial or missing key elements
+- When the rapport data is split into sections labelled [Page N | file], use N for the Page column
 
 OUTPUT FORMAT:
 Start your response with the CSV extracted data rows. If no relevant data is found, output no data.
@@ -102,33 +138,239 @@ Focus on:
 - Proper CSV formatting and escaping
 - dont explain the result, just return the result
 """
-    return prompt
+    if rapport_content:
+        prefix += f"""
+RAPPORT DATA TO ANALYZE:
+{rapport_content}
+"""
+    return prefix
 
 
+def create_requirement_suffix(requirement_text: str, rapport_content: str = None) -> str:
+    """
+    Create the requirement-specific end of the conformity prompt.
+    
+    Args:
+        requirement_text (str): The requirement text to check against
+        rapport_content (str, optional): Per-requirement rapport data (e.g. retrieved chunks)
+        
+    Returns:
+        str: Prompt suffix
+    """
+    suffix = ""
+    if rapport_content:
+        suffix += f"""
+RAPPORT DATA TO ANALYZE:
+{rapport_content}
+"""
+    suffix += f"""
+REQUIREMENT TO CHECK:
+{requirement_text}
+"""
+    return suffix
 
-def check_conformity(requirement_text: str, rapport_path: str = None) -> str:
+
+def requirement_code(requirement: Any, default: str = "") -> str:
     """
-    Check conformity of a requirement against the rapport data using LLM.
+    Get the requirement code (e.g. FN-IN-410c.1) of a requirement row or text.
+    
+    Args:
+        requirement (Any): Requirement row (dict) or requirement text containing "CODE: ..."
+        default (str): Value returned when no code is found
+        
+    Returns:
+        str: Requirement code
+    """
+    if isinstance(requirement, dict):
+        fields = {str(key).upper(): value for key, value in requirement.items()}
+        return str(fields.get('CODE') or default).strip()
+    match = re.search(r'CODE:\s*(\S+)', str(requirement))
+    return match.group(1) if match else default
+
+
+def create_batch_suffix(requirements: List[Any], codes: List[str], rapport_content: str = None) -> str:
+    """
+    Create the end of a prompt checking several requirements at once.
+    
+    Args:
+        requirements (List[Any]): Requirement rows or texts
+        codes (List[str]): Unique code of each requirement, used to label the answer blocks
+        rapport_content (str, optional): Rapport data shared by the group (e.g. retrieved chunks)
+        
+    Returns:
+        str: Prompt suffix
+    """
+    suffix = ""
+    if rapport_content:
+        suffix += f"""
+RAPPORT DATA TO ANALYZE:
+{rapport_content}
+"""
+    suffix += """
+REQUIREMENTS TO CHECK:
+Answer each requirement separately. For every requirement, output a line "### <CODE>" with its
+code, followed by its CSV rows (no rows if no relevant data is found). Output one block per code,
+in the order given, and nothing else.
+"""
+    for code, requirement in zip(codes, requirements):
+        suffix += f"""
+### {code}
+{requirement}
+"""
+    return suffix
+
+
+def split_batch_response(response: str, codes: List[str]) -> Dict[str, str]:
+    """
+    Split a batched response into the CSV block of each requirement code.
+    
+    Args:
+        response (str): LLM response to a batch prompt
+        codes (List[str]): Expected requirement codes
+        
+    Returns:
+        Dict[str, str]: CSV text per code; codes whose block is missing are absent
+    """
+    blocks: Dict[str, List[str]] = {}
+    current = None
+    for line in response.splitlines():
+        match = re.match(r'^\s*#{2,}\s*(?:CODE:\s*)?(\S+)\s*$', line)
+        if match and match.group(1) in codes:
+            current = match.group(1)
+            blocks.setdefault(current, [])
+        elif current is not None:
+            blocks[current].append(line)
+    return {code: "\n".join(lines).strip() for code, lines in blocks.items()}
+
+
+def group_requirements(rows: List[Any], max_group_size: int = 4, retriever: ReportRetriever = None,
+                       top_k: int = 8, min_overlap: float = 0.5) -> List[List[int]]:
+    """
+    Group requirements that can share one prompt.
+    
+    Without a retriever rows are grouped by topic. With a retriever a row joins
+    the first group whose retrieved chunks cover at least min_overlap of its own.
+    
+    Args:
+        rows (List[Any]): Requirement rows or texts
+        max_group_size (int): Maximum requirements per group
+        retriever (ReportRetriever, optional): Retriever used to compare chunk overlap
+        top_k (int): Number of chunks retrieved per requirement
+        min_overlap (float): Share of a row's chunks that must already be in the group
+        
+    Returns:
+        List[List[int]]: Row indices of each group, in order of first row
+    """
+    groups: List[List[int]] = []
+    group_keys: List[Any] = []
+    
+    for index, row in enumerate(rows):
+        if retriever is not None:
+            key = {chunk['id'] for chunk in retriever.retrieve(row, top_k)}
+        elif isinstance(row, dict):
+            fields = {str(k).upper(): v for k, v in row.items()}
+            key = str(fields.get('TOPIC', '')).strip().lower()
+        else:
+            match = re.search(r'TOPIC:\s*(.+)', str(row))
+            key = match.group(1).strip().lower() if match else ""
+        
+        for group, group_key in zip(groups, group_keys):
+            if len(group) >= max_group_size:
+                continue
+            if retriever is not None:
+                if key and len(key & group_key) / len(key) >= min_overlap:
+                    group.append(index)
+                    group_key |= key
+                    break
+            elif key and key == group_key:
+                group.append(index)
+                break
+        else:
+            groups.append([index])
+            group_keys.append(key)
+    
+    return groups
+
+
+def create_conformity_prompt(rapport_content: str, requirement_text: str) -> str:
+    """
+    Create a prompt for the LLM to check conformity between requirements and rapport data.
+    
+    Args:
+        rapport_content (str): Content from the rapport.md file
+        requirement_text (str): The requirement text to check against
+        
+    Returns:
+        str: Formatted prompt for the LLM
+    """
+    return create_prompt_prefix(rapport_content) + create_requirement_suffix(requirement_text)
+
+
+def load_retriever(parsed_dir: str = None) -> ReportRetriever:
+    """
+    Load the retrieval index over parsed report pages, if one is configured.
+    
+    Args:
+        parsed_dir (str, optional): Directory of parsed markdown pages. Defaults to the
+            RAPPORT_PARSED_DIR environment variable
+        
+    Returns:
+        ReportRetriever: Retriever over the report chunks, or None when not configured
+    """
+    parsed_dir = parsed_dir or os.getenv('RAPPORT_PARSED_DIR')
+    if not parsed_dir:
+        return None
+    return ReportRetriever.from_directory(parsed_dir)
+
+
+def load_rapport_content(requirement_text: str, rapport_path: str = None,
+                         retriever: ReportRetriever = None, top_k: int = 8) -> str:
+    """
+    Get the rapport data to check a requirement against.
     
     Args:
         requirement_text (str): The requirement text to check
         rapport_path (str, optional): Path to rapport.md file. Defaults to data-parsed/manuel/rapport.md
+        retriever (ReportRetriever, optional): When given, only the top_k report chunks
+            relevant to the requirement are returned, each labelled with its page
+        top_k (int): Number of report chunks to return when using a retriever
         
     Returns:
-        str: LLM response with conformity analysis
+        str: Retrieved chunks or the whole rapport, empty if the rapport cannot be read
     """
+    if retriever is not None:
+        print(f"Retrieving top {top_k} report chunks for the requirement")
+        return retriever.build_context(requirement_text, top_k)
+    
     # Set default rapport path if not provided
     if rapport_path is None:
-        script_dir = Path(__file__).resolve().parent
-        project_root = script_dir.parent.parent
-        rapport_path = str(project_root / "data-parsed" / "manuel" / "rapport.md")
+        rapport_path = str(Path(project_root) / "data-parsed" / "manuel" / "rapport.md")
     
     # Read rapport data
     print(f"Reading rapport data from: {rapport_path}")
-    rapport_content = read_rapport_data(rapport_path)
+    return read_rapport_data(rapport_path)
+
+
+def check_conformity(requirement_text: str, rapport_path: str = None,
+                     retriever: ReportRetriever = None, top_k: int = 8) -> str:
+    """
+    Check conformity of a requirement against the rapport data using LLM.
     
+    Args:
+        requirement_text (str): The requirement text to check
+        rapport_path (str, optional): Path to rapport.md file. Defaults to data-parsed/manuel/rapport.md
+        retriever (ReportRetriever, optional): When given, only the top_k report chunks
+            relevant to the requirement are sent, each labelled with its page
+        top_k (int): Number of report chunks to send when using a retriever
+        
+    Returns:
+        str: LLM response with conformity analysis
+    """
+    rapport_content = load_rapport_content(requirement_text, rapport_path, retriever, top_k)
     if not rapport_content:
         return "Error: Could not read rapport data"
+    rapport_content = fit_rapport_content(rapport_content, 2000,
+                                          create_conformity_prompt("", requirement_text), reserve=0)
     
     # Get LLM configuration
     config = get_config()
@@ -137,9 +379,9 @@ def check_conformity(requirement_text: str, rapport_path: str = None) -> str:
     print(f"Connecting to LLM at: {config['endpoint_url']}")
     print(f"Using model: {config['model_name']}")
     
-    client = create_client(
+    # Reuse the pooled client so each requirement does not open new connections
+    client = get_shared_client(
         endpoint_url=config['endpoint_url'],
-        model_name=config['model_name'],
         api_key=config['api_key']
     )
     
@@ -160,6 +402,361 @@ def check_conformity(requirement_text: str, rapport_path: str = None) -> str:
 
 
 
+class ConformityRunner:
+    """
+    Checks many requirements against one rapport, paying the setup cost once.
+    
+    The rapport is read, the static prompt prefix built and the pooled client
+    acquired when the runner is created; each check only appends the
+    requirement-specific suffix.
+    """
+    
+    def __init__(self, rapport_path: str = None, retriever: ReportRetriever = None, top_k: int = 8,
+                 temperature: float = 0.1, max_tokens: int = 2000, structured_output: bool = False,
+                 repair: bool = True, client=None, prompt_factory: Optional[Callable[[str, Any], str]] = None,
+                 rapport_content: Optional[str] = None):
+        """
+        Prepare the runner.
+        
+        Args:
+            rapport_path (str, optional): Path to rapport.md file. Defaults to data-parsed/manuel/rapport.md
+            retriever (ReportRetriever, optional): Send only the top_k relevant chunks per requirement
+                instead of the whole rapport
+            top_k (int): Number of report chunks per requirement when using a retriever
+            temperature (float): Sampling temperature
+            max_tokens (int): Maximum tokens per response
+            structured_output (bool): Request JSON constrained by a schema (response_format);
+                needs server support, and disables multi-requirement batching
+            repair (bool): Send a short repair call when a response cannot be parsed
+            client (optional): LLM client to use instead of the shared client of the configured endpoint
+            prompt_factory (Callable, optional): Builds the whole prompt from (rapport_content, requirement)
+                instead of the shared prefix and requirement suffix, for agents with their own prompt;
+                batches pass their requirement list and answer-block instructions as the requirement
+            rapport_content (str, optional): Rapport data to use instead of reading rapport_path
+        """
+        self.retriever = retriever
+        self.top_k = top_k
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.structured_output = structured_output
+        self.repair = repair
+        self.prompt_factory = prompt_factory
+        
+        self.rapport_content = None
+        if retriever is None and rapport_content is not None:
+            self.rapport_content = rapport_content
+        elif retriever is None:
+            if rapport_path is None:
+                rapport_path = str(Path(project_root) / "data-parsed" / "manuel" / "rapport.md")
+            print(f"Reading rapport data from: {rapport_path}")
+            self.rapport_content = read_rapport_data(rapport_path)
+        
+        # The shared prefix is compiled once; with retrieval it holds the instructions only
+        if prompt_factory is not None:
+            instructions = self.factory_prompt("", "")
+        else:
+            instructions = create_prompt_prefix() + (JSON_OUTPUT_INSTRUCTIONS if structured_output else "")
+        if self.rapport_content:
+            self.rapport_content = fit_rapport_content(self.rapport_content, max_tokens, instructions)
+        self.prompt_prefix = create_prompt_prefix(self.rapport_content)
+        if structured_output:
+            self.prompt_prefix += JSON_OUTPUT_INSTRUCTIONS
+        
+        self.config = get_config()
+        if client is not None:
+            self.client = client
+            return
+        print(f"Connecting to LLM at: {self.config['endpoint_url']}")
+        print(f"Using model: {self.config['model_name']}")
+        self.client = get_shared_client(
+            endpoint_url=self.config['endpoint_url'],
+            api_key=self.config['api_key']
+        )
+    
+    def factory_prompt(self, rapport_content: str, requirement: Any) -> str:
+        """
+        Build a prompt with prompt_factory, adding the JSON instructions in structured output mode.
+        
+        Args:
+            rapport_content (str): Rapport data (whole rapport or retrieved chunks)
+            requirement (Any): Requirement row, text, or batch of requirements
+            
+        Returns:
+            str: Prompt
+        """
+        prompt = self.prompt_factory(rapport_content, requirement)
+        return prompt + JSON_OUTPUT_INSTRUCTIONS if self.structured_output else prompt
+    
+    def build_prompt(self, requirement: Any) -> str:
+        """
+        Build the full prompt for a requirement.
+        
+        Args:
+            requirement (Any): Requirement row (dict) or requirement text
+            
+        Returns:
+            str: Static prefix followed by the requirement suffix (or the prompt_factory prompt)
+        """
+        if self.prompt_factory is not None:
+            rapport_content = self.rapport_content
+            if self.retriever:
+                rapport_content = fit_rapport_content(self.retriever.build_context(requirement, self.top_k),
+                                                      self.max_tokens, self.factory_prompt("", requirement), reserve=0)
+            return self.factory_prompt(rapport_content, requirement)
+        
+        context = None
+        if self.retriever:
+            context = fit_rapport_content(self.retriever.build_context(requirement, self.top_k), self.max_tokens,
+                                          self.prompt_prefix + create_requirement_suffix(requirement), reserve=0)
+        return self.prompt_prefix + create_requirement_suffix(requirement, context)
+    
+    def check(self, row: Any) -> str:
+        """
+        Check one requirement.
+        
+        Args:
+            row (Any): Requirement row (dict) or requirement text
+            
+        Returns:
+            str: LLM response with conformity analysis
+        """
+        if self.retriever is None and not self.rapport_content:
+            return "Error: Could not read rapport data"
+        
+        extra = {'response_format': CONFORMITY_RESPONSE_FORMAT} if self.structured_output else {}
+        response = simple_query(
+            client=self.client,
+            model_name=self.config['model_name'],
+            prompt=self.build_prompt(row),
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            **extra
+        )
+        return self.validate(response)
+    
+    def validate(self, response: str) -> str:
+        """
+        Check that a response parses into conformity records, repairing it otherwise.
+        
+        Args:
+            response (str): LLM response
+            
+        Returns:
+            str: The response, or its repaired version when it could not be parsed
+        """
+        if response.startswith("Error"):
+            return response
+        try:
+            parse_conformity_response(response, strict=True)
+            return response
+        except ConformityParseError as e:
+            if not self.repair:
+                return response
+            print(f"Unparsable response ({e}), sending a repair request")
+            repaired = repair_response(self.client, self.config['model_name'], response, str(e))
+            return response if repaired.startswith("Error") else repaired
+    
+    def check_records(self, row: Any) -> List[ConformityRecord]:
+        """
+        Check one requirement and return typed records.
+        
+        Args:
+            row (Any): Requirement row (dict) or requirement text
+            
+        Returns:
+            List[ConformityRecord]: Extracted records, Topic/Metric/Code defaulted from the row
+        """
+        records = parse_conformity_response(self.check(row), strict=False)
+        return apply_requirement_defaults(records, row)
+    
+    def check_batch(self, rows: List[Any]) -> List[str]:
+        """
+        Check several requirements with a single prompt.
+        
+        The response is split into one CSV block per requirement code; a
+        requirement whose block is missing or unparsable is retried on its own.
+        
+        Args:
+            rows (List[Any]): Requirement rows or texts
+            
+        Returns:
+            List[str]: One CSV result per row, in row order
+        """
+        if len(rows) == 1:
+            return [self.check(rows[0])]
+        if self.retriever is None and not self.rapport_content:
+            return ["Error: Could not read rapport data"] * len(rows)
+        
+        # Codes label the answer blocks, so they must be unique within the batch
+        codes = []
+        for position, row in enumerate(rows, 1):
+            code = requirement_code(row, default=f"REQ-{position}")
+            codes.append(code if code not in codes else f"{code}-{position}")
+        
+        group_context = self.retriever.build_group_context(rows, self.top_k) if self.retriever else None
+        if self.prompt_factory is not None:
+            requirements = create_batch_suffix(rows, codes).strip()
+            context = self.rapport_content
+            if self.retriever:
+                context = fit_rapport_content(group_context, self.max_tokens,
+                                              self.factory_prompt("", requirements), reserve=0)
+            prompt = self.factory_prompt(context, requirements)
+        else:
+            context = None
+            if self.retriever:
+                context = fit_rapport_content(group_context, self.max_tokens,
+                                              self.prompt_prefix + create_batch_suffix(rows, codes), reserve=0)
+            prompt = self.prompt_prefix + create_batch_suffix(rows, codes, context)
+        
+        # The answers share what the prompt leaves of the context, up to max_tokens each;
+        # split batches that leave less than one answer's worth
+        answer_tokens = min(self.max_tokens * len(rows), get_context_limit() - count_tokens(prompt))
+        if answer_tokens < self.max_tokens:
+            print(f"Batch of {len(rows)} requirements does not fit the context, splitting it")
+            middle = len(rows) // 2
+            return self.check_batch(rows[:middle]) + self.check_batch(rows[middle:])
+        
+        response = simple_query(
+            client=self.client,
+            model_name=self.config['model_name'],
+            prompt=prompt,
+            temperature=self.temperature,
+            max_tokens=answer_tokens
+        )
+        
+        blocks = split_batch_response(response, codes) if not response.startswith("Error") else {}
+        results = []
+        for code, row in zip(codes, rows):
+            block = blocks.get(code)
+            if block is None:
+                print(f"No answer block for {code} in the batch, checking it on its own")
+                block = self.check(row)
+            else:
+                block = self.validate(block)
+                try:
+                    parse_conformity_response(block, strict=True)
+                except ConformityParseError:
+                    print(f"Answer block for {code} is still unparsable, checking it on its own")
+                    block = self.check(row)
+            results.append(block)
+        return results
+    
+    def check_many(self, rows: List[Any], max_workers: int = 1,
+                   on_result: Optional[Callable[[int, Any, str], None]] = None,
+                   batch_size: int = 1) -> List[str]:
+        """
+        Check several requirements, concurrently when max_workers > 1.
+        
+        Args:
+            rows (List[Any]): Requirement rows or texts
+            max_workers (int): Number of prompts sent in parallel
+            on_result (Callable, optional): Called as on_result(index, row, result) as soon as
+                each row completes (completion order, from the calling thread)
+            batch_size (int): Maximum requirements per prompt; rows are grouped by topic,
+                or by retrieved-chunk overlap when a retriever is used
+            
+        Returns:
+            List[str]: One LLM response per row, in row order
+        """
+        results: List[Optional[str]] = [None] * len(rows)
+        
+        # Batched answers are split on "### <CODE>" lines, which a JSON schema does not allow
+        if batch_size > 1 and not self.structured_output:
+            groups = group_requirements(rows, batch_size, self.retriever, self.top_k)
+            print(f"Checking {len(rows)} requirements in {len(groups)} prompts")
+        else:
+            groups = [[index] for index in range(len(rows))]
+        
+        def run_group(group: List[int]) -> List[str]:
+            return self.check_batch([rows[index] for index in group])
+        
+        def collect(group: List[int], group_results: List[str]) -> None:
+            for index, result in zip(group, group_results):
+                results[index] = result
+                if on_result:
+                    on_result(index, rows[index], result)
+        
+        if max_workers <= 1:
+            for group in groups:
+                collect(group, run_group(group))
+            return results
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(run_group, group): group for group in groups}
+            for future in as_completed(futures):
+                group = futures[future]
+                try:
+                    group_results = future.result()
+                except Exception as e:
+                    group_results = [f"Error: {e}"] * len(group)
+                collect(group, group_results)
+        
+        return results
+
+
+class OrderedCSVWriter:
+    """
+    Streams per-row results to a CSV file in the original row order.
+    
+    Results may arrive in any order; each is buffered until every earlier row
+    has been written, so the file always holds a complete, ordered prefix.
+    """
+    
+    def __init__(self, output_path: str, columns: List[str] = RESULT_COLUMNS):
+        """
+        Create the output file and write the header.
+        
+        Args:
+            output_path (str): CSV file to write
+            columns (List[str]): Header row
+        """
+        Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+        self.output_path = output_path
+        self.file = open(output_path, 'w', encoding='utf-8', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(columns)
+        self.file.flush()
+        
+        self.next_index = 0
+        self.pending: Dict[int, List[List[str]]] = {}
+        self.rows_written = 0
+        self._lock = threading.Lock()
+    
+    def add(self, index: int, result: str, requirement: Any = None) -> None:
+        """
+        Add the result of a row and write every row that is now in order.
+        
+        Args:
+            index (int): Row index (0-based, original order)
+            result (str): LLM response for the row
+            requirement (Any, optional): Requirement row used to fill missing Topic/Metric/Code
+        """
+        records = apply_requirement_defaults(parse_conformity_response(result, strict=False), requirement)
+        with self._lock, track('file_write', kind='csv') as span:
+            self.pending[index] = [record.to_row() for record in records]
+            position = self.file.tell()
+            while self.next_index in self.pending:
+                records = self.pending.pop(self.next_index)
+                self.writer.writerows(records)
+                self.rows_written += len(records)
+                self.next_index += 1
+            self.file.flush()
+            span['payload_bytes'] = self.file.tell() - position
+    
+    def close(self) -> None:
+        """
+        Close the output file.
+        """
+        self.file.close()
+    
+    def __enter__(self) -> "OrderedCSVWriter":
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+
+
 def read_json_file(file_path: str) -> Dict[str, Any]:
     """
     Read and parse JSON file.
@@ -212,12 +809,18 @@ def read_json_file(file_path: str) -> Dict[str, Any]:
         print(f"Columns: {', '.join(table.get('columns', []))}")
         print(f"Number of Rows: {len(table.get('rows', []))}")
 
-def iterate_on_requirements_check(data: Dict[str, Any]) -> List[str]:
+def iterate_on_requirements_check(data: Dict[str, Any], retriever: ReportRetriever = None,
+                                  max_workers: int = 1, output_csv: str = None,
+                                  batch_size: int = 1) -> List[str]:
     """
     Iterate through each row and display it in a formatted way.
     
     Args:
         data (Dict[str, Any]): JSON data containing table rows
+        retriever (ReportRetriever, optional): Retriever selecting report chunks per row
+        max_workers (int): Number of rows checked in parallel
+        output_csv (str, optional): CSV file receiving the parsed results in row order as they complete
+        batch_size (int): Maximum requirements checked per LLM call
         
     Returns:
         List[str]: List of conformity check results for each row
@@ -236,17 +839,25 @@ def iterate_on_requirements_check(data: Dict[str, Any]) -> List[str]:
     
     print("\n" + "=" * 80)
     
-    # List to store all results
-    all_results = []
+    # Load the rapport and connect once for all rows
+    runner = ConformityRunner(retriever=retriever)
+    
+    writer = OrderedCSVWriter(output_csv) if output_csv else None
     
-    for i, row in enumerate(rows, 1):
-        print(f"\n--- ROW {i} ---")
-        # Check conformity
+    def show_result(index: int, row: Any, result: str) -> None:
+        print(f"\n--- ROW {index + 1} ---")
         print(row)
-        result = check_conformity(row)
         print(result)
-        # Store the result
-        all_results.append(result)
+        if writer:
+            writer.add(index, result, row)
+    
+    try:
+        all_results = runner.check_many(rows, max_workers=max_workers, on_result=show_result,
+                                        batch_size=batch_size)
+    finally:
+        if writer:
+            writer.close()
+            print(f"\nWrote {writer.rows_written} CSV rows to {output_csv}")
     
     return all_results
 
@@ -273,8 +884,22 @@ def main():
         print("Failed to read JSON file. Exiting.")
         return
 
+    # Serve live metrics when TELEMETRY_PORT is set
+    start_metrics_server_from_env()
+    
+    # Send only the relevant report chunks when RAPPORT_PARSED_DIR points at parsed pages
+    retriever = load_retriever()
+    
+    # Check several rows at once and stream the CSV results in row order
+    max_workers = int(os.getenv('REQUIREMENT_CHECK_WORKERS', '4'))
+    output_csv = os.path.join(script_dir, "output", "conformity_results.csv")
+    
+    # Requirements sharing a topic (or report chunks) can be checked in one prompt
+    batch_size = int(os.getenv('REQUIREMENT_BATCH_SIZE', '1'))
+    
     # Display all rows and get results
-    results = iterate_on_requirements_check(data)
+    results = iterate_on_requirements_check(data, retriever, max_workers=max_workers, output_csv=output_csv,
+                                            batch_size=batch_size)
     
 
     print("\n" + "=" * 80)
@@ -282,6 +907,11 @@ def main():
 
     print(f"Total results: {len(results)}")
     print(results)
+    
+    telemetry_files = write_report(os.path.join(script_dir, "output", "telemetry"))
+    print(f"Telemetry report: {telemetry_files['json']}")
+    for operation, stats in get_summary().items():
+        print(f"  {operation}: {stats['count']} x, {stats['total_seconds']}s total, p95 {stats['p95_seconds']}s")
     print("=" * 80)
     
 
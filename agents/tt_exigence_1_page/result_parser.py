@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+Parser and validator for conformity check responses.
+Turns the CSV (or JSON) text returned by the LLM into typed records with the
+11 columns of the conformity output, and repairs malformed responses with a
+small follow-up call instead of rerunning the whole check.
+"""
+
+import csv
+import io
+import json
+import re
+import unicodedata
+from dataclasses import dataclass, asdict, fields
+from typing import Any, Dict, List, Optional
+
+from client.llm_client import simple_query
+
+# Columns of the conformity CSV output
+RESULT_COLUMNS = ['CID', 'Industry', 'Topic', 'Metric', 'Code', 'Page', 'Heading or Fragment',
+                  'Value', 'Unit', 'SASB Unit of Measurement', 'Complete']
+
+# Shortened layouts produced when the model follows the prompt example instead of the spec
+SHORT_COLUMNS_WITH_PAGE = RESULT_COLUMNS[2:]
+SHORT_COLUMNS = ['Topic', 'Metric', 'Code', 'Heading or Fragment', 'Value', 'Unit',
+                 'SASB Unit of Measurement', 'Complete']
+
+# Scale words found after numbers in French and English reports
+NUMBER_SCALES = {
+    'k': 1e3, 'millier': 1e3, 'milliers': 1e3, 'thousand': 1e3, 'thousands': 1e3,
+    'million': 1e6, 'millions': 1e6, 'mn': 1e6,
+    'md': 1e9, 'mds': 1e9, 'mrd': 1e9, 'milliard': 1e9, 'milliards': 1e9,
+    'bn': 1e9, 'billion': 1e9, 'billions': 1e9
+}
+
+NUMBER_PATTERN = re.compile(r'[-+]?\d[\d\s  .,]*')
+
+# JSON schema for servers supporting constrained output (response_format)
+CONFORMITY_JSON_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "records": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {column: {"type": "string"} for column in RESULT_COLUMNS},
+                "required": RESULT_COLUMNS,
+                "additionalProperties": False
+            }
+        }
+    },
+    "required": ["records"],
+    "additionalProperties": False
+}
+
+CONFORMITY_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {"name": "conformity_records", "schema": CONFORMITY_JSON_SCHEMA, "strict": True}
+}
+
+JSON_OUTPUT_INSTRUCTIONS = """
+Return a JSON object {"records": [...]} where each record has the keys: """ + ", ".join(RESULT_COLUMNS) + """.
+All values are strings. Return {"records": []} if no relevant data is found.
+"""
+
+
+class ConformityParseError(ValueError):
+    """
+    Raised when a response cannot be parsed into valid conformity records.
+    """
+
+
+@dataclass
+class ConformityRecord:
+    """
+    One extracted data point of a conformity check.
+    """
+    cid: str = ""
+    industry: str = ""
+    topic: str = ""
+    metric: str = ""
+    code: str = ""
+    page: Optional[int] = None
+    fragment: str = ""
+    value: str = "N/A"
+    unit: str = "N/A"
+    sasb_unit: str = "N/A"
+    complete: Optional[bool] = None
+    value_number: Optional[float] = None
+
+    def to_row(self) -> List[str]:
+        """
+        Convert the record to a row following RESULT_COLUMNS.
+
+        Returns:
+            List[str]: CSV cells
+        """
+        complete = "" if self.complete is None else ("TRUE" if self.complete else "FALSE")
+        page = "" if self.page is None else str(self.page)
+        return [self.cid, self.industry, self.topic, self.metric, self.code, page, self.fragment,
+                self.value, self.unit, self.sasb_unit, complete]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert the record to a dictionary.
+        """
+        return asdict(self)
+
+
+# Output column -> record attribute
+COLUMN_FIELDS = dict(zip(RESULT_COLUMNS, [field.name for field in fields(ConformityRecord)]))
+
+
+def normalize_number(text: str, decimal_comma: bool = True) -> Optional[float]:
+    """
+    Convert a reported value such as "3,472 millions", "13,1 Md" or "1 430,43" to a float.
+
+    Spaces are thousands separators. A single comma is read as the decimal separator
+    (French convention) unless decimal_comma is False; when both "," and "." appear,
+    the last one is the decimal separator.
+
+    Args:
+        text (str): Value text
+        decimal_comma (bool): Read a lone comma as a decimal separator
+
+    Returns:
+        Optional[float]: The number, or None if the text holds no number
+    """
+    if not text:
+        return None
+    match = NUMBER_PATTERN.search(text)
+    if not match:
+        return None
+
+    number = re.sub(r'[\s  ]', '', match.group(0)).rstrip('.,')
+    if ',' in number and '.' in number:
+        decimal = ',' if number.rfind(',') > number.rfind('.') else '.'
+        number = number.replace('.' if decimal == ',' else ',', '').replace(',', '.')
+    elif number.count(',') == 1 and decimal_comma:
+        number = number.replace(',', '.')
+    elif number.count('.') > 1:
+        number = number.replace('.', '')
+    else:
+        number = number.replace(',', '')
+
+    try:
+        value = float(number)
+    except ValueError:
+        return None
+
+    # Whole words only, so units like "m3" or "m²" are not read as a scale
+    scale_match = re.match(r'\s*([A-Za-z]+)\b(?![²³])', text[match.end():])
+    if scale_match:
+        scale = scale_match.group(1)
+        if scale.lower() == 'm':
+            # "m" is also metres: a million only as "5M", "5m" or "5 M", never "100 m"
+            attached = scale_match.start(1) == 0 and match.group(0)[-1].isdigit()
+            if scale == 'M' or attached:
+                value *= 1e6
+        else:
+            value *= NUMBER_SCALES.get(scale.lower(), 1)
+    return value
+
+
+def parse_complete(text: str) -> Optional[bool]:
+    """
+    Parse the Complete column.
+
+    Args:
+        text (str): Cell text
+
+    Returns:
+        Optional[bool]: True/False, or None if the cell is not a boolean
+    """
+    value = unicodedata.normalize('NFKD', str(text)).strip().strip('"').upper()
+    if value in ('TRUE', 'VRAI', 'YES', 'OUI', '1'):
+        return True
+    if value in ('FALSE', 'FAUX', 'NO', 'NON', '0'):
+        return False
+    return None
+
+
+def build_record(values: Dict[str, str], strict: bool = True) -> ConformityRecord:
+    """
+    Build and validate a record from column values.
+
+    Args:
+        values (Dict[str, str]): Cell text per output column name
+        strict (bool): Raise on invalid Page / Complete cells instead of leaving them empty
+
+    Returns:
+        ConformityRecord: Typed record
+
+    Raises:
+        ConformityParseError: If strict and a cell is invalid
+    """
+    record = ConformityRecord()
+    for column, text in values.items():
+        attribute = COLUMN_FIELDS.get(column)
+        if attribute is None:
+            continue
+        text = (text or "").strip()
+
+        if attribute == 'page':
+            page_match = re.search(r'\d+', text)
+            if page_match:
+                record.page = int(page_match.group(0))
+            elif strict and text and text.upper() != 'N/A':
+                raise ConformityParseError(f"Invalid Page value: {text!r}")
+        elif attribute == 'complete':
+            record.complete = parse_complete(text)
+            if strict and record.complete is None:
+                raise ConformityParseError(f"Invalid Complete value: {text!r}")
+        else:
+            setattr(record, attribute, text)
+
+    record.value_number = normalize_number(record.value)
+    return record
+
+
+def strip_code_fences(response: str) -> str:
+    """
+    Remove markdown code fence lines from a response.
+    """
+    return "\n".join(line for line in response.strip().splitlines() if not line.strip().startswith("```"))
+
+
+def parse_json_records(text: str, strict: bool = True) -> List[ConformityRecord]:
+    """
+    Parse a JSON response ({"records": [...]} or a bare list) into records.
+
+    Args:
+        text (str): JSON text
+        strict (bool): Raise on invalid records
+
+    Returns:
+        List[ConformityRecord]: Parsed records
+
+    Raises:
+        ConformityParseError: If the JSON is invalid
+    """
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ConformityParseError(f"Invalid JSON: {e}") from e
+
+    items = data.get('records', []) if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        raise ConformityParseError("JSON response has no records list")
+
+    records = []
+    for item in items:
+        if not isinstance(item, dict):
+            raise ConformityParseError(f"Invalid JSON record: {item!r}")
+        records.append(build_record({str(key): str(value) for key, value in item.items()}, strict))
+    return records
+
+
+def parse_csv_records(text: str, strict: bool = True) -> List[ConformityRecord]:
+    """
+    Parse CSV rows into records.
+
+    Accepts the 11-column layout, the shortened 9- and 8-column layouts of the
+    prompt example, and an optional header row naming the columns.
+
+    Args:
+        text (str): CSV text
+        strict (bool): Raise on rows with an unknown number of cells or invalid values
+
+    Returns:
+        List[ConformityRecord]: Parsed records
+
+    Raises:
+        ConformityParseError: If strict and a row is invalid
+    """
+    layouts = {len(layout): layout for layout in (RESULT_COLUMNS, SHORT_COLUMNS_WITH_PAGE, SHORT_COLUMNS)}
+    header = None
+
+    records = []
+    for row in csv.reader(io.StringIO(text)):
+        if not row or not any(cell.strip() for cell in row):
+            continue
+        cells = [cell.strip() for cell in row]
+        if cells[0] in ('CID', 'Topic'):
+            header = cells
+            continue
+
+        columns = header if header and len(header) == len(cells) else layouts.get(len(cells))
+        if columns is None:
+            if strict:
+                raise ConformityParseError(f"Unexpected number of columns ({len(cells)}): {row!r}")
+            continue
+        records.append(build_record(dict(zip(columns, cells)), strict))
+    return records
+
+
+def parse_conformity_response(response: str, strict: bool = True) -> List[ConformityRecord]:
+    """
+    Parse a conformity check response (CSV or JSON) into records.
+
+    Args:
+        response (str): LLM response
+        strict (bool): Raise on malformed content; otherwise skip what cannot be parsed
+
+    Returns:
+        List[ConformityRecord]: Parsed records (empty if no data was found)
+
+    Raises:
+        ConformityParseError: If strict and the response is an error or malformed
+    """
+    if not response or not response.strip():
+        return []
+    if response.startswith("Error"):
+        if strict:
+            raise ConformityParseError(response)
+        return []
+
+    text = strip_code_fences(response).strip()
+    try:
+        if text.startswith(('{', '[')):
+            return parse_json_records(text, strict)
+        return parse_csv_records(text, strict)
+    except (ConformityParseError, csv.Error) as e:
+        if strict:
+            raise ConformityParseError(str(e)) from e
+        return []
+
+
+def create_repair_prompt(response: str, error: str) -> str:
+    """
+    Create a short prompt asking the model to fix a malformed response.
+
+    Only the broken output is sent, not the rapport, so the repair call is cheap.
+
+    Args:
+        response (str): Malformed response
+        error (str): Parse error message
+
+    Returns:
+        str: Repair prompt
+    """
+    return f"""The following output should be CSV rows with exactly these 11 columns:
+{",".join(RESULT_COLUMNS)}
+
+It could not be parsed: {error}
+
+Rewrite it as valid CSV rows with the 11 columns, quoting cells that contain commas.
+Page is a page number, Complete is TRUE or FALSE. Do not add a header row, data or explanations.
+
+OUTPUT TO FIX:
+{response}
+"""
+
+
+def repair_response(client: Any, model_name: str, response: str, error: str,
+                    max_tokens: int = 1000) -> str:
+    """
+    Ask the model to reformat a malformed response.
+
+    Args:
+        client (Any): OpenAI client
+        model_name (str): Model to use
+        response (str): Malformed response
+        error (str): Parse error message
+        max_tokens (int): Maximum tokens for the repaired output
+
+    Returns:
+        str: Repaired response (or an "Error: ..." string)
+    """
+    return simple_query(
+        client=client,
+        model_name=model_name,
+        prompt=create_repair_prompt(response, error),
+        temperature=0.0,
+        max_tokens=max_tokens
+    )
+
+
+def apply_requirement_defaults(records: List[ConformityRecord], requirement: Any) -> List[ConformityRecord]:
+    """
+    Fill Topic, Metric and Code from the requirement row where the model left them empty.
+
+    Args:
+        records (List[ConformityRecord]): Parsed records (updated in place)
+        requirement (Any): Requirement row (dict); other types are ignored
+
+    Returns:
+        List[ConformityRecord]: The same records
+    """
+    if not isinstance(requirement, dict):
+        return records
+    row = {str(key).upper(): str(value).strip() for key, value in requirement.items() if value}
+    for record in records:
+        record.topic = record.topic or row.get('TOPIC', '')
+        record.metric = record.metric or row.get('METRIC', '')
+        record.code = record.code or row.get('CODE', '')
+    return records
+
+
+def records_to_csv(records: List[ConformityRecord], header: bool = True) -> str:
+    """
+    Serialize records to CSV text with the 11 output columns.
+
+    Args:
+        records (List[ConformityRecord]): Records to write
+        header (bool): Include the header row
+
+    Returns:
+        str: CSV text
+    """
+    output = io.StringIO()
+    writer = csv.writer(output, lineterminator="\n")
+    if header:
+        writer.writerow(RESULT_COLUMNS)
+    writer.writerows(record.to_row() for record in records)
+    return output.getvalue()
@@ -5,81 +5,336 @@ Simple PDF Table Detection Script
 Reads PDF files from data/ directory and uses LLM to find pages with tables.
 Returns a list of page numbers where tables are found.
 
+Pages are first scored locally (PyMuPDF table finder, ruling lines, column
+alignment); only pages whose score is ambiguous are sent to the LLM.
+
 Usage: python table_detector.py
 """
 
 import os
+import re
+import json
 import sys
 import logging
+from collections import Counter
 from pathlib import Path
 import fitz  # PyMuPDF
 
 # Add the parent directory to the path to import client modules
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', '..'))
 
-from client.llm_client import create_client, simple_query, get_config
+from client.llm_client import create_client, simple_query, get_config, get_cache_stats, count_tokens, truncate_to_tokens
+from pdf_image import PDFDocumentSession
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Pages scoring at or above HIGH are tables, at or below LOW are not; the rest go to the LLM
+TABLE_CONFIDENCE_HIGH = 0.75
+TABLE_CONFIDENCE_LOW = 0.2
+
+# Tokens of page text sent to the LLM per page (about the former 2000 characters)
+PAGE_EXCERPT_TOKENS = 500
+
+NUMERIC_WORD = re.compile(r'^[(\-–+]?\d[\d\s.,%]*\)?%?$')
+
+# A complete YES/NO word, i.e. followed by something that is not a letter
+YES_NO_ANSWER = re.compile(r'\b(YES|NO)\b(?=[^A-Z])')
+
+
+def count_ruling_lines(page) -> tuple:
+    """Count horizontal and vertical ruling lines drawn on a page"""
+    horizontal = vertical = 0
+    for drawing in page.get_drawings():
+        for item in drawing['items']:
+            if item[0] == 'l':
+                start, end = item[1], item[2]
+                if abs(start.y - end.y) < 1 and abs(start.x - end.x) > 20:
+                    horizontal += 1
+                elif abs(start.x - end.x) < 1 and abs(start.y - end.y) > 10:
+                    vertical += 1
+            elif item[0] == 're':
+                # Thin rectangles are commonly used as table rules
+                rect = item[1]
+                if rect.height < 2 and rect.width > 20:
+                    horizontal += 1
+                elif rect.width < 2 and rect.height > 10:
+                    vertical += 1
+    return horizontal, vertical
+
+
+def measure_column_alignment(words: list) -> tuple:
+    """Count text rows split into 3+ cells and the cell start positions shared by 3+ such rows"""
+    rows = {}
+    for word in words:
+        rows.setdefault(round(word[3] / 3), []).append(word)
+    
+    tabular_rows = 0
+    cell_starts = Counter()
+    for row_words in rows.values():
+        row_words.sort(key=lambda word: word[0])
+        starts = [row_words[0][0]]
+        for previous, current in zip(row_words, row_words[1:]):
+            if current[0] - previous[2] > 12:
+                starts.append(current[0])
+        if len(starts) >= 3:
+            tabular_rows += 1
+            cell_starts.update(round(x / 4) for x in starts)
+    
+    aligned_columns = sum(1 for count in cell_starts.values() if count >= 3)
+    return tabular_rows, aligned_columns
+
+
+def analyze_table_signals(page) -> dict:
+    """Score how likely a page contains a table from local layout signals only.
+    
+    Returns a dict with the individual signal scores (finder, grid, alignment,
+    numeric) and the combined 'confidence' between 0 and 1.
+    """
+    # PyMuPDF's own table finder
+    finder_score = 0.0
+    try:
+        tables = page.find_tables().tables
+    except Exception as e:
+        logger.debug(f"find_tables failed on page {page.number + 1}: {e}")
+        tables = []
+    for table in tables:
+        if table.row_count >= 3 and table.col_count >= 3:
+            finder_score = max(finder_score, 0.85)
+        elif table.row_count >= 2 and table.col_count >= 2:
+            finder_score = max(finder_score, 0.5)
+    
+    # Drawing geometry: grids, or at least several horizontal rules
+    horizontal, vertical = count_ruling_lines(page)
+    if horizontal >= 3 and vertical >= 3:
+        grid_score = min(1.0, (horizontal + vertical) / 40)
+    elif horizontal >= 5:
+        grid_score = min(0.6, horizontal / 20)
+    else:
+        grid_score = 0.0
+    
+    # Text laid out in aligned columns
+    words = page.get_text("words")
+    tabular_rows, aligned_columns = measure_column_alignment(words)
+    alignment_score = min(1.0, tabular_rows / 10) if aligned_columns >= 3 else 0.0
+    
+    numeric_ratio = sum(1 for word in words if NUMERIC_WORD.match(word[4])) / len(words) if words else 0.0
+    
+    combined = 0.45 * grid_score + 0.4 * alignment_score + 0.15 * min(1.0, numeric_ratio * 4)
+    confidence = max(finder_score, combined)
+    # Independent signals agreeing make the finder result near certain
+    if finder_score and (grid_score >= 0.3 or alignment_score >= 0.3):
+        confidence = max(confidence, 0.95)
+    
+    return {
+        'finder': finder_score,
+        'grid': grid_score,
+        'alignment': alignment_score,
+        'numeric': numeric_ratio,
+        'confidence': confidence
+    }
+
+
+def mock_classify_page(text: str) -> bool:
+    """Mock LLM - simulate table detection based on text patterns"""
+    has_table_indicators = any(indicator in text.lower() for indicator in [
+        'table', 'tabular', 'rows', 'columns', 'data', 'statistics', 
+        'financial', 'metrics', 'kpi', 'summary', 'report'
+    ])
+    print(f"   🔍 Mock analysis: {'Table indicators found' if has_table_indicators else 'No table indicators'}")
+    return has_table_indicators
+
+
+def page_excerpt(text: str) -> str:
+    """Start of a page's text sent to the LLM, cut at PAGE_EXCERPT_TOKENS tokens"""
+    return truncate_to_tokens(text, PAGE_EXCERPT_TOKENS)
+
+
+def answered_yes_no(text: str) -> bool:
+    """Stop condition for streamed single-page verdicts: a YES or NO word has been received"""
+    return YES_NO_ANSWER.search(text.upper()) is not None
 
-def detect_tables_in_pdf(pdf_path: Path, llm_client, model_name: str) -> list:
-    """Detect tables in a PDF file and return list of page numbers with tables"""
+
+def json_array_closed(text: str) -> bool:
+    """Stop condition for streamed batched verdicts: the JSON array has been closed"""
+    start = text.find('[')
+    return start != -1 and ']' in text[start:]
+
+
+def classify_page(llm_client, model_name: str, pdf_path: Path, page_number: int, text: str) -> bool:
+    """Ask the LLM whether a single page contains tables"""
+    prompt = f"""Analyze this text from page {page_number} of PDF "{pdf_path.name}" and determine if it contains tables.
+
+Look for tabular data, rows/columns, structured data, financial data, or statistics.
+
+Text: {page_excerpt(text)}
+
+Respond with only "YES" if tables are present, or "NO" if no tables found."""
+    
+    # Streamed so the request stops as soon as the verdict is in, whatever the model adds after it
+    response = simple_query(llm_client, model_name, prompt, temperature=0.1, max_tokens=10,
+                            stop_condition=answered_yes_no)
+    match = YES_NO_ANSWER.search(response.strip().upper() + "\n")
+    return match is not None and match.group(1) == "YES"
+
+
+def classify_pages_batch(llm_client, model_name: str, pdf_path: Path, pages: list) -> dict:
+    """Ask the LLM about several pages in one prompt.
+    
+    Args:
+        pages: List of (page_number, text) tuples
+    
+    Returns a dict mapping page number to True/False, or None when the
+    response is not a valid JSON verdict for every page.
+    """
+    excerpts = "\n\n".join(
+        f"=== PAGE {page_number} ===\n{page_excerpt(text)}" for page_number, text in pages
+    )
+    prompt = f"""Analyze these text excerpts from {len(pages)} pages of PDF "{pdf_path.name}" and determine, for each page, if it contains tables.
+
+Look for tabular data, rows/columns, structured data, financial data, or statistics.
+
+{excerpts}
+
+Respond with only a JSON array containing one object per page, for example:
+[{{"page": {pages[0][0]}, "has_table": true}}]"""
+    
+    response = simple_query(llm_client, model_name, prompt, temperature=0.1, max_tokens=20 * len(pages) + 20,
+                            stop_condition=json_array_closed)
+    
+    try:
+        verdicts = json.loads(response[response.index('['):response.rindex(']') + 1])
+        results = {int(item['page']): item['has_table'] for item in verdicts}
+    except (ValueError, TypeError, KeyError) as e:
+        logger.warning(f"Could not parse batched verdicts for pages {[p for p, _ in pages]}: {e}")
+        return None
+    
+    expected = {page_number for page_number, _ in pages}
+    if set(results) != expected or not all(isinstance(value, bool) for value in results.values()):
+        logger.warning(f"Batched verdicts do not cover pages {sorted(expected)}: {results}")
+        return None
+    return results
+
+
+def make_batches(pages: list, batch_size: int, max_batch_tokens: int) -> list:
+    """Group (page_number, text) tuples into batches bounded by page count and prompt size"""
+    batches = []
+    current = []
+    current_tokens = 0
+    for page_number, text in pages:
+        # Excerpt plus its "=== PAGE n ===" header
+        page_tokens = count_tokens(page_excerpt(text)) + 10
+        if current and (len(current) >= batch_size or current_tokens + page_tokens > max_batch_tokens):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append((page_number, text))
+        current_tokens += page_tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def detect_tables_in_pdf(pdf_path: Path, llm_client, model_name: str, session: PDFDocumentSession = None,
+                         use_heuristics: bool = True, batch_size: int = 1, max_batch_tokens: int = 6000,
+                         page_numbers: list = None, decisions: dict = None) -> list:
+    """Detect tables in a PDF file and return list of page numbers with tables.
+    
+    Pass an open PDFDocumentSession to reuse the document (and its cached page
+    text) across agents; otherwise the PDF is opened once for this call.
+    With use_heuristics, clearly tabular or clearly prose pages are decided
+    locally and only ambiguous pages are sent to the LLM.
+    With batch_size > 1, ambiguous pages are classified several per LLM call
+    (bounded by max_batch_tokens), falling back to one call per page when a
+    batched response cannot be parsed.
+    Pass page_numbers (1-indexed) to analyze only those pages, e.g. the pages a
+    resumed run has not finished yet; decisions, when given, is filled with
+    page number -> has table for every page decided (failed pages are left out).
+    """
+    if session is None:
+        with PDFDocumentSession(pdf_path, cache_images=False) as own_session:
+            return detect_tables_in_pdf(pdf_path, llm_client, model_name, own_session,
+                                        use_heuristics, batch_size, max_batch_tokens, page_numbers, decisions)
+    
     logger.info(f"Analyzing {pdf_path.name} for tables...")
     
     try:
-        # Open PDF to get page count
-        pdf_document = fitz.open(pdf_path)
-        page_count = pdf_document.page_count
-        pdf_document.close()
+        page_count = session.page_count
+        if page_numbers is None:
+            page_numbers = range(1, page_count + 1)
+        if decisions is None:
+            decisions = {}
         
-        logger.info(f"Processing {page_count} pages in {pdf_path.name}")
+        logger.info(f"Processing {len(page_numbers)} of {page_count} pages in {pdf_path.name}")
         
         pages_with_tables = []
+        pending = []
+        decided_locally = 0
         
-        for page_num in range(page_count):
+        for page_num in [number - 1 for number in page_numbers]:
             logger.info(f"Processing page {page_num + 1}/{page_count}")
             
             # Extract text from page
-            pdf_document = fitz.open(pdf_path)
-            page = pdf_document[page_num]
-            text = page.get_text()
-            pdf_document.close()
+            text = session.get_page_text(page_num + 1)
             
             if not text.strip():
                 logger.warning(f"Page {page_num + 1} has no text content")
+                decisions[page_num + 1] = False
                 continue
             
-            # Ask LLM if page has tables
-            prompt = f"""Analyze this text from page {page_num + 1} of PDF "{pdf_path.name}" and determine if it contains tables.
-
-Look for tabular data, rows/columns, structured data, financial data, or statistics.
-
-Text: {text[:2000]}
-
-Respond with only "YES" if tables are present, or "NO" if no tables found."""
-            
-            try:
-                if llm_client is None:
-                    # Mock LLM - simulate table detection based on text patterns
-                    has_table_indicators = any(indicator in text.lower() for indicator in [
-                        'table', 'tabular', 'rows', 'columns', 'data', 'statistics', 
-                        'financial', 'metrics', 'kpi', 'summary', 'report'
-                    ])
-                    response_clean = "YES" if has_table_indicators else "NO"
-                    print(f"   🔍 Mock analysis: {'Table indicators found' if has_table_indicators else 'No table indicators'}")
-                else:
-                    response = simple_query(llm_client, model_name, prompt, temperature=0.1, max_tokens=10)
-                    response_clean = response.strip().upper()
-                
-                if "YES" in response_clean:
+            if use_heuristics:
+                signals = analyze_table_signals(session.get_page(page_num + 1))
+                confidence = signals['confidence']
+                if confidence >= TABLE_CONFIDENCE_HIGH:
                     pages_with_tables.append(page_num + 1)
-                    logger.info(f"Table found on page {page_num + 1}")
-                
-            except Exception as e:
-                logger.error(f"Error analyzing page {page_num + 1}: {e}")
+                    decisions[page_num + 1] = True
+                    decided_locally += 1
+                    logger.info(f"Table found on page {page_num + 1} (local confidence {confidence:.2f})")
+                    continue
+                if confidence <= TABLE_CONFIDENCE_LOW:
+                    decisions[page_num + 1] = False
+                    decided_locally += 1
+                    logger.debug(f"No table on page {page_num + 1} (local confidence {confidence:.2f})")
+                    continue
+                logger.info(f"Page {page_num + 1} is ambiguous (local confidence {confidence:.2f}), asking LLM")
+            
+            pending.append((page_num + 1, text))
+        
+        # Ask LLM about the remaining pages
+        if llm_client is not None and batch_size > 1:
+            batches = make_batches(pending, batch_size, max_batch_tokens)
+        else:
+            batches = [[page] for page in pending]
+        
+        for batch in batches:
+            verdicts = None
+            if llm_client is not None and len(batch) > 1:
+                try:
+                    verdicts = classify_pages_batch(llm_client, model_name, pdf_path, batch)
+                except Exception as e:
+                    logger.error(f"Error analyzing pages {[p for p, _ in batch]} in batch: {e}")
+            
+            if verdicts is None:
+                verdicts = {}
+                for page_number, text in batch:
+                    try:
+                        if llm_client is None:
+                            verdicts[page_number] = mock_classify_page(text)
+                        else:
+                            verdicts[page_number] = classify_page(llm_client, model_name, pdf_path, page_number, text)
+                    except Exception as e:
+                        logger.error(f"Error analyzing page {page_number}: {e}")
+            
+            for page_number, has_table in verdicts.items():
+                decisions[page_number] = bool(has_table)
+                if has_table:
+                    pages_with_tables.append(page_number)
+                    logger.info(f"Table found on page {page_number}")
         
+        pages_with_tables.sort()
+        if use_heuristics:
+            logger.info(f"Decided {decided_locally}/{len(page_numbers)} pages locally without the LLM")
         logger.info(f"Found tables on {len(pages_with_tables)} pages: {pages_with_tables}")
         return pages_with_tables
         
@@ -125,16 +380,23 @@ def main():
         llm_client = None
         model_name = "mock-llm"
     
+    # Number of ambiguous pages classified per LLM call
+    batch_size = int(os.getenv('TABLE_DETECTION_BATCH_SIZE', '8'))
+    
     # Process each PDF
     print("\n📊 Analyzing PDFs...")
     for pdf_file in pdf_files:
         print(f"\n📄 {pdf_file.name}")
-        pages_with_tables = detect_tables_in_pdf(pdf_file, llm_client, model_name)
+        pages_with_tables = detect_tables_in_pdf(pdf_file, llm_client, model_name, batch_size=batch_size)
         
         if pages_with_tables:
             print(f"   ✅ Tables found on pages: {', '.join(map(str, pages_with_tables))}")
         else:
             print(f"   ❌ No tables found")
+    
+    cache_stats = get_cache_stats()
+    if cache_stats:
+        print(f"\n💾 LLM cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
 
 
 if __name__ == "__main__":
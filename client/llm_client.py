@@ -4,23 +4,285 @@ Simple Python script to interact with OpenAI-compatible LLM endpoints.
 Supports configurable endpoint URL and model name using functional programming.
 """
 
+import io
 import os
+import re
+import math
+import time
 import base64
-from typing import Optional, Dict, Any, List, Union
-from openai import OpenAI
+import asyncio
+import logging
+import threading
+from typing import Optional, Dict, Any, List, Union, Callable, Iterator, Tuple
+import httpx
+from openai import OpenAI, AsyncOpenAI, DefaultHttpxClient
 
+try:
+    from .response_cache import ResponseCache, make_cache_key
+except ImportError:
+    # Imported as a top-level module with the client directory on sys.path
+    from response_cache import ResponseCache, make_cache_key
 
-def create_client(endpoint_url: str, model_name: str, api_key: Optional[str] = None) -> OpenAI:
+try:
+    from .resilience import (
+        RetryPolicy, EndpointControl, AdaptiveConcurrencyLimiter, call_with_retries, acall_with_retries
+    )
+except ImportError:
+    from resilience import (
+        RetryPolicy, EndpointControl, AdaptiveConcurrencyLimiter, call_with_retries, acall_with_retries
+    )
+
+try:
+    from .telemetry import REGISTRY as _telemetry
+except ImportError:
+    from telemetry import REGISTRY as _telemetry
+
+try:
+    from .load_balancer import LoadBalancedClient, AsyncLoadBalancedClient, is_multi_endpoint
+except ImportError:
+    from load_balancer import LoadBalancedClient, AsyncLoadBalancedClient, is_multi_endpoint
+
+logger = logging.getLogger(__name__)
+
+# Process-wide registry of pooled clients, keyed by (endpoint, api_key)
+_shared_clients: Dict[tuple, OpenAI] = {}
+_shared_clients_lock = threading.Lock()
+
+# Opt-in response cache, see enable_response_cache()
+_response_cache: Optional[ResponseCache] = None
+_cache_max_temperature = 0.3
+# Guards enabling and disabling the cache; reentrant as the lazy enable calls enable_response_cache
+_cache_lock = threading.RLock()
+
+# Process-wide request counters, see get_usage_stats()
+_USAGE_KEYS = ('calls', 'errors', 'retries', 'cache_hits', 'prompt_tokens', 'completion_tokens', 'total_tokens')
+_usage_stats: Dict[str, int] = dict.fromkeys(_USAGE_KEYS, 0)
+_usage_lock = threading.Lock()
+
+# Retry and rate limiting settings, see configure_resilience()
+_retry_policy = RetryPolicy(max_retries=int(os.getenv('LLM_MAX_RETRIES', '3')))
+_rate_limit_settings: Dict[str, Any] = {
+    'requests_per_second': float(os.getenv('LLM_RATE_LIMIT_RPS', '0')) or None,
+    'adaptive_concurrency': os.getenv('LLM_ADAPTIVE_CONCURRENCY', 'false').lower() in ('1', 'true', 'yes'),
+    'initial_concurrency': 8,
+    'max_concurrency': 64,
+    'latency_tolerance': 2.0
+}
+_endpoint_controls: Dict[str, EndpointControl] = {}
+_endpoint_controls_lock = threading.Lock()
+
+# Prompt size limits, see configure_token_budget(); Qwen 2.5 VL serves a 32k context
+_token_settings: Dict[str, Any] = {
+    'context_tokens': int(os.getenv('LLM_CONTEXT_TOKENS', '32768')),
+    'run_budget': int(os.getenv('LLM_RUN_TOKEN_BUDGET', '0')) or None,
+    # Qwen 2.5 VL caps an image at 1280 visual tokens by default (max_pixels = 1280 * 28 * 28)
+    'image_tokens': int(os.getenv('LLM_IMAGE_TOKENS', '1280'))
+}
+# Token counter set by set_tokenizer(); None uses approximate_token_count
+_tokenizer: Optional[Callable[[str], int]] = None
+_tokenizer_loaded = False
+
+# Tokens added per chat message by the chat template (role markers and separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+# Smallest completion worth sending a request for
+MIN_COMPLETION_TOKENS = 16
+
+_TOKEN_PIECE = re.compile(r"[^\W\d_]+|\d|[^\w\s]|_", re.UNICODE)
+
+
+def create_client(endpoint_url: Union[str, List[str]], model_name: str, api_key: Optional[str] = None) -> OpenAI:
     """
     Create an OpenAI client with custom endpoint configuration.
     
     Args:
-        endpoint_url (str): The base URL of the OpenAI-compatible endpoint
+        endpoint_url (Union[str, List[str]]): The base URL of the OpenAI-compatible endpoint, or
+            several endpoints (list or comma-separated, optional "|weight" suffix) to load balance
+        model_name (str): The name of the model to use
+        api_key (str, optional): API key for authentication. If None, will try to get from environment
+        
+    Returns:
+        OpenAI: Configured OpenAI client (a LoadBalancedClient for several endpoints)
+    """
+    if is_multi_endpoint(endpoint_url):
+        return LoadBalancedClient(endpoint_url, lambda url: create_client(url, model_name, api_key),
+                                  endpoint_control=_endpoint_control)
+    
+    clean_endpoint, final_api_key = _resolve_endpoint(endpoint_url, api_key)
+    
+    # Create and return the client
+    # Retries are handled by chat_completion (see configure_resilience)
+    return OpenAI(
+        base_url=clean_endpoint,
+        api_key=final_api_key,
+        max_retries=0
+    )
+
+
+def create_async_client(endpoint_url: Union[str, List[str]], model_name: str,
+                        api_key: Optional[str] = None) -> AsyncOpenAI:
+    """
+    Create an asyncio OpenAI client with custom endpoint configuration.
+    
+    Args:
+        endpoint_url (Union[str, List[str]]): The base URL of the OpenAI-compatible endpoint, or
+            several endpoints (list or comma-separated, optional "|weight" suffix) to load balance
         model_name (str): The name of the model to use
         api_key (str, optional): API key for authentication. If None, will try to get from environment
         
     Returns:
-        OpenAI: Configured OpenAI client
+        AsyncOpenAI: Configured asyncio OpenAI client (an AsyncLoadBalancedClient for several endpoints)
+    """
+    if is_multi_endpoint(endpoint_url):
+        return AsyncLoadBalancedClient(endpoint_url, lambda url: create_async_client(url, model_name, api_key),
+                                       endpoint_control=_endpoint_control)
+    
+    clean_endpoint, final_api_key = _resolve_endpoint(endpoint_url, api_key)
+    
+    return AsyncOpenAI(
+        base_url=clean_endpoint,
+        api_key=final_api_key,
+        max_retries=0
+    )
+
+
+def get_pool_config() -> Dict[str, Any]:
+    """
+    Get connection pool settings for shared clients from the environment.
+    
+    Returns:
+        Dict containing max_connections, max_keepalive_connections, keepalive_expiry,
+        http2, timeout and connect_timeout
+    """
+    return {
+        'max_connections': int(os.getenv('LLM_POOL_MAX_CONNECTIONS', '32')),
+        'max_keepalive_connections': int(os.getenv('LLM_POOL_MAX_KEEPALIVE', '16')),
+        'keepalive_expiry': float(os.getenv('LLM_POOL_KEEPALIVE_EXPIRY', '60')),
+        'http2': os.getenv('LLM_HTTP2', 'false').lower() in ('1', 'true', 'yes'),
+        'timeout': float(os.getenv('LLM_TIMEOUT', '600')),
+        'connect_timeout': float(os.getenv('LLM_CONNECT_TIMEOUT', '10'))
+    }
+
+
+def get_shared_client(endpoint_url: Union[str, List[str]],
+                      api_key: Optional[str] = None,
+                      max_connections: Optional[int] = None,
+                      max_keepalive_connections: Optional[int] = None,
+                      keepalive_expiry: Optional[float] = None,
+                      http2: Optional[bool] = None,
+                      timeout: Optional[float] = None,
+                      connect_timeout: Optional[float] = None) -> OpenAI:
+    """
+    Get a process-wide OpenAI client for an endpoint, creating it on first use.
+    
+    Clients are keyed by (endpoint, api_key) and keep their HTTP connection pool
+    alive between calls, so repeated requests reuse warm TCP connections.
+    Pool settings only apply when the client is first created; unset values
+    fall back to get_pool_config(). HTTP/2 requires the optional 'h2' package.
+    
+    Several endpoints (list or comma-separated) give a shared LoadBalancedClient over
+    the shared clients of each endpoint; LLM_HEALTH_CHECK_INTERVAL enables its
+    background health checks.
+    
+    Args:
+        endpoint_url (Union[str, List[str]]): The base URL of the OpenAI-compatible endpoint, or several
+        api_key (str, optional): API key for authentication. If None, will try to get from environment
+        max_connections (int, optional): Maximum number of concurrent connections
+        max_keepalive_connections (int, optional): Maximum number of idle connections kept alive
+        keepalive_expiry (float, optional): Seconds an idle connection is kept alive
+        http2 (bool, optional): Whether to negotiate HTTP/2
+        timeout (float, optional): Overall request timeout in seconds
+        connect_timeout (float, optional): Connection timeout in seconds
+        
+    Returns:
+        OpenAI: Shared OpenAI client
+    """
+    if is_multi_endpoint(endpoint_url):
+        key = (str(endpoint_url), api_key)
+        with _shared_clients_lock:
+            client = _shared_clients.get(key)
+        if client is not None:
+            return client
+        
+        options = {
+            'max_connections': max_connections,
+            'max_keepalive_connections': max_keepalive_connections,
+            'keepalive_expiry': keepalive_expiry,
+            'http2': http2,
+            'timeout': timeout,
+            'connect_timeout': connect_timeout
+        }
+        # Endpoint clients are created outside the lock, get_shared_client takes it for each
+        balancer = LoadBalancedClient(endpoint_url, lambda url: get_shared_client(url, api_key, **options),
+                                      endpoint_control=_endpoint_control)
+        with _shared_clients_lock:
+            client = _shared_clients.setdefault(key, balancer)
+        if client is balancer and os.getenv('LLM_HEALTH_CHECK_INTERVAL'):
+            balancer.start_health_checks(float(os.getenv('LLM_HEALTH_CHECK_INTERVAL')))
+        return client
+    
+    clean_endpoint, final_api_key = _resolve_endpoint(endpoint_url, api_key)
+    key = (clean_endpoint, final_api_key)
+    
+    with _shared_clients_lock:
+        client = _shared_clients.get(key)
+        if client is not None:
+            return client
+        
+        pool_config = get_pool_config()
+        overrides = {
+            'max_connections': max_connections,
+            'max_keepalive_connections': max_keepalive_connections,
+            'keepalive_expiry': keepalive_expiry,
+            'http2': http2,
+            'timeout': timeout,
+            'connect_timeout': connect_timeout
+        }
+        pool_config.update({name: value for name, value in overrides.items() if value is not None})
+        
+        http_client = DefaultHttpxClient(
+            limits=httpx.Limits(
+                max_connections=pool_config['max_connections'],
+                max_keepalive_connections=pool_config['max_keepalive_connections'],
+                keepalive_expiry=pool_config['keepalive_expiry']
+            ),
+            timeout=httpx.Timeout(pool_config['timeout'], connect=pool_config['connect_timeout']),
+            http2=pool_config['http2']
+        )
+        
+        client = OpenAI(
+            base_url=clean_endpoint,
+            api_key=final_api_key,
+            http_client=http_client,
+            max_retries=0
+        )
+        _shared_clients[key] = client
+        return client
+
+
+def close_shared_clients() -> None:
+    """
+    Close every client in the shared registry and release its connections.
+    """
+    with _shared_clients_lock:
+        for client in _shared_clients.values():
+            if isinstance(client, LoadBalancedClient):
+                client.stop_health_checks()
+            else:
+                client.close()
+        _shared_clients.clear()
+
+
+def _resolve_endpoint(endpoint_url: str, api_key: Optional[str]) -> tuple:
+    """
+    Normalize the endpoint URL and resolve the API key to use for it.
+    
+    Args:
+        endpoint_url (str): The base URL of the OpenAI-compatible endpoint
+        api_key (str, optional): API key for authentication. If None, will try to get from environment
+        
+    Returns:
+        tuple: (clean endpoint URL, API key)
     """
     # Clean endpoint URL
     clean_endpoint = endpoint_url.rstrip('/')
@@ -33,11 +295,30 @@ def create_client(endpoint_url: str, model_name: str, api_key: Optional[str] = N
     if final_api_key is None and ('localhost' in clean_endpoint or '127.0.0.1' in clean_endpoint or '148.253.83.132' in clean_endpoint):
         final_api_key = ""
     
-    # Create and return the client
-    return OpenAI(
-        base_url=clean_endpoint,
-        api_key=final_api_key
-    )
+    return clean_endpoint, final_api_key
+
+
+def _format_completion_response(response) -> Dict[str, Any]:
+    """
+    Convert an OpenAI chat completion object into the result dictionary used by this module.
+    
+    Args:
+        response: ChatCompletion returned by the OpenAI client
+        
+    Returns:
+        Dict containing success flag, content, usage, model and finish_reason
+    """
+    return {
+        'success': True,
+        'content': response.choices[0].message.content,
+        'usage': {
+            'prompt_tokens': response.usage.prompt_tokens,
+            'completion_tokens': response.usage.completion_tokens,
+            'total_tokens': response.usage.total_tokens
+        },
+        'model': response.model,
+        'finish_reason': response.choices[0].finish_reason
+    }
 
 
 def chat_completion(client: OpenAI, 
@@ -55,38 +336,241 @@ def chat_completion(client: OpenAI,
         messages (List[Dict]): List of message dictionaries with 'role' and 'content'
         temperature (float): Sampling temperature (0.0 to 2.0)
         max_tokens (int): Maximum number of tokens to generate
-        **kwargs: Additional parameters to pass to the API
+        **kwargs: Additional parameters to pass to the API. stream=True, on_delta or
+            stop_condition switch to stream_chat_completion
         
     Returns:
         Dict containing the response from the LLM
     """
+    stream = kwargs.pop('stream', False)
+    on_delta = kwargs.pop('on_delta', None)
+    stop_condition = kwargs.pop('stop_condition', None)
+    if stream or on_delta or stop_condition:
+        return stream_chat_completion(client, model_name, messages, temperature, max_tokens,
+                                      on_delta=on_delta, stop_condition=stop_condition, **kwargs)
+    
+    start = time.perf_counter()
+    cache_key = _cache_lookup_key(model_name, messages, temperature, max_tokens, **kwargs)
+    if cache_key is not None:
+        cached = _response_cache.get(cache_key)
+        if cached is not None:
+            _record_usage(cached, cache_hit=True, start=start, messages=messages)
+            return dict(cached, cached=True)
+    
+    max_tokens, budget_error = _apply_token_budget(messages, max_tokens)
+    if budget_error:
+        result = {'success': False, 'error': budget_error, 'content': None}
+        _record_usage(result, start=start, messages=messages)
+        return result
+    
     try:
-        response = client.chat.completions.create(
+        response = call_with_retries(
+            lambda: client.chat.completions.create(
+                model=model_name,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                **kwargs
+            ),
+            _retry_policy,
+            _endpoint_control(client),
+            _record_retry
+        )
+        
+        result = _format_completion_response(response)
+        
+    except Exception as e:
+        result = {
+            'success': False,
+            'error': str(e),
+            'content': None
+        }
+        _record_usage(result, start=start, messages=messages)
+        return result
+    
+    _record_usage(result, start=start, messages=messages)
+    if cache_key is not None:
+        _response_cache.put(cache_key, result)
+    return result
+
+
+def iter_chat_completion(client: OpenAI,
+                         model_name: str,
+                         messages: List[Dict[str, Any]],
+                         temperature: float = 0.7,
+                         max_tokens: int = 1000,
+                         result: Optional[Dict[str, Any]] = None,
+                         **kwargs) -> Iterator[str]:
+    """
+    Stream a chat completion, yielding content deltas as they arrive.
+    
+    Closing the generator early (e.g. breaking out of the loop) closes the HTTP
+    stream, which makes the server stop decoding. Opening the stream is retried
+    like chat_completion; errors after the first delta end the stream. The
+    endpoint's concurrency slot is held until the stream ends, and the limiter
+    sees the full duration of the stream.
+    
+    Args:
+        client (OpenAI): The OpenAI client instance
+        model_name (str): The name of the model to use
+        messages (List[Dict]): List of message dictionaries with 'role' and 'content'
+        temperature (float): Sampling temperature (0.0 to 2.0)
+        max_tokens (int): Maximum number of tokens to generate
+        result (Dict, optional): Filled when the stream ends with the same keys as
+            chat_completion plus ttft, tokens_per_second and duration (seconds)
+        **kwargs: Additional parameters to pass to the API
+        
+    Yields:
+        str: Content deltas
+    """
+    result = {} if result is None else result
+    kwargs.setdefault('stream_options', {'include_usage': True})
+    
+    start = time.perf_counter()
+    first_token_at = None
+    stream = None
+    parts = []
+    usage = None
+    model = model_name
+    finish_reason = None
+    error = None
+    control = _endpoint_control(client)
+    opened_at = None
+    
+    def open_stream():
+        nonlocal opened_at
+        opened_at = time.monotonic()
+        return client.chat.completions.create(
             model=model_name,
             messages=messages,
             temperature=temperature,
             max_tokens=max_tokens,
+            stream=True,
             **kwargs
         )
+    
+    try:
+        max_tokens, budget_error = _apply_token_budget(messages, max_tokens)
+        if budget_error:
+            raise ValueError(budget_error)
         
-        return {
-            'success': True,
-            'content': response.choices[0].message.content,
-            'usage': {
-                'prompt_tokens': response.usage.prompt_tokens,
-                'completion_tokens': response.usage.completion_tokens,
-                'total_tokens': response.usage.total_tokens
-            },
-            'model': response.model,
-            'finish_reason': response.choices[0].finish_reason
-        }
+        stream = call_with_retries(open_stream, _retry_policy, control, _record_retry, hold=True)
+        
+        for chunk in stream:
+            model = getattr(chunk, 'model', None) or model
+            if getattr(chunk, 'usage', None):
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            finish_reason = choice.finish_reason or finish_reason
+            delta = choice.delta.content if choice.delta else None
+            if delta:
+                if first_token_at is None:
+                    first_token_at = time.perf_counter()
+                parts.append(delta)
+                yield delta
         
     except Exception as e:
-        return {
-            'success': False,
-            'error': str(e),
-            'content': None
-        }
+        error = e
+    finally:
+        if stream is not None:
+            try:
+                stream.close()
+            finally:
+                if control is not None:
+                    control.after_request(time.monotonic() - opened_at, error)
+        
+        end = time.perf_counter()
+        if error is not None:
+            result.update({'success': False, 'error': str(error), 'content': None})
+        else:
+            # Servers that ignore stream_options send no usage: count one token per delta
+            completion_tokens = usage.completion_tokens if usage else len(parts)
+            prompt_tokens = usage.prompt_tokens if usage else 0
+            decode_time = end - first_token_at if first_token_at is not None else 0.0
+            result.update({
+                'success': True,
+                'content': ''.join(parts),
+                'usage': {
+                    'prompt_tokens': prompt_tokens,
+                    'completion_tokens': completion_tokens,
+                    'total_tokens': prompt_tokens + completion_tokens
+                },
+                'model': model,
+                'finish_reason': finish_reason or 'cancelled',
+                'ttft': round(first_token_at - start, 3) if first_token_at is not None else None,
+                'tokens_per_second': round(completion_tokens / decode_time, 1) if decode_time > 0 else None,
+                'duration': round(end - start, 3)
+            })
+            logger.debug(f"Streamed {completion_tokens} tokens, TTFT {result['ttft']}s, "
+                         f"{result['tokens_per_second']} tokens/s")
+        _record_usage(result, start=start, messages=messages)
+
+
+def stream_chat_completion(client: OpenAI,
+                           model_name: str,
+                           messages: List[Dict[str, Any]],
+                           temperature: float = 0.7,
+                           max_tokens: int = 1000,
+                           on_delta: Optional[Callable[[str], None]] = None,
+                           stop_condition: Optional[Callable[[str], bool]] = None,
+                           **kwargs) -> Dict[str, Any]:
+    """
+    Send a streaming chat completion request, optionally stopping as soon as the
+    response is good enough.
+    
+    Args:
+        client (OpenAI): The OpenAI client instance
+        model_name (str): The name of the model to use
+        messages (List[Dict]): List of message dictionaries with 'role' and 'content'
+        temperature (float): Sampling temperature (0.0 to 2.0)
+        max_tokens (int): Maximum number of tokens to generate
+        on_delta (Callable, optional): Called with each content delta
+        stop_condition (Callable, optional): Called with the content received so far;
+            returning True closes the stream (finish_reason 'stop_condition')
+        **kwargs: Additional parameters to pass to the API
+        
+    Returns:
+        Dict containing the response from the LLM, with ttft, tokens_per_second and duration
+    """
+    # A response cut by a stop condition is complete for that condition only, so the
+    # condition is part of the cache key and early-stopped verdicts are cached too
+    start = time.perf_counter()
+    key_params = kwargs
+    if stop_condition is not None:
+        key_params = dict(kwargs, stop_condition=f"{getattr(stop_condition, '__module__', '')}."
+                                                 f"{getattr(stop_condition, '__qualname__', repr(stop_condition))}")
+    cache_key = _cache_lookup_key(model_name, messages, temperature, max_tokens, **key_params)
+    if cache_key is not None:
+        cached = _response_cache.get(cache_key)
+        if cached is not None:
+            _record_usage(cached, cache_hit=True, start=start, messages=messages)
+            if on_delta is not None:
+                on_delta(cached['content'])
+            return dict(cached, cached=True)
+    
+    result = {}
+    content = ''
+    stopped = False
+    deltas = iter_chat_completion(client, model_name, messages, temperature, max_tokens, result, **kwargs)
+    try:
+        for delta in deltas:
+            content += delta
+            if on_delta is not None:
+                on_delta(delta)
+            if stop_condition is not None and stop_condition(content):
+                stopped = True
+                break
+    finally:
+        deltas.close()
+    
+    if stopped:
+        result['finish_reason'] = 'stop_condition'
+    if cache_key is not None and result.get('success'):
+        _response_cache.put(cache_key, {key: result[key] for key in
+                                        ('success', 'content', 'usage', 'model', 'finish_reason')})
+    return result
 
 
 def simple_query(client: OpenAI, model_name: str, prompt: str, **kwargs) -> str:
@@ -147,28 +631,117 @@ def create_image_message(image_path: str, text: str = "", detail: str = "auto")
         text (str): Optional text content to accompany the image
         detail (str): Level of detail for image analysis ("low", "high", or "auto")
         
+    Returns:
+        Dict: Message dictionary with image content, labelled with the image's actual MIME type
+    """
+    with open(image_path, "rb") as image_file:
+        return create_image_message_from_data(image_file.read(), text, detail)
+
+
+def encode_image_bytes_to_base64(image_data: bytes) -> str:
+    """
+    Encode raw image bytes to base64 string for API transmission.
+    
+    Args:
+        image_data (bytes): Encoded image bytes (PNG, JPEG, ...)
+        
+    Returns:
+        str: Base64 encoded image string
+    """
+    return base64.b64encode(image_data).decode('utf-8')
+
+
+def detect_image_mime_type(image_data: bytes) -> str:
+    """
+    Detect the MIME type of encoded image bytes from their signature.
+    
+    Args:
+        image_data (bytes): Encoded image bytes
+        
+    Returns:
+        str: MIME type such as "image/png"; defaults to "image/jpeg" when unknown
+    """
+    if image_data.startswith(b'\x89PNG\r\n\x1a\n'):
+        return "image/png"
+    if image_data.startswith(b'GIF8'):
+        return "image/gif"
+    if image_data[:4] == b'RIFF' and image_data[8:12] == b'WEBP':
+        return "image/webp"
+    if image_data.startswith(b'BM'):
+        return "image/bmp"
+    return "image/jpeg"
+
+
+def image_to_bytes(image: Any, image_format: str = "png") -> bytes:
+    """
+    Encode an in-memory image to bytes without touching the filesystem.
+    
+    Args:
+        image: Raw encoded bytes, a fitz.Pixmap or a PIL.Image.Image
+        image_format (str): Output format used for pixmaps and PIL images ("png" or "jpeg")
+        
+    Returns:
+        bytes: Encoded image bytes
+        
+    Raises:
+        TypeError: If the image type is not supported
+    """
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return bytes(image)
+    
+    # fitz.Pixmap renders directly to PNG/JPEG bytes
+    if hasattr(image, 'tobytes') and hasattr(image, 'samples'):
+        return image.tobytes("jpg" if image_format.lower() in ("jpg", "jpeg") else image_format)
+    
+    # PIL.Image.Image
+    if hasattr(image, 'save'):
+        buffer = io.BytesIO()
+        pil_format = "JPEG" if image_format.lower() in ("jpg", "jpeg") else image_format.upper()
+        image.save(buffer, format=pil_format)
+        return buffer.getvalue()
+    
+    raise TypeError(f"Unsupported image type: {type(image).__name__}")
+
+
+def create_image_message_from_data(image: Any,
+                                   text: str = "",
+                                   detail: str = "auto",
+                                   image_format: str = "png") -> Dict[str, Any]:
+    """
+    Create a multimodal message from an in-memory image instead of a file path.
+    
+    Args:
+        image: Raw encoded bytes, a fitz.Pixmap, a PIL.Image.Image, an object with a
+            `data` bytes attribute (pdf_image.PageImage), or a list of those (e.g. page tiles,
+            sent in order)
+        text (str): Optional text content to accompany the image
+        detail (str): Level of detail for image analysis ("low", "high", or "auto")
+        image_format (str): Encoding used for pixmaps and PIL images ("png" or "jpeg")
+        
     Returns:
         Dict: Message dictionary with image content
     """
-    base64_image = encode_image_to_base64(image_path)
+    images = image if isinstance(image, (list, tuple)) else [image]
     
     content = []
     
-    # Add text content if provided
     if text:
         content.append({
             "type": "text",
             "text": text
         })
     
-    # Add image content
-    content.append({
-        "type": "image_url",
-        "image_url": {
-            "url": f"data:image/jpeg;base64,{base64_image}",
-            "detail": detail
-        }
-    })
+    for item in images:
+        image_data = image_to_bytes(getattr(item, 'data', item), image_format)
+        mime_type = detect_image_mime_type(image_data)
+        base64_image = encode_image_bytes_to_base64(image_data)
+        content.append({
+            "type": "image_url",
+            "image_url": {
+                "url": f"data:{mime_type};base64,{base64_image}",
+                "detail": detail
+            }
+        })
     
     return {
         "role": "user",
@@ -192,38 +765,13 @@ def multimodal_chat_completion(client: OpenAI,
                               Content can include text and/or images
         temperature (float): Sampling temperature (0.0 to 2.0)
         max_tokens (int): Maximum number of tokens to generate
-        **kwargs: Additional parameters to pass to the API
+        **kwargs: Additional parameters to pass to the API (stream=True, on_delta and
+                  stop_condition stream the response, see stream_chat_completion)
         
     Returns:
         Dict containing the response from the LLM
     """
-    try:
-        response = client.chat.completions.create(
-            model=model_name,
-            messages=messages,
-            temperature=temperature,
-            max_tokens=max_tokens,
-            **kwargs
-        )
-        
-        return {
-            'success': True,
-            'content': response.choices[0].message.content,
-            'usage': {
-                'prompt_tokens': response.usage.prompt_tokens,
-                'completion_tokens': response.usage.completion_tokens,
-                'total_tokens': response.usage.total_tokens
-            },
-            'model': response.model,
-            'finish_reason': response.choices[0].finish_reason
-        }
-        
-    except Exception as e:
-        return {
-            'success': False,
-            'error': str(e),
-            'content': None
-        }
+    return chat_completion(client, model_name, messages, temperature, max_tokens, **kwargs)
 
 
 def analyze_image(client: OpenAI, model_name: str, image_path: str, prompt: str = "Describe this image in detail.", **kwargs) -> str:
@@ -257,16 +805,625 @@ def analyze_image(client: OpenAI, model_name: str, image_path: str, prompt: str
         return f"Error processing image: {str(e)}"
 
 
+def analyze_image_data(client: OpenAI, model_name: str, image: Any, prompt: str = "Describe this image in detail.", **kwargs) -> str:
+    """
+    Analyze an in-memory image with a text prompt using the LLM.
+    
+    Args:
+        client (OpenAI): The OpenAI client instance
+        model_name (str): The name of the model to use
+        image: Raw encoded bytes, a fitz.Pixmap or a PIL.Image.Image
+        prompt (str): Text prompt for image analysis
+        **kwargs: Additional parameters for multimodal_chat_completion
+        
+    Returns:
+        str: The response content from the LLM, or error message
+    """
+    try:
+        messages = [create_image_message_from_data(image, prompt)]
+        
+        response = multimodal_chat_completion(client, model_name, messages, **kwargs)
+        
+        if response['success']:
+            return response['content']
+        else:
+            return f"Error: {response['error']}"
+            
+    except Exception as e:
+        return f"Error processing image: {str(e)}"
+
+
+async def achat_completion(client: AsyncOpenAI,
+                           model_name: str,
+                           messages: List[Dict[str, str]],
+                           temperature: float = 0.7,
+                           max_tokens: int = 1000,
+                           **kwargs) -> Dict[str, Any]:
+    """
+    Asyncio counterpart of chat_completion.
+    
+    Args:
+        client (AsyncOpenAI): The asyncio OpenAI client instance
+        model_name (str): The name of the model to use
+        messages (List[Dict]): List of message dictionaries with 'role' and 'content'
+        temperature (float): Sampling temperature (0.0 to 2.0)
+        max_tokens (int): Maximum number of tokens to generate
+        **kwargs: Additional parameters to pass to the API
+        
+    Returns:
+        Dict containing the response from the LLM
+    """
+    start = time.perf_counter()
+    cache_key = _cache_lookup_key(model_name, messages, temperature, max_tokens, **kwargs)
+    if cache_key is not None:
+        cached = _response_cache.get(cache_key)
+        if cached is not None:
+            _record_usage(cached, cache_hit=True, start=start, messages=messages)
+            return dict(cached, cached=True)
+    
+    max_tokens, budget_error = _apply_token_budget(messages, max_tokens)
+    if budget_error:
+        result = {'success': False, 'error': budget_error, 'content': None}
+        _record_usage(result, start=start, messages=messages)
+        return result
+    
+    try:
+        response = await acall_with_retries(
+            lambda: client.chat.completions.create(
+                model=model_name,
+                messages=messages,
+                temperature=temperature,
+                max_tokens=max_tokens,
+                **kwargs
+            ),
+            _retry_policy,
+            _endpoint_control(client),
+            _record_retry
+        )
+        
+        result = _format_completion_response(response)
+        
+    except Exception as e:
+        result = {
+            'success': False,
+            'error': str(e),
+            'content': None
+        }
+        _record_usage(result, start=start, messages=messages)
+        return result
+    
+    _record_usage(result, start=start, messages=messages)
+    if cache_key is not None:
+        _response_cache.put(cache_key, result)
+    return result
+
+
+async def amultimodal_chat_completion(client: AsyncOpenAI,
+                                      model_name: str,
+                                      messages: List[Dict[str, Any]],
+                                      temperature: float = 0.7,
+                                      max_tokens: int = 1000,
+                                      **kwargs) -> Dict[str, Any]:
+    """
+    Asyncio counterpart of multimodal_chat_completion.
+    
+    Args:
+        client (AsyncOpenAI): The asyncio OpenAI client instance
+        model_name (str): The name of the model to use
+        messages (List[Dict]): List of message dictionaries with 'role' and 'content'
+                              Content can include text and/or images
+        temperature (float): Sampling temperature (0.0 to 2.0)
+        max_tokens (int): Maximum number of tokens to generate
+        **kwargs: Additional parameters to pass to the API
+        
+    Returns:
+        Dict containing the response from the LLM
+    """
+    return await achat_completion(client, model_name, messages, temperature, max_tokens, **kwargs)
+
+
+async def gather_completions(client: AsyncOpenAI,
+                             model_name: str,
+                             requests: List[Dict[str, Any]],
+                             max_concurrency: int = 4) -> List[Dict[str, Any]]:
+    """
+    Run many chat completion requests concurrently with a bound on in-flight requests.
+    
+    Each request is a dictionary with a 'messages' key plus any keyword arguments
+    accepted by achat_completion (temperature, max_tokens, ...). Text-only and
+    multimodal messages can be mixed freely.
+    
+    Args:
+        client (AsyncOpenAI): The asyncio OpenAI client instance
+        model_name (str): The name of the model to use
+        requests (List[Dict]): Request dictionaries, each containing 'messages'
+        max_concurrency (int): Maximum number of requests in flight at once
+        
+    Returns:
+        List[Dict]: Result dictionaries in the same order as the input requests
+    """
+    if max_concurrency < 1:
+        raise ValueError(f"max_concurrency must be at least 1, got {max_concurrency}")
+    
+    semaphore = asyncio.Semaphore(max_concurrency)
+    
+    async def run_one(request: Dict[str, Any]) -> Dict[str, Any]:
+        params = dict(request)
+        messages = params.pop('messages')
+        async with semaphore:
+            return await achat_completion(client, model_name, messages, **params)
+    
+    return await asyncio.gather(*(run_one(request) for request in requests))
+
+
+def run_completions(endpoint_url: str,
+                    model_name: str,
+                    requests: List[Dict[str, Any]],
+                    api_key: Optional[str] = None,
+                    max_concurrency: int = 4) -> List[Dict[str, Any]]:
+    """
+    Synchronous entry point for gather_completions, for use from the agent scripts.
+    
+    Args:
+        endpoint_url (str): The base URL of the OpenAI-compatible endpoint
+        model_name (str): The name of the model to use
+        requests (List[Dict]): Request dictionaries, each containing 'messages'
+        api_key (str, optional): API key for authentication
+        max_concurrency (int): Maximum number of requests in flight at once
+        
+    Returns:
+        List[Dict]: Result dictionaries in the same order as the input requests
+    """
+    async def run() -> List[Dict[str, Any]]:
+        client = create_async_client(endpoint_url, model_name, api_key)
+        try:
+            return await gather_completions(client, model_name, requests, max_concurrency)
+        finally:
+            await client.close()
+    
+    return asyncio.run(run())
+
+
+def enable_response_cache(db_path: Optional[str] = None,
+                          max_bytes: int = 512 * 1024 * 1024,
+                          ttl: Optional[float] = 7 * 24 * 3600,
+                          max_temperature: float = 0.3) -> ResponseCache:
+    """
+    Turn on the content-addressed response cache for every completion call.
+    
+    Only successful responses to requests with temperature <= max_temperature are
+    cached, so sampling-heavy calls keep their variety.
+    
+    Args:
+        db_path (str, optional): SQLite database path. Defaults to LLM_CACHE_PATH or .llm_cache/responses.sqlite
+        max_bytes (int): Maximum size of stored responses before LRU eviction
+        ttl (float, optional): Seconds before an entry expires, or None to never expire
+        max_temperature (float): Highest temperature whose responses are cached
+        
+    Returns:
+        ResponseCache: The active cache
+    """
+    global _response_cache, _cache_max_temperature
+    
+    with _cache_lock:
+        if _response_cache is not None:
+            _response_cache.close()
+        
+        path = db_path or os.getenv('LLM_CACHE_PATH', os.path.join('.llm_cache', 'responses.sqlite'))
+        _response_cache = ResponseCache(path, max_bytes=max_bytes, ttl=ttl)
+        _cache_max_temperature = max_temperature
+        return _response_cache
+
+
+def disable_response_cache() -> None:
+    """
+    Turn off the response cache and close its database.
+    """
+    global _response_cache
+    
+    with _cache_lock:
+        if _response_cache is not None:
+            _response_cache.close()
+            _response_cache = None
+
+
+def get_cache_stats() -> Optional[Dict[str, Any]]:
+    """
+    Get hit/miss statistics of the response cache.
+    
+    Returns:
+        Dict with cache statistics, or None if the cache is disabled
+    """
+    if _response_cache is None:
+        return None
+    return _response_cache.stats()
+
+
+def get_usage_stats() -> Dict[str, int]:
+    """
+    Get the number of chat completion calls, errors, cache hits and tokens since
+    the last reset (cached responses count as calls but not as tokens).
+    
+    Returns:
+        Dict with calls, errors, cache_hits, prompt_tokens, completion_tokens and total_tokens
+    """
+    with _usage_lock:
+        return dict(_usage_stats)
+
+
+def reset_usage_stats() -> None:
+    """
+    Reset the counters returned by get_usage_stats.
+    """
+    with _usage_lock:
+        _usage_stats.update(dict.fromkeys(_USAGE_KEYS, 0))
+
+
+def _record_usage(result: Dict[str, Any],
+                  cache_hit: bool = False,
+                  start: Optional[float] = None,
+                  messages: Optional[List[Dict[str, Any]]] = None) -> None:
+    """
+    Add a completion result to the usage counters and to the telemetry registry.
+    """
+    usage = result.get('usage') or {}
+    with _usage_lock:
+        _usage_stats['calls'] += 1
+        if cache_hit:
+            _usage_stats['cache_hits'] += 1
+        elif not result.get('success'):
+            _usage_stats['errors'] += 1
+        else:
+            for key in ('prompt_tokens', 'completion_tokens', 'total_tokens'):
+                _usage_stats[key] += usage.get(key) or 0
+    
+    if start is None:
+        return
+    outcome = 'cache_hit' if cache_hit else ('success' if result.get('success') else 'error')
+    counted = outcome == 'success'
+    _telemetry.record(
+        'llm_call',
+        time.perf_counter() - start,
+        outcome,
+        _payload_bytes(messages) if messages else 0,
+        (usage.get('prompt_tokens') or 0) if counted else 0,
+        (usage.get('completion_tokens') or 0) if counted else 0,
+        model=result.get('model') or '',
+        streamed='ttft' in result
+    )
+    if counted and result.get('ttft') is not None:
+        _telemetry.observe('llm_time_to_first_token_seconds', result['ttft'],
+                           "Time to first token of streamed completions")
+    if counted and result.get('tokens_per_second'):
+        _telemetry.observe('llm_decode_tokens_per_second', result['tokens_per_second'],
+                           "Decode throughput of streamed completions")
+
+
+def _payload_bytes(messages: List[Dict[str, Any]]) -> int:
+    """
+    Approximate request size: text and base64 image URLs of every message.
+    """
+    size = 0
+    for message in messages:
+        content = message.get('content')
+        parts = content if isinstance(content, list) else [content]
+        for part in parts:
+            if isinstance(part, str):
+                size += len(part.encode('utf-8'))
+            elif isinstance(part, dict):
+                size += len(part.get('text') or '') + len((part.get('image_url') or {}).get('url') or '')
+    return size
+
+
+def configure_resilience(max_retries: int = 3,
+                         base_delay: float = 0.5,
+                         max_delay: float = 30.0,
+                         requests_per_second: Optional[float] = None,
+                         adaptive_concurrency: bool = False,
+                         initial_concurrency: int = 8,
+                         max_concurrency: int = 64,
+                         latency_tolerance: float = 2.0) -> None:
+    """
+    Configure retries and rate limiting for all chat completions.
+    
+    Transient errors (connection errors, timeouts, 408/409/429/5xx) are retried with
+    jittered exponential backoff, honouring Retry-After; other errors fail at once.
+    Rate limits apply per endpoint. Defaults come from LLM_MAX_RETRIES,
+    LLM_RATE_LIMIT_RPS and LLM_ADAPTIVE_CONCURRENCY at import time.
+    
+    Args:
+        max_retries (int): Retries after the first attempt (0 disables retrying)
+        base_delay (float): Backoff ceiling of the first retry, in seconds
+        max_delay (float): Upper bound of any backoff, in seconds
+        requests_per_second (float, optional): Token-bucket rate per endpoint (None for unlimited)
+        adaptive_concurrency (bool): Limit in-flight requests per endpoint, shrinking the
+            limit when latency climbs or the server reports overload
+        initial_concurrency (int): Starting in-flight limit of the adaptive limiter
+        max_concurrency (int): Highest in-flight limit of the adaptive limiter
+        latency_tolerance (float): Latency ratio to the best observed latency that counts as slow
+    """
+    global _retry_policy
+    
+    _retry_policy = RetryPolicy(max_retries=max_retries, base_delay=base_delay, max_delay=max_delay)
+    with _endpoint_controls_lock:
+        _rate_limit_settings.update({
+            'requests_per_second': requests_per_second,
+            'adaptive_concurrency': adaptive_concurrency,
+            'initial_concurrency': initial_concurrency,
+            'max_concurrency': max_concurrency,
+            'latency_tolerance': latency_tolerance
+        })
+        _endpoint_controls.clear()
+
+
+def get_concurrency_limits() -> Dict[str, int]:
+    """
+    Get the current adaptive concurrency limit of each endpoint.
+    
+    Returns:
+        Dict mapping endpoint URL to its in-flight request limit
+    """
+    with _endpoint_controls_lock:
+        return {endpoint: int(control.limiter.limit)
+                for endpoint, control in _endpoint_controls.items() if control.limiter is not None}
+
+
+def _endpoint_control(client: Any) -> Optional[EndpointControl]:
+    """
+    Get the rate limiting state of the endpoint a client talks to, or None if rate limiting is off.
+    
+    Load-balanced clients get None: they apply the state of each of their endpoints
+    around the requests they route to it.
+    """
+    settings = _rate_limit_settings
+    if not settings['requests_per_second'] and not settings['adaptive_concurrency']:
+        return None
+    if isinstance(client, (LoadBalancedClient, AsyncLoadBalancedClient)):
+        return None
+    
+    endpoint = str(getattr(client, 'base_url', ''))
+    with _endpoint_controls_lock:
+        control = _endpoint_controls.get(endpoint)
+        if control is None:
+            limiter = None
+            if settings['adaptive_concurrency']:
+                limiter = AdaptiveConcurrencyLimiter(
+                    initial=settings['initial_concurrency'],
+                    maximum=settings['max_concurrency'],
+                    tolerance=settings['latency_tolerance']
+                )
+            control = EndpointControl(settings['requests_per_second'], limiter)
+            _endpoint_controls[endpoint] = control
+        return control
+
+
+def _record_retry(error: Exception, delay: float) -> None:
+    """
+    Count a retried request in the usage counters.
+    """
+    with _usage_lock:
+        _usage_stats['retries'] += 1
+
+
+def set_tokenizer(tokenizer: Any = None) -> None:
+    """
+    Choose how tokens are counted for prompt budgets.
+    
+    Args:
+        tokenizer: None for the approximate counter, a callable returning the token
+            count of a text, an object with an encode() method (tiktoken encoding,
+            Hugging Face tokenizer), "tiktoken:<encoding>" or a Hugging Face model id.
+            The optional tiktoken/transformers packages are imported on demand.
+            Defaults to LLM_TOKENIZER when first needed.
+    """
+    global _tokenizer, _tokenizer_loaded
+    
+    if isinstance(tokenizer, str):
+        if tokenizer.startswith('tiktoken:'):
+            import tiktoken
+            tokenizer = tiktoken.get_encoding(tokenizer.split(':', 1)[1])
+        else:
+            from transformers import AutoTokenizer
+            tokenizer = AutoTokenizer.from_pretrained(tokenizer)
+    
+    if tokenizer is not None and hasattr(tokenizer, 'encode'):
+        encoder = tokenizer
+        tokenizer = lambda text: len(encoder.encode(text))
+    
+    _tokenizer = tokenizer
+    _tokenizer_loaded = True
+
+
+def approximate_token_count(text: str) -> int:
+    """
+    Fast tokenizer-free token estimate, deliberately on the high side.
+    
+    Words cost one token per 4 letters (at least one), every digit and
+    punctuation mark one token, which is how BPE vocabularies such as Qwen's
+    split French and English report text and figures.
+    
+    Args:
+        text (str): Text to measure
+        
+    Returns:
+        int: Estimated number of tokens
+    """
+    return sum(math.ceil(len(piece) / 4) for piece in _TOKEN_PIECE.findall(text))
+
+
+def count_tokens(text: str) -> int:
+    """
+    Count the tokens of a text with the configured tokenizer (see set_tokenizer).
+    
+    Args:
+        text (str): Text to measure
+        
+    Returns:
+        int: Number of tokens
+    """
+    if not _tokenizer_loaded:
+        try:
+            set_tokenizer(os.getenv('LLM_TOKENIZER') or None)
+        except Exception as e:
+            logger.warning(f"Could not load tokenizer {os.getenv('LLM_TOKENIZER')}, using the approximation: {e}")
+            set_tokenizer(None)
+    if not text:
+        return 0
+    return _tokenizer(text) if _tokenizer is not None else approximate_token_count(text)
+
+
+def estimate_message_tokens(messages: List[Dict[str, Any]]) -> int:
+    """
+    Estimate the prompt tokens of a chat request, images included.
+    
+    Args:
+        messages (List[Dict]): List of message dictionaries with 'role' and 'content'
+        
+    Returns:
+        int: Estimated prompt tokens
+    """
+    total = 0
+    for message in messages:
+        total += MESSAGE_OVERHEAD_TOKENS
+        content = message.get('content')
+        parts = content if isinstance(content, list) else [content]
+        for part in parts:
+            if isinstance(part, str):
+                total += count_tokens(part)
+            elif isinstance(part, dict):
+                if part.get('type') == 'image_url':
+                    total += _token_settings['image_tokens']
+                else:
+                    total += count_tokens(part.get('text') or '')
+    return total
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """
+    Cut a text to at most max_tokens tokens, at a word boundary when possible.
+    
+    The cut only depends on the text and the tokenizer, so the same input always
+    yields the same prompt (and the same response cache key).
+    
+    Args:
+        text (str): Text to trim
+        max_tokens (int): Token limit
+        
+    Returns:
+        str: The text itself when it fits, otherwise its longest fitting prefix
+    """
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    
+    # Longest prefix that fits (token counts grow with the prefix length)
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if count_tokens(text[:middle]) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    
+    # Prefer not to cut a word in half, unless that would drop most of the prefix
+    boundary = max(text.rfind(' ', 0, low + 1), text.rfind('\n', 0, low + 1))
+    if boundary > low * 0.8:
+        low = boundary
+    return text[:low].rstrip()
+
+
+def configure_token_budget(context_tokens: Optional[int] = None,
+                           run_budget: Optional[int] = None,
+                           image_tokens: Optional[int] = None) -> None:
+    """
+    Configure the prompt size checks applied before every chat completion.
+    
+    A request whose prompt leaves no room in the context fails without being
+    sent; max_tokens is lowered when prompt plus completion would overflow the
+    context (which servers otherwise handle by silently truncating the prompt).
+    The run budget stops new requests once the tokens used since
+    reset_usage_stats() plus the request would exceed it. Defaults come from
+    LLM_CONTEXT_TOKENS, LLM_RUN_TOKEN_BUDGET and LLM_IMAGE_TOKENS.
+    
+    Args:
+        context_tokens (int, optional): Context window of the served model
+        run_budget (int, optional): Total tokens allowed per run (0 disables the budget)
+        image_tokens (int, optional): Prompt tokens counted per image
+    """
+    if context_tokens is not None:
+        _token_settings['context_tokens'] = context_tokens
+    if run_budget is not None:
+        _token_settings['run_budget'] = run_budget or None
+    if image_tokens is not None:
+        _token_settings['image_tokens'] = image_tokens
+
+
+def get_context_limit() -> int:
+    """
+    Get the context window, in tokens, that prompts are checked against.
+    """
+    return _token_settings['context_tokens']
+
+
+def _apply_token_budget(messages: List[Dict[str, Any]], max_tokens: int) -> Tuple[int, Optional[str]]:
+    """
+    Check a request against the context window and the run budget.
+    
+    Returns:
+        Tuple of the max_tokens to send and an error message when the request must not be sent
+    """
+    prompt_tokens = estimate_message_tokens(messages)
+    context_tokens = _token_settings['context_tokens']
+    available = context_tokens - prompt_tokens
+    if available < MIN_COMPLETION_TOKENS:
+        return max_tokens, f"Prompt of ~{prompt_tokens} tokens does not fit the {context_tokens}-token context"
+    if max_tokens > available:
+        logger.warning(f"Lowering max_tokens from {max_tokens} to {available} to fit the "
+                       f"{context_tokens}-token context (prompt ~{prompt_tokens} tokens)")
+        max_tokens = available
+    
+    run_budget = _token_settings['run_budget']
+    if run_budget:
+        with _usage_lock:
+            used = _usage_stats['total_tokens']
+        if used + prompt_tokens + max_tokens > run_budget:
+            return max_tokens, (f"Run token budget of {run_budget} exhausted "
+                                f"({used} used, ~{prompt_tokens + max_tokens} requested)")
+    return max_tokens, None
+
+
+def _cache_lookup_key(model_name: str,
+                      messages: List[Dict[str, Any]],
+                      temperature: float,
+                      max_tokens: int,
+                      **kwargs) -> Optional[str]:
+    """
+    Compute the cache key for a request, or None if the request should bypass the cache.
+    """
+    if _response_cache is None and os.getenv('LLM_CACHE_PATH'):
+        # Threads starting together must not each open (and close) a cache
+        with _cache_lock:
+            if _response_cache is None:
+                enable_response_cache()
+    
+    if _response_cache is None or temperature > _cache_max_temperature or kwargs.get('stream'):
+        return None
+    return make_cache_key(model_name, messages, temperature, max_tokens, **kwargs)
+
+
 def get_config() -> Dict[str, str]:
     """
     Get configuration with default endpoint IP 148.253.83.132.
     Updated to use Qwen 2.5 VL model.
+    LLM_ENDPOINT_URLS (comma-separated, optional "|weight" suffix) takes precedence over
+    LLM_ENDPOINT_URL and makes the clients load balance across the listed servers.
     
     Returns:
         Dict containing endpoint_url, model_name, and api_key
     """
     return {
-        'endpoint_url': os.getenv('LLM_ENDPOINT_URL', 'http://148.253.83.132:11434/v1'),
+        'endpoint_url': os.getenv('LLM_ENDPOINT_URLS') or os.getenv('LLM_ENDPOINT_URL', 'http://148.253.83.132:11434/v1'),
         'model_name': os.getenv('LLM_MODEL_NAME', 'qwen2.5vl:32b'),
         'api_key': os.getenv('OPENAI_API_KEY')
     }
@@ -0,0 +1,439 @@
+"""
+Load balancing across several OpenAI-compatible inference servers.
+
+LoadBalancedClient and AsyncLoadBalancedClient expose the same
+`client.chat.completions.create(...)` interface as the OpenAI clients, so every
+function of llm_client accepts them. Requests go to the healthy endpoint with
+the fewest outstanding requests relative to its weight; transient failures
+fail over to the next endpoint and mark the failing one unhealthy for a while.
+Rate limits apply to each endpoint separately.
+"""
+
+import time
+import random
+import logging
+import threading
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+try:
+    from .resilience import is_retryable
+except ImportError:
+    from resilience import is_retryable
+
+logger = logging.getLogger(__name__)
+
+EndpointSpec = Union[str, List[Union[str, Tuple[str, float]]]]
+
+
+def parse_endpoints(endpoints: EndpointSpec) -> List[Tuple[str, float]]:
+    """
+    Parse an endpoint list into (url, weight) pairs.
+
+    Args:
+        endpoints: Comma-separated string ("http://a:11434/v1|2,http://b:8000/v1"),
+            or a list of URLs / "url|weight" strings / (url, weight) tuples. Weight defaults to 1.
+
+    Returns:
+        List of (url, weight)
+    """
+    items = endpoints.split(',') if isinstance(endpoints, str) else endpoints
+    parsed = []
+    for item in items:
+        if isinstance(item, (tuple, list)):
+            url, weight = item[0], float(item[1])
+        else:
+            url, _, weight_text = item.strip().partition('|')
+            weight = float(weight_text) if weight_text else 1.0
+        if url.strip():
+            if weight <= 0:
+                raise ValueError(f"Endpoint weight must be positive: {item}")
+            parsed.append((url.strip().rstrip('/'), weight))
+    return parsed
+
+
+def is_multi_endpoint(endpoint_url: Any) -> bool:
+    """
+    Check whether an endpoint argument names several endpoints.
+    """
+    if isinstance(endpoint_url, (list, tuple)):
+        return True
+    return isinstance(endpoint_url, str) and ',' in endpoint_url
+
+
+class Backend:
+    """
+    One endpoint of a load balancer with its routing statistics.
+    """
+
+    def __init__(self, url: str, weight: float, client: Any):
+        self.url = url
+        self.weight = weight
+        self.client = client
+        self.outstanding = 0
+        self.completed = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.total_latency = 0.0
+        self.unhealthy_until = 0.0
+
+    @property
+    def healthy(self) -> bool:
+        """Whether the endpoint is currently eligible for routing"""
+        return time.monotonic() >= self.unhealthy_until
+
+    def stats(self) -> Dict[str, Any]:
+        """Routing statistics of the endpoint"""
+        return {
+            'url': self.url,
+            'weight': self.weight,
+            'healthy': self.healthy,
+            'outstanding': self.outstanding,
+            'completed': self.completed,
+            'failures': self.failures,
+            'average_latency': round(self.total_latency / self.completed, 3) if self.completed else None
+        }
+
+
+class _StreamSlot:
+    """
+    Streaming response that keeps its endpoint slot until it is exhausted, fails or is closed.
+    """
+
+    def __init__(self, stream: Any, on_end: Callable[[Optional[Exception]], None]):
+        """
+        Args:
+            stream: Stream returned by the endpoint client
+            on_end: Called once with the error that ended the stream, or None
+        """
+        self._stream = stream
+        self._on_end = on_end
+        self._iterator = None
+        self._ended = False
+
+    def _end(self, error: Optional[Exception] = None) -> None:
+        if not self._ended:
+            self._ended = True
+            self._on_end(error)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._stream, name)
+
+
+class _TrackedStream(_StreamSlot):
+    """Synchronous stream wrapper"""
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> Any:
+        if self._iterator is None:
+            self._iterator = iter(self._stream)
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            self._end()
+            raise
+        except Exception as e:
+            self._end(e)
+            raise
+
+    def close(self) -> None:
+        try:
+            self._stream.close()
+        finally:
+            self._end()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class _AsyncTrackedStream(_StreamSlot):
+    """Asyncio stream wrapper"""
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> Any:
+        if self._iterator is None:
+            self._iterator = self._stream.__aiter__()
+        try:
+            return await self._iterator.__anext__()
+        except StopAsyncIteration:
+            self._end()
+            raise
+        except Exception as e:
+            self._end(e)
+            raise
+
+    async def close(self) -> None:
+        try:
+            await self._stream.close()
+        finally:
+            self._end()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+
+class _LoadBalancerBase:
+    """
+    Routing, health tracking and health checks shared by the sync and async clients.
+    """
+
+    def __init__(self, endpoints: EndpointSpec, client_factory: Callable[[str], Any],
+                 failure_threshold: int = 1, cooldown: float = 30.0,
+                 endpoint_control: Optional[Callable[[Any], Any]] = None):
+        """
+        Args:
+            endpoints: Endpoint list, see parse_endpoints
+            client_factory: Creates the OpenAI client of one endpoint URL
+            failure_threshold: Consecutive transient failures before an endpoint is marked unhealthy
+            cooldown: Seconds an unhealthy endpoint is skipped before being tried again
+            endpoint_control: Returns the rate limiting state (EndpointControl or None) of an
+                endpoint client, applied around every request sent to that endpoint
+        """
+        parsed = parse_endpoints(endpoints)
+        if not parsed:
+            raise ValueError("At least one endpoint is required")
+
+        self.backends = [Backend(url, weight, client_factory(url)) for url, weight in parsed]
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.endpoint_control = endpoint_control
+        self._lock = threading.Lock()
+        self._health_thread: Optional[threading.Thread] = None
+        self._stop_health = threading.Event()
+
+        # Identifies the balancer (shared client keys, logs); per-endpoint state uses backend.url
+        self.base_url = ",".join(backend.url for backend in self.backends)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _choose(self, exclude: set) -> Optional[Backend]:
+        """
+        Pick the endpoint with the fewest outstanding requests per unit of weight,
+        falling back to unhealthy endpoints when no healthy one is left.
+        """
+        with self._lock:
+            candidates = [backend for backend in self.backends if backend not in exclude]
+            healthy = [backend for backend in candidates if backend.healthy]
+            pool = healthy or candidates
+            if not pool:
+                return None
+            best_load = min((backend.outstanding + 1) / backend.weight for backend in pool)
+            choice = random.choice([backend for backend in pool
+                                    if (backend.outstanding + 1) / backend.weight == best_load])
+            choice.outstanding += 1
+            return choice
+
+    def _finish(self, backend: Backend, latency: float, error: Optional[Exception] = None) -> None:
+        """
+        Record the outcome of a request on an endpoint.
+        """
+        with self._lock:
+            backend.outstanding -= 1
+            if error is None:
+                backend.completed += 1
+                backend.total_latency += latency
+                backend.consecutive_failures = 0
+                backend.unhealthy_until = 0.0
+                return
+
+            if is_retryable(error):
+                backend.failures += 1
+                backend.consecutive_failures += 1
+                if backend.consecutive_failures >= self.failure_threshold:
+                    backend.unhealthy_until = time.monotonic() + self.cooldown
+                    logger.warning(f"Endpoint {backend.url} marked unhealthy for {self.cooldown:.0f}s: {error}")
+
+    def _release(self, backend: Backend) -> None:
+        """
+        Free an endpoint slot without recording an outcome (cancelled request).
+        """
+        with self._lock:
+            backend.outstanding -= 1
+
+    def _end_stream(self, backend: Backend, control: Any, start: float) -> Callable[[Optional[Exception]], None]:
+        """
+        Callback recording a streamed request once its stream ends, with the stream's full latency.
+        """
+        def on_end(error: Optional[Exception] = None) -> None:
+            latency = time.monotonic() - start
+            if control is not None:
+                control.after_request(latency, error)
+            self._finish(backend, latency, error)
+        return on_end
+
+    def _control(self, backend: Backend) -> Any:
+        """
+        Rate limiting state of an endpoint, or None when rate limiting is off.
+        """
+        return self.endpoint_control(backend.client) if self.endpoint_control is not None else None
+
+    def _set_health(self, backend: Backend, healthy: bool) -> None:
+        with self._lock:
+            if healthy:
+                backend.consecutive_failures = 0
+                backend.unhealthy_until = 0.0
+            else:
+                backend.unhealthy_until = time.monotonic() + self.cooldown
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """
+        Get routing statistics of every endpoint.
+
+        Returns:
+            One dictionary per endpoint (url, weight, healthy, outstanding, completed, failures, average_latency)
+        """
+        with self._lock:
+            return [backend.stats() for backend in self.backends]
+
+    def start_health_checks(self, interval: float = 15.0, timeout: float = 5.0) -> None:
+        """
+        Probe every endpoint's /models route in a background thread.
+
+        Args:
+            interval: Seconds between rounds of checks
+            timeout: Timeout of one probe in seconds
+        """
+        if self._health_thread is not None:
+            return
+        self._stop_health.clear()
+
+        def run():
+            import httpx
+
+            while not self._stop_health.wait(interval):
+                for backend in self.backends:
+                    try:
+                        response = httpx.get(f"{backend.url}/models", timeout=timeout)
+                        self._set_health(backend, response.status_code < 500)
+                    except httpx.HTTPError:
+                        self._set_health(backend, False)
+
+        self._health_thread = threading.Thread(target=run, daemon=True)
+        self._health_thread.start()
+
+    def stop_health_checks(self) -> None:
+        """
+        Stop the background health checks, waiting for a probe in progress.
+        """
+        self._stop_health.set()
+        if self._health_thread is not None:
+            self._health_thread.join()
+            self._health_thread = None
+
+    def _no_endpoint_error(self, last_error: Optional[Exception]) -> Exception:
+        return last_error or RuntimeError("No LLM endpoint available")
+
+
+class LoadBalancedClient(_LoadBalancerBase):
+    """
+    Synchronous client spreading chat completions over several endpoints.
+    """
+
+    def _create(self, **kwargs) -> Any:
+        """
+        Send a chat completion to the least loaded endpoint, failing over on transient errors.
+        """
+        tried = set()
+        last_error = None
+        while True:
+            backend = self._choose(tried)
+            if backend is None:
+                raise self._no_endpoint_error(last_error)
+            tried.add(backend)
+
+            control = self._control(backend)
+            if control is not None:
+                control.before_request()
+            start = time.monotonic()
+            try:
+                response = backend.client.chat.completions.create(**kwargs)
+            except BaseException as e:
+                latency = time.monotonic() - start
+                if control is not None:
+                    control.after_request(latency, e if isinstance(e, Exception) else None)
+                if not isinstance(e, Exception):
+                    self._release(backend)
+                    raise
+                self._finish(backend, latency, e)
+                if not is_retryable(e):
+                    raise
+                last_error = e
+                continue
+            if kwargs.get('stream'):
+                # The endpoint stays busy until the stream is consumed
+                return _TrackedStream(response, self._end_stream(backend, control, start))
+            latency = time.monotonic() - start
+            if control is not None:
+                control.after_request(latency)
+            self._finish(backend, latency)
+            return response
+
+    def close(self) -> None:
+        """
+        Stop health checks and close every endpoint client.
+        """
+        self.stop_health_checks()
+        for backend in self.backends:
+            backend.client.close()
+
+
+class AsyncLoadBalancedClient(_LoadBalancerBase):
+    """
+    Asyncio client spreading chat completions over several endpoints.
+    """
+
+    async def _create(self, **kwargs) -> Any:
+        """
+        Send a chat completion to the least loaded endpoint, failing over on transient errors.
+        """
+        tried = set()
+        last_error = None
+        while True:
+            backend = self._choose(tried)
+            if backend is None:
+                raise self._no_endpoint_error(last_error)
+            tried.add(backend)
+
+            control = self._control(backend)
+            if control is not None:
+                await control.abefore_request()
+            start = time.monotonic()
+            try:
+                response = await backend.client.chat.completions.create(**kwargs)
+            except BaseException as e:
+                latency = time.monotonic() - start
+                if control is not None:
+                    control.after_request(latency, e if isinstance(e, Exception) else None)
+                if not isinstance(e, Exception):
+                    self._release(backend)
+                    raise
+                self._finish(backend, latency, e)
+                if not is_retryable(e):
+                    raise
+                last_error = e
+                continue
+            if kwargs.get('stream'):
+                # The endpoint stays busy until the stream is consumed
+                return _AsyncTrackedStream(response, self._end_stream(backend, control, start))
+            latency = time.monotonic() - start
+            if control is not None:
+                control.after_request(latency)
+            self._finish(backend, latency)
+            return response
+
+    async def close(self) -> None:
+        """
+        Stop health checks and close every endpoint client.
+        """
+        self.stop_health_checks()
+        for backend in self.backends:
+            await backend.client.close()
@@ -0,0 +1,356 @@
+"""
+Retries and rate limiting for LLM requests.
+
+Provides jittered exponential backoff with retryable/fatal error classification,
+a per-endpoint token bucket and an adaptive (AIMD) concurrency limiter that
+shrinks when server latency climbs or the server reports overload.
+"""
+
+import time
+import random
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import openai
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limiting and server errors
+RETRYABLE_STATUS_CODES = {408, 409, 425, 429, 500, 502, 503, 504}
+
+# Statuses meaning the server is saturated, which also shrink the concurrency limit
+OVERLOAD_STATUS_CODES = {429, 503}
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    Classify an error raised by a completion request.
+
+    Args:
+        error (Exception): Exception raised by the OpenAI client
+
+    Returns:
+        bool: True for transient errors (connection problems, timeouts, 408/409/429/5xx),
+            False for fatal ones (bad request, authentication, unknown model, ...)
+    """
+    if isinstance(error, openai.APIConnectionError):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES
+    return False
+
+
+def is_overload(error: Exception) -> bool:
+    """
+    Check whether an error signals that the server is overloaded.
+    """
+    if isinstance(error, openai.APITimeoutError):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code in OVERLOAD_STATUS_CODES
+
+
+def retry_after_seconds(error: Exception) -> Optional[float]:
+    """
+    Read the Retry-After header of an HTTP error, if any.
+
+    Args:
+        error (Exception): Exception raised by the OpenAI client
+
+    Returns:
+        Optional[float]: Seconds to wait, or None
+    """
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    value = response.headers.get('retry-after')
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter.
+    """
+
+    def __init__(self, max_retries: int = 3, base_delay: float = 0.5, max_delay: float = 30.0):
+        """
+        Args:
+            max_retries (int): Retries after the first attempt (0 disables retrying)
+            base_delay (float): Backoff ceiling of the first retry, in seconds
+            max_delay (float): Upper bound of any backoff, in seconds
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Seconds to wait before a retry.
+
+        Args:
+            attempt (int): Number of the failed attempt (0 for the first one)
+            retry_after (float, optional): Delay requested by the server, honoured as a minimum
+
+        Returns:
+            float: Delay in seconds
+        """
+        ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+        delay = random.uniform(0, ceiling)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_delay))
+        return delay
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket; reserve() returns how long the caller must wait,
+    try_acquire() takes a token only when one is available.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """
+        Args:
+            rate (float): Requests allowed per second
+            capacity (float, optional): Burst size (default: one second worth, at least 1)
+        """
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        Take a token, going into debt if none is available.
+
+        Returns:
+            float: Seconds to wait before sending the request
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def try_acquire(self) -> Tuple[bool, float]:
+        """
+        Take a token if one is available, without going into debt.
+
+        Returns:
+            Tuple[bool, float]: Whether a token was taken, and the seconds until one is available
+        """
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return True, 0.0
+            return False, (1 - self.tokens) / self.rate
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD concurrency limit driven by observed latency.
+
+    The limit grows by one per window of successful requests while latency stays
+    within `tolerance` times the best latency seen, and is multiplied by `backoff`
+    when latency climbs above it or the server reports overload.
+    """
+
+    def __init__(self, initial: int = 8, minimum: int = 1, maximum: int = 64,
+                 tolerance: float = 2.0, backoff: float = 0.7):
+        """
+        Args:
+            initial (int): Starting concurrency limit
+            minimum (int): Lowest limit
+            maximum (int): Highest limit
+            tolerance (float): Latency ratio to the baseline above which the limit shrinks
+            backoff (float): Multiplicative decrease factor
+        """
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.baseline: Optional[float] = None
+        self.in_flight = 0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def try_acquire(self) -> bool:
+        """
+        Take a slot without waiting.
+        """
+        with self._condition:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self) -> None:
+        """
+        Wait for a free slot.
+        """
+        with self._condition:
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    async def aacquire(self) -> None:
+        """
+        Wait for a free slot without blocking the event loop.
+        """
+        while not self.try_acquire():
+            await asyncio.sleep(0.01)
+
+    def release(self, latency: float, overloaded: bool = False) -> None:
+        """
+        Free a slot and adapt the limit.
+
+        Args:
+            latency (float): Duration of the request in seconds
+            overloaded (bool): The request failed because the server is saturated
+        """
+        with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+
+            slow = self.baseline is not None and latency > self.baseline * self.tolerance
+            if overloaded or slow:
+                # Decrease at most once per baseline latency so one burst does not collapse the limit
+                if now - self._last_decrease > (self.baseline or latency):
+                    self.limit = max(self.minimum, self.limit * self.backoff)
+                    self._last_decrease = now
+                    logger.info(f"Concurrency limit lowered to {int(self.limit)} "
+                                f"({'overload' if overloaded else f'latency {latency:.2f}s'})")
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+            if not overloaded:
+                # Slowly forget the baseline so it follows genuine changes in request size
+                self.baseline = latency if self.baseline is None else min(latency, self.baseline * 1.01)
+            self._condition.notify_all()
+
+
+class EndpointControl:
+    """
+    Rate limiting state shared by all requests to one endpoint.
+    """
+
+    def __init__(self, requests_per_second: Optional[float] = None,
+                 limiter: Optional[AdaptiveConcurrencyLimiter] = None):
+        self.bucket = TokenBucket(requests_per_second) if requests_per_second else None
+        self.limiter = limiter
+
+    def before_request(self) -> None:
+        if self.bucket is not None:
+            wait = self.bucket.reserve()
+            if wait > 0:
+                time.sleep(wait)
+        if self.limiter is not None:
+            self.limiter.acquire()
+
+    async def abefore_request(self) -> None:
+        if self.bucket is not None:
+            wait = self.bucket.reserve()
+            if wait > 0:
+                await asyncio.sleep(wait)
+        if self.limiter is not None:
+            await self.limiter.aacquire()
+
+    def after_request(self, latency: float, error: Optional[Exception] = None) -> None:
+        if self.limiter is not None:
+            self.limiter.release(latency, overloaded=error is not None and is_overload(error))
+
+
+def call_with_retries(request: Callable[[], Any],
+                      policy: RetryPolicy,
+                      control: Optional[EndpointControl] = None,
+                      on_retry: Optional[Callable[[Exception, float], None]] = None,
+                      hold: bool = False) -> Any:
+    """
+    Run a request, retrying transient failures with backoff.
+
+    Args:
+        request (Callable): Function performing the request
+        policy (RetryPolicy): Retry settings
+        control (EndpointControl, optional): Rate limiting applied to every attempt
+        on_retry (Callable, optional): Called with (error, delay) before each retry
+        hold (bool): Keep the concurrency slot of the successful attempt; the caller
+            releases it with control.after_request once the response is consumed (streams)
+
+    Returns:
+        Any: The request result
+
+    Raises:
+        Exception: The last error when it is fatal or retries are exhausted
+    """
+    attempt = 0
+    while True:
+        if control is not None:
+            control.before_request()
+        start = time.monotonic()
+        try:
+            result = request()
+        except BaseException as e:
+            if not isinstance(e, Exception):
+                # Cancellation or interrupt: free the slot and stop
+                if control is not None:
+                    control.after_request(time.monotonic() - start)
+                raise
+            if control is not None:
+                control.after_request(time.monotonic() - start, e)
+            if attempt >= policy.max_retries or not is_retryable(e):
+                raise
+            delay = policy.delay(attempt, retry_after_seconds(e))
+            logger.warning(f"LLM request failed ({e}), retry {attempt + 1}/{policy.max_retries} in {delay:.1f}s")
+            if on_retry is not None:
+                on_retry(e, delay)
+            time.sleep(delay)
+            attempt += 1
+            continue
+        if control is not None and not hold:
+            control.after_request(time.monotonic() - start)
+        return result
+
+
+async def acall_with_retries(request: Callable[[], Awaitable[Any]],
+                             policy: RetryPolicy,
+                             control: Optional[EndpointControl] = None,
+                             on_retry: Optional[Callable[[Exception, float], None]] = None) -> Any:
+    """
+    Asyncio counterpart of call_with_retries.
+    """
+    attempt = 0
+    while True:
+        if control is not None:
+            await control.abefore_request()
+        start = time.monotonic()
+        try:
+            result = await request()
+        except BaseException as e:
+            if not isinstance(e, Exception):
+                # Cancellation or interrupt: free the slot and stop
+                if control is not None:
+                    control.after_request(time.monotonic() - start)
+                raise
+            if control is not None:
+                control.after_request(time.monotonic() - start, e)
+            if attempt >= policy.max_retries or not is_retryable(e):
+                raise
+            delay = policy.delay(attempt, retry_after_seconds(e))
+            logger.warning(f"LLM request failed ({e}), retry {attempt + 1}/{policy.max_retries} in {delay:.1f}s")
+            if on_retry is not None:
+                on_retry(e, delay)
+            await asyncio.sleep(delay)
+            attempt += 1
+            continue
+        if control is not None:
+            control.after_request(time.monotonic() - start)
+        return result
@@ -0,0 +1,193 @@
+"""
+Content-addressed response cache for LLM calls.
+
+Responses are stored in a local SQLite database keyed by a SHA-256 hash of the
+full request (model, messages including base64 image data, temperature,
+max_tokens and any extra parameters). Entries expire after a TTL and the
+least recently used entries are evicted once the store exceeds its size limit.
+"""
+
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Optional, Dict, Any, List
+
+
+def make_cache_key(model_name: str,
+                   messages: List[Dict[str, Any]],
+                   temperature: float,
+                   max_tokens: int,
+                   **kwargs) -> str:
+    """
+    Build the content hash identifying a chat completion request.
+
+    Args:
+        model_name (str): The name of the model
+        messages (List[Dict]): Request messages, including any image content parts
+        temperature (float): Sampling temperature
+        max_tokens (int): Maximum number of tokens to generate
+        **kwargs: Additional request parameters
+
+    Returns:
+        str: Hex SHA-256 digest of the canonical request
+    """
+    request = {
+        'model': model_name,
+        'messages': messages,
+        'temperature': temperature,
+        'max_tokens': max_tokens,
+        'params': kwargs
+    }
+    canonical = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    SQLite-backed LRU cache of LLM response dictionaries with TTL and size limits
+    """
+
+    def __init__(self, db_path: str, max_bytes: int = 512 * 1024 * 1024, ttl: Optional[float] = 7 * 24 * 3600):
+        """
+        Open (or create) the cache database
+
+        Args:
+            db_path: Path to the SQLite database file
+            max_bytes: Maximum total size of stored responses before LRU eviction
+            ttl: Seconds after which an entry expires, or None to keep entries forever
+        """
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, "
+            "response TEXT NOT NULL, "
+            "size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, "
+            "last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses (last_access)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached response
+
+        Args:
+            key: Request hash from make_cache_key
+
+        Returns:
+            The cached response dictionary, or None on a miss
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                self.misses += 1
+                return None
+
+            response, created_at = row
+            if self.ttl is not None and now - created_at > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._conn.commit()
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return json.loads(response)
+
+    def put(self, key: str, response: Dict[str, Any]) -> None:
+        """
+        Store a response and evict old entries if the size limit is exceeded
+
+        Args:
+            key: Request hash from make_cache_key
+            response: Response dictionary to store
+        """
+        payload = json.dumps(response, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, payload, len(payload.encode('utf-8')), now, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """
+        Drop expired entries, then least recently used entries until under max_bytes
+        """
+        if self.ttl is not None:
+            cursor = self._conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (time.time() - self.ttl,)
+            )
+            self.evictions += cursor.rowcount
+
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY last_access ASC"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """
+        Remove every entry from the cache
+        """
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get hit/miss counters and current store size
+
+        Returns:
+            Dictionary with hits, misses, hit_rate, evictions, entries and bytes
+        """
+        with self._lock:
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'entries': entries,
+            'bytes': total
+        }
+
+    def close(self) -> None:
+        """
+        Close the underlying database connection
+        """
+        with self._lock:
+            self._conn.close()
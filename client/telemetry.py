@@ -0,0 +1,343 @@
+"""
+In-process telemetry for LLM calls, PDF opening, page rendering and file writes.
+
+Every instrumented operation records its wall time, outcome, payload bytes and
+token counts into a process-wide registry of counters and histograms, plus a
+per-run event log. The registry can be dumped as a JSON/CSV report or served
+in Prometheus text format, which tells whether a slow run is bound by
+rendering, the network or decoding.
+"""
+
+import os
+import csv
+import json
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds, from a cached page render to a long vision completion
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Payload size buckets in bytes, from a short prompt to a high DPI page image
+BYTE_BUCKETS = (1e3, 1e4, 1e5, 5e5, 1e6, 2e6, 5e6, 1e7)
+
+EVENT_FIELDS = ('timestamp', 'operation', 'outcome', 'seconds', 'payload_bytes',
+                'prompt_tokens', 'completion_tokens', 'labels')
+
+
+class Counter:
+    """
+    Monotonic counter with optional labels.
+    """
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self.values: Dict[Tuple[Tuple[str, str], ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = tuple(sorted((name, str(value)) for name, value in labels.items()))
+        self.values[key] = self.values.get(key, 0.0) + amount
+
+
+class Histogram:
+    """
+    Cumulative histogram with optional labels, in the Prometheus layout.
+    """
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [count per bucket (last one is +Inf), sum, count]
+        self.values: Dict[Tuple[Tuple[str, str], ...], List[Any]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(sorted((name, str(label)) for name, label in labels.items()))
+        series = self.values.setdefault(key, [[0] * (len(self.buckets) + 1), 0.0, 0])
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+
+class MetricsRegistry:
+    """
+    Thread-safe registry of counters, histograms and the events of the current run.
+    """
+
+    def __init__(self, max_events: int = 100000):
+        """
+        Args:
+            max_events: Events kept for the per-run report (oldest ones are dropped)
+        """
+        self.max_events = max_events
+        self.started = time.time()
+        self.events: List[Dict[str, Any]] = []
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str = "") -> Counter:
+        """Get or create a counter"""
+        with self._lock:
+            return self._metrics.setdefault(name, Counter(name, help_text))
+
+    def histogram(self, name: str, help_text: str = "", buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        """Get or create a histogram"""
+        with self._lock:
+            return self._metrics.setdefault(name, Histogram(name, help_text, buckets))
+
+    def record(self, operation: str, seconds: float, outcome: str = "success", payload_bytes: int = 0,
+               prompt_tokens: int = 0, completion_tokens: int = 0, **labels) -> None:
+        """
+        Record one finished operation.
+
+        Args:
+            operation: Operation name (llm_call, pdf_open, page_render, page_encode, file_write, ...)
+            seconds: Wall time of the operation
+            outcome: "success", "error", "cache_hit", ...
+            payload_bytes: Bytes sent or written
+            prompt_tokens: Prompt tokens (LLM calls)
+            completion_tokens: Completion tokens (LLM calls)
+            **labels: Extra labels, e.g. model
+        """
+        durations = self.histogram('operation_duration_seconds', "Wall time of instrumented operations")
+        operations = self.counter('operations_total', "Instrumented operations by outcome")
+        payloads = self.histogram('operation_payload_bytes', "Bytes sent or written per operation", BYTE_BUCKETS)
+        tokens = self.counter('llm_tokens_total', "Prompt and completion tokens of LLM calls")
+
+        with self._lock:
+            durations.observe(seconds, operation=operation, outcome=outcome)
+            operations.inc(operation=operation, outcome=outcome)
+            if payload_bytes:
+                payloads.observe(payload_bytes, operation=operation)
+            if prompt_tokens:
+                tokens.inc(prompt_tokens, operation=operation, type='prompt')
+            if completion_tokens:
+                tokens.inc(completion_tokens, operation=operation, type='completion')
+
+            self.events.append({
+                'timestamp': round(time.time(), 3),
+                'operation': operation,
+                'outcome': outcome,
+                'seconds': round(seconds, 4),
+                'payload_bytes': payload_bytes,
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'labels': labels
+            })
+            if len(self.events) > self.max_events:
+                del self.events[:len(self.events) - self.max_events]
+
+    def observe(self, name: str, value: float, help_text: str = "", **labels) -> None:
+        """Add a value to a named histogram (e.g. time to first token)"""
+        histogram = self.histogram(name, help_text)
+        with self._lock:
+            histogram.observe(value, **labels)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Aggregate the events of the run per operation.
+
+        Returns:
+            Dict mapping operation to count, errors, total/mean/p50/p95 seconds, bytes and tokens
+        """
+        with self._lock:
+            events = list(self.events)
+
+        grouped: Dict[str, List[Dict[str, Any]]] = {}
+        for event in events:
+            grouped.setdefault(event['operation'], []).append(event)
+
+        summary = {}
+        for operation, items in sorted(grouped.items()):
+            seconds = sorted(item['seconds'] for item in items)
+            summary[operation] = {
+                'count': len(items),
+                'errors': sum(1 for item in items if item['outcome'] == 'error'),
+                'total_seconds': round(sum(seconds), 3),
+                'mean_seconds': round(sum(seconds) / len(seconds), 4),
+                'p50_seconds': seconds[len(seconds) // 2],
+                'p95_seconds': seconds[min(len(seconds) - 1, int(len(seconds) * 0.95))],
+                'payload_bytes': sum(item['payload_bytes'] for item in items),
+                'prompt_tokens': sum(item['prompt_tokens'] for item in items),
+                'completion_tokens': sum(item['completion_tokens'] for item in items)
+            }
+        return summary
+
+    def to_prometheus(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format.
+        """
+        def format_labels(labels, extra=()):
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+        lines = []
+        with self._lock:
+            for metric in self._metrics.values():
+                lines.append(f"# HELP {metric.name} {metric.help_text}")
+                if isinstance(metric, Counter):
+                    lines.append(f"# TYPE {metric.name} counter")
+                    for labels, value in metric.values.items():
+                        lines.append(f"{metric.name}{format_labels(labels)} {value}")
+                    continue
+
+                lines.append(f"# TYPE {metric.name} histogram")
+                for labels, (bucket_counts, total, count) in metric.values.items():
+                    cumulative = 0
+                    for bound, bucket_count in zip(list(metric.buckets) + ['+Inf'], bucket_counts):
+                        cumulative += bucket_count
+                        lines.append(f"{metric.name}_bucket{format_labels(labels, [('le', bound)])} {cumulative}")
+                    lines.append(f"{metric.name}_sum{format_labels(labels)} {total}")
+                    lines.append(f"{metric.name}_count{format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self) -> None:
+        """Drop every metric and event, starting a new run"""
+        with self._lock:
+            self._metrics.clear()
+            self.events.clear()
+            self.started = time.time()
+
+
+# Process-wide registry used by the instrumented modules
+REGISTRY = MetricsRegistry()
+
+
+def record_operation(operation: str, seconds: float, outcome: str = "success", **details) -> None:
+    """
+    Record one finished operation in the process-wide registry, see MetricsRegistry.record.
+    """
+    REGISTRY.record(operation, seconds, outcome, **details)
+
+
+@contextmanager
+def track(operation: str, **labels) -> Iterator[Dict[str, Any]]:
+    """
+    Time a block and record it as an operation.
+
+    The yielded dictionary can be filled with payload_bytes, prompt_tokens,
+    completion_tokens or outcome; an exception records outcome "error".
+
+    Usage:
+        with track('file_write') as span:
+            span['payload_bytes'] = file.write(data)
+    """
+    span: Dict[str, Any] = {}
+    start = time.perf_counter()
+    outcome = "success"
+    try:
+        yield span
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        REGISTRY.record(
+            operation,
+            seconds,
+            span.pop('outcome', outcome),
+            span.pop('payload_bytes', 0),
+            span.pop('prompt_tokens', 0),
+            span.pop('completion_tokens', 0),
+            **labels,
+            **span
+        )
+
+
+def get_summary() -> Dict[str, Dict[str, Any]]:
+    """Per-operation summary of the current run, see MetricsRegistry.summary"""
+    return REGISTRY.summary()
+
+
+def reset_telemetry() -> None:
+    """Start a new run: drop every metric and event"""
+    REGISTRY.reset()
+
+
+def write_report(output_dir, run_name: Optional[str] = None) -> Dict[str, Path]:
+    """
+    Dump the current run as a JSON summary and a CSV event log.
+
+    Args:
+        output_dir: Directory of the report files (created if needed)
+        run_name: Prefix of the file names (default: telemetry_<timestamp>)
+
+    Returns:
+        Dict with the 'json' and 'csv' paths
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    run_name = run_name or f"telemetry_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+    with REGISTRY._lock:
+        events = list(REGISTRY.events)
+        started = REGISTRY.started
+
+    json_path = output_dir / f"{run_name}.json"
+    with open(json_path, 'w', encoding='utf-8') as file:
+        json.dump({
+            'started': datetime.fromtimestamp(started).isoformat(timespec='seconds'),
+            'wall_seconds': round(time.time() - started, 3),
+            'operations': REGISTRY.summary()
+        }, file, indent=2)
+
+    csv_path = output_dir / f"{run_name}.csv"
+    with open(csv_path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.DictWriter(file, fieldnames=EVENT_FIELDS)
+        writer.writeheader()
+        for event in events:
+            writer.writerow(dict(event, labels=json.dumps(event['labels'])))
+
+    return {'json': json_path, 'csv': csv_path}
+
+
+def start_metrics_server(port: int = 9464, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """
+    Serve the registry in Prometheus text format on http://host:port/metrics from a daemon thread.
+
+    Args:
+        port: Port to listen on (0 picks a free one, see server.server_address)
+        host: Interface to bind, local only by default
+
+    Returns:
+        The running server; call shutdown() to stop it
+    """
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/metrics', '/'):
+                self.send_error(404)
+                return
+            body = REGISTRY.to_prometheus().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    logger.info(f"Serving telemetry metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
+
+
+def start_metrics_server_from_env() -> Optional[ThreadingHTTPServer]:
+    """
+    Start the metrics server when TELEMETRY_PORT is set.
+    """
+    port = os.getenv('TELEMETRY_PORT')
+    return start_metrics_server(int(port)) if port else None
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Golden-data evaluation and benchmark harness.
+Runs the conformity pipeline over the golden requirements of one company,
+scores field-level accuracy (Value, Unit, Page, Complete) and records wall
+time, LLM calls, tokens and cache hits for each pipeline configuration.
+
+Usage:
+    python evaluation/golden_benchmark.py [configuration ...] [--limit N] [--cid NAME]
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import sys
+import time
+import unicodedata
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Add the project root to the path to import the agents and the LLM client
+script_dir = Path(__file__).resolve().parent
+project_root = script_dir.parent
+sys.path.insert(0, str(project_root))
+
+from client.llm_client import (
+    get_usage_stats, reset_usage_stats, enable_response_cache, disable_response_cache
+)
+from client.telemetry import get_summary, reset_telemetry
+from retrieval import ReportRetriever, load_parsed_reports
+from agents.tt_exigence_1_page.requirement_checker import ConformityRunner
+from agents.tt_exigence_1_page.result_parser import (
+    ConformityRecord, build_record, parse_conformity_response, apply_requirement_defaults
+)
+
+GOLDEN_CSV = project_root / "golden_data" / "[RegCom] Training Samples FR_EN (1).csv"
+PARSED_PAGES_DIR = project_root / "agents" / "pdf_to_markdown_all" / "data-parsed"
+RESULTS_DIR = script_dir / "results"
+
+# Golden data rows of the report available in data-parsed/ (the CID is spelled this way in the file)
+DEFAULT_CID = "Malakkof Humanis"
+
+SCORED_FIELDS = ['value', 'unit', 'page', 'complete']
+
+# Pipeline configurations compared by default
+CONFIGURATIONS: Dict[str, Dict[str, Any]] = {
+    'baseline': {'retrieval': False, 'max_workers': 1, 'batch_size': 1},
+    'concurrent': {'retrieval': False, 'max_workers': 4, 'batch_size': 1},
+    'retrieval': {'retrieval': True, 'top_k': 8, 'max_workers': 4, 'batch_size': 1},
+    'retrieval_batched': {'retrieval': True, 'top_k': 8, 'max_workers': 4, 'batch_size': 4},
+    'retrieval_cached': {'retrieval': True, 'top_k': 8, 'max_workers': 4, 'batch_size': 1, 'cache': True},
+}
+
+
+def normalize_text(text: Any) -> str:
+    """
+    Normalize a cell for comparison: accents removed, lowercase, collapsed whitespace, N/A as empty.
+    """
+    text = unicodedata.normalize('NFKD', str(text or ""))
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    text = ' '.join(text.lower().split())
+    return "" if text in ('n/a', 'na', 'none', '-') else text
+
+
+def load_golden_requirements(csv_path: Path = GOLDEN_CSV, cid: str = DEFAULT_CID) -> List[Dict[str, Any]]:
+    """
+    Load the golden data of a company grouped by requirement.
+
+    Args:
+        csv_path (Path): Golden data CSV (Windows-1252 encoded)
+        cid (str): Company identifier (CID column); empty for all rows
+
+    Returns:
+        List[Dict]: One entry per requirement with 'requirement' (row for the checker)
+            and 'expected' (List[ConformityRecord]), in file order
+    """
+    with open(csv_path, 'r', encoding='cp1252', newline='') as file:
+        rows = list(csv.DictReader(file))
+
+    requirements: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+    for row in rows:
+        row = {key: ' '.join((value or "").split()) for key, value in row.items()}
+        if not row['Code'] or (cid and row['CID'] != cid):
+            continue
+
+        key = (row['CID'], row['Code'], row['Metric'])
+        if key not in requirements:
+            requirements[key] = {
+                'requirement': {
+                    'TOPIC': row['Topic'],
+                    'METRIC': row['Metric'],
+                    'UNIT OF MEASURE': row['SASB Unit of Measurement'],
+                    'CODE': row['Code']
+                },
+                'expected': []
+            }
+        requirements[key]['expected'].append(build_record(row, strict=False))
+
+    return list(requirements.values())
+
+
+def field_matches(field: str, expected: ConformityRecord, predicted: ConformityRecord) -> bool:
+    """
+    Compare one scored field of an expected and a predicted record.
+
+    Args:
+        field (str): One of SCORED_FIELDS
+        expected (ConformityRecord): Golden record
+        predicted (ConformityRecord): Extracted record
+
+    Returns:
+        bool: True if the field is correct
+    """
+    if field == 'value':
+        if expected.value_number is not None and predicted.value_number is not None:
+            return math.isclose(expected.value_number, predicted.value_number, rel_tol=1e-3)
+        return normalize_text(expected.value) == normalize_text(predicted.value)
+    if field == 'unit':
+        expected_unit, predicted_unit = normalize_text(expected.unit), normalize_text(predicted.unit)
+        if not expected_unit or not predicted_unit:
+            return expected_unit == predicted_unit
+        return expected_unit in predicted_unit or predicted_unit in expected_unit
+    if field == 'page':
+        return expected.page == predicted.page
+    if field == 'complete':
+        return expected.complete == predicted.complete
+    raise ValueError(f"Unknown field: {field}")
+
+
+def score_requirement(expected: List[ConformityRecord], predicted: List[ConformityRecord]) -> Dict[str, Any]:
+    """
+    Match predicted records to expected ones and count correct fields.
+
+    Each expected record is paired with the unused prediction that gets the most
+    fields right; an expected record without a prediction scores zero.
+
+    Args:
+        expected (List[ConformityRecord]): Golden records of the requirement
+        predicted (List[ConformityRecord]): Records extracted by the pipeline
+
+    Returns:
+        Dict: Correct counts per field, matched and extra record counts
+    """
+    correct = dict.fromkeys(SCORED_FIELDS, 0)
+    unused = list(predicted)
+    matched = 0
+
+    for record in expected:
+        if not unused:
+            break
+        best = max(unused, key=lambda candidate: sum(field_matches(f, record, candidate) for f in SCORED_FIELDS))
+        unused.remove(best)
+        matched += 1
+        for field in SCORED_FIELDS:
+            correct[field] += field_matches(field, record, best)
+
+    return {'correct': correct, 'matched': matched, 'extra': len(unused)}
+
+
+def load_parsed_corpus(directory: Path = PARSED_PAGES_DIR) -> str:
+    """
+    Read every parsed page of the report as one rapport, each part labelled with its page.
+    
+    Configurations without retrieval get this whole corpus, so every configuration
+    answers from the same pages and only the pipeline options differ.
+    
+    Args:
+        directory (Path): Directory containing the parsed markdown pages
+        
+    Returns:
+        str: The parsed report, in page order
+        
+    Raises:
+        FileNotFoundError: If the directory holds no parsed pages
+    """
+    chunks = load_parsed_reports(str(directory))
+    if not chunks:
+        raise FileNotFoundError(f"No parsed pages in {directory}, run the markdown parser first")
+    return ReportRetriever.format_context(chunks)
+
+
+def run_configuration(name: str, configuration: Dict[str, Any],
+                      requirements: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Run the conformity pipeline with one configuration and score it.
+
+    Args:
+        name (str): Configuration name
+        configuration (Dict): Options (retrieval, top_k, max_workers, batch_size, cache, structured_output)
+        requirements (List[Dict]): Golden requirements from load_golden_requirements
+
+    Returns:
+        Dict: Accuracy, timing and usage figures plus per-requirement details
+    """
+    print(f"\n🚀 Running configuration '{name}': {configuration}")
+
+    if configuration.get('cache'):
+        enable_response_cache()
+    else:
+        disable_response_cache()
+        if os.getenv('LLM_CACHE_PATH'):
+            print("⚠️  LLM_CACHE_PATH is set, so responses are cached in every configuration")
+    reset_usage_stats()
+    reset_telemetry()
+
+    start_time = time.time()
+    retriever = ReportRetriever.from_directory(str(PARSED_PAGES_DIR)) if configuration.get('retrieval') else None
+    runner = ConformityRunner(
+        retriever=retriever,
+        rapport_content=None if retriever else load_parsed_corpus(),
+        top_k=configuration.get('top_k', 8),
+        structured_output=configuration.get('structured_output', False)
+    )
+    rows = [entry['requirement'] for entry in requirements]
+    results = runner.check_many(rows, max_workers=configuration.get('max_workers', 1),
+                                batch_size=configuration.get('batch_size', 1))
+    wall_seconds = time.time() - start_time
+    usage = get_usage_stats()
+
+    totals = dict.fromkeys(SCORED_FIELDS, 0)
+    expected_count = predicted_count = matched_count = 0
+    details = []
+    for entry, result in zip(requirements, results):
+        predicted = apply_requirement_defaults(parse_conformity_response(result, strict=False), entry['requirement'])
+        score = score_requirement(entry['expected'], predicted)
+        for field in SCORED_FIELDS:
+            totals[field] += score['correct'][field]
+        expected_count += len(entry['expected'])
+        predicted_count += len(predicted)
+        matched_count += score['matched']
+        details.append({
+            'code': entry['requirement']['CODE'],
+            'metric': entry['requirement']['METRIC'],
+            'expected': [record.to_dict() for record in entry['expected']],
+            'predicted': [record.to_dict() for record in predicted],
+            'score': score
+        })
+
+    accuracy = {field: round(totals[field] / expected_count, 4) if expected_count else 0.0
+                for field in SCORED_FIELDS}
+    accuracy['overall'] = round(sum(accuracy.values()) / len(SCORED_FIELDS), 4)
+
+    report = {
+        'configuration': name,
+        'options': configuration,
+        'requirements': len(requirements),
+        'expected_records': expected_count,
+        'predicted_records': predicted_count,
+        'matched_records': matched_count,
+        'accuracy': accuracy,
+        'wall_seconds': round(wall_seconds, 2),
+        'requirements_per_minute': round(60 * len(requirements) / wall_seconds, 2) if wall_seconds else 0.0,
+        'usage': usage,
+        'telemetry': get_summary(),
+        'details': details
+    }
+
+    print(f"✅ {name}: overall accuracy {accuracy['overall']:.1%} "
+          f"(value {accuracy['value']:.1%}, unit {accuracy['unit']:.1%}, "
+          f"page {accuracy['page']:.1%}, complete {accuracy['complete']:.1%})")
+    print(f"⏱️  {wall_seconds:.1f}s, {usage['calls']} LLM calls, {usage['prompt_tokens']} prompt / "
+          f"{usage['completion_tokens']} completion tokens, {usage['cache_hits']} cache hits")
+    return report
+
+
+def save_reports(reports: List[Dict[str, Any]], results_dir: Optional[Path] = None) -> Path:
+    """
+    Save the full reports as JSON and append one summary line per configuration
+    to history.csv so runs can be compared over time.
+
+    Args:
+        reports (List[Dict]): Reports from run_configuration
+        results_dir (Path, optional): Output directory (default: evaluation/results)
+
+    Returns:
+        Path: The JSON report file
+    """
+    results_dir = results_dir or RESULTS_DIR
+    results_dir.mkdir(parents=True, exist_ok=True)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+    report_path = results_dir / f"benchmark_{timestamp}.json"
+    with open(report_path, 'w', encoding='utf-8') as file:
+        json.dump(reports, file, indent=2, ensure_ascii=False)
+
+    history_path = results_dir / "history.csv"
+    columns = ['timestamp', 'configuration', 'model', 'requirements', 'overall', *SCORED_FIELDS,
+               'wall_seconds', 'requirements_per_minute', 'calls', 'prompt_tokens', 'completion_tokens',
+               'cache_hits', 'errors']
+    write_header = not history_path.exists()
+    with open(history_path, 'a', encoding='utf-8', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=columns)
+        if write_header:
+            writer.writeheader()
+        for report in reports:
+            writer.writerow({
+                'timestamp': timestamp,
+                'configuration': report['configuration'],
+                'model': os.getenv('LLM_MODEL_NAME', ''),
+                'requirements': report['requirements'],
+                **report['accuracy'],
+                'wall_seconds': report['wall_seconds'],
+                'requirements_per_minute': report['requirements_per_minute'],
+                **{key: report['usage'][key] for key in ('calls', 'prompt_tokens', 'completion_tokens',
+                                                          'cache_hits', 'errors')}
+            })
+
+    return report_path
+
+
+def main(argv: Optional[List[str]] = None):
+    """
+    Main function to run the benchmark from the command line.
+    """
+    parser = argparse.ArgumentParser(description="Evaluate the conformity pipeline against the golden data")
+    parser.add_argument('configurations', nargs='*', default=list(CONFIGURATIONS),
+                        help=f"Configurations to run (default: all of {', '.join(CONFIGURATIONS)})")
+    parser.add_argument('--cid', default=DEFAULT_CID, help="Company (CID column) to evaluate")
+    parser.add_argument('--limit', type=int, default=0, help="Only evaluate the first N requirements")
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.configurations if name not in CONFIGURATIONS]
+    if unknown:
+        parser.error(f"Unknown configuration(s): {', '.join(unknown)}")
+
+    requirements = load_golden_requirements(cid=args.cid)
+    if args.limit:
+        requirements = requirements[:args.limit]
+    print(f"📋 {len(requirements)} golden requirements for {args.cid} "
+          f"({sum(len(entry['expected']) for entry in requirements)} expected records)")
+
+    reports = [run_configuration(name, CONFIGURATIONS[name], requirements) for name in args.configurations]
+    report_path = save_reports(reports)
+
+    print("\n" + "=" * 80)
+    print(f"{'Configuration':<20} {'Accuracy':>9} {'Seconds':>9} {'Calls':>6} {'Prompt tok':>11} {'Cache hits':>11}")
+    for report in reports:
+        print(f"{report['configuration']:<20} {report['accuracy']['overall']:>9.1%} {report['wall_seconds']:>9.1f} "
+              f"{report['usage']['calls']:>6} {report['usage']['prompt_tokens']:>11} {report['usage']['cache_hits']:>11}")
+    print(f"\n💾 Reports saved to {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,10 +5,12 @@ This package provides utilities for connecting to and querying LLM inference ser
 """
 
 from .server_connection import setup_inference_server_connection, query_llm
+from .mock_server import MockLLMServer
 
 __all__ = [
     'setup_inference_server_connection',
-    'query_llm'
+    'query_llm',
+    'MockLLMServer'
 ]
 
 __version__ = '1.0.0'
@@ -0,0 +1,550 @@
+"""
+Mock OpenAI-Compatible Server
+
+This module provides a local stand-in for the inference server implementing
+/v1/chat/completions (text and image content parts, optional streaming) with
+configurable latency, throughput limits, error injection, canned responses and
+a record-and-replay mode, for reproducible offline benchmarking of the agents.
+
+Usage:
+    python -m llm_server.mock_server --port 8008 --latency normal:0.8,0.2 --error-rate 0.05
+    LLM_ENDPOINT_URL=http://127.0.0.1:8008/v1 python agents/...
+"""
+
+import re
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional, Tuple
+
+import httpx
+
+from client.resilience import TokenBucket
+
+# Approximate prompt cost of one image content part, in tokens
+IMAGE_TOKENS = 765
+
+# Built-in canned responses, checked after the user-supplied rules
+DEFAULT_RULES = [
+    {'match': r'Respond with only "YES" if tables are present', 'content': 'NO'}
+]
+
+
+def parse_latency(spec: str, rng: Optional[random.Random] = None):
+    """
+    Build a latency sampler from a distribution spec.
+
+    Args:
+        spec: "fixed:S", "uniform:MIN,MAX", "normal:MEAN,STD", "lognormal:MU,SIGMA" or "exp:MEAN" (seconds)
+        rng: Random generator to sample from (default: the random module)
+
+    Returns:
+        Function returning a delay in seconds (never negative)
+    """
+    name, _, params = spec.partition(':')
+    values = [float(value) for value in params.split(',') if value] if params else []
+    rng = rng or random
+
+    samplers = {
+        'fixed': lambda: values[0] if values else 0.0,
+        'uniform': lambda: rng.uniform(values[0], values[1]),
+        'normal': lambda: rng.gauss(values[0], values[1]),
+        'lognormal': lambda: rng.lognormvariate(values[0], values[1]),
+        'exp': lambda: rng.expovariate(1 / values[0]) if values[0] > 0 else 0.0,
+    }
+    if name not in samplers:
+        raise ValueError(f"Unknown latency distribution: {spec}")
+    sampler = samplers[name]
+    return lambda: max(0.0, sampler())
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count (4 characters per token)
+    """
+    return max(1, len(text) // 4) if text else 0
+
+
+def message_text(messages: List[Dict[str, Any]]) -> Tuple[str, int]:
+    """
+    Extract the text of chat messages and count their image parts.
+
+    Args:
+        messages: Chat messages, with string content or lists of content parts
+
+    Returns:
+        Tuple of (concatenated text, number of image parts)
+    """
+    texts = []
+    images = 0
+    for message in messages:
+        content = message.get('content')
+        if isinstance(content, str):
+            texts.append(content)
+        elif isinstance(content, list):
+            for part in content:
+                if part.get('type') == 'text':
+                    texts.append(part.get('text', ''))
+                elif part.get('type') == 'image_url':
+                    images += 1
+    return "\n".join(texts), images
+
+
+def request_key(body: Dict[str, Any]) -> str:
+    """
+    Key identifying a request for record and replay (model, messages and sampling settings).
+    """
+    relevant = {key: body.get(key) for key in ('model', 'messages', 'temperature', 'max_tokens', 'response_format')}
+    return hashlib.sha256(json.dumps(relevant, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+class MockLLMServer:
+    """
+    Local OpenAI-compatible chat completion server with simulated performance characteristics
+    """
+
+    def __init__(self,
+                 host: str = "127.0.0.1",
+                 port: int = 0,
+                 latency: str = "fixed:0",
+                 tokens_per_second: float = 0.0,
+                 max_concurrency: int = 0,
+                 max_rps: float = 0.0,
+                 error_rate: float = 0.0,
+                 error_codes: Tuple[int, ...] = (500, 503),
+                 hang_rate: float = 0.0,
+                 hang_seconds: float = 600.0,
+                 rules: Optional[List[Dict[str, str]]] = None,
+                 default_content: str = "Mock response",
+                 mode: str = "canned",
+                 recordings_path: Optional[str] = None,
+                 upstream_url: Optional[str] = None,
+                 upstream_api_key: Optional[str] = None,
+                 seed: Optional[int] = None):
+        """
+        Configure the server (call start() or use it as a context manager to serve)
+
+        Args:
+            host: Interface to bind
+            port: Port to bind (0 picks a free port)
+            latency: Time-to-first-token distribution, see parse_latency
+            tokens_per_second: Simulated generation speed (0 for instant generation)
+            max_concurrency: Requests processed at once; others queue (0 for unlimited)
+            max_rps: Requests per second accepted; others get 429 (0 for unlimited)
+            error_rate: Probability of answering with an error status from error_codes
+            error_codes: HTTP statuses used for injected errors
+            hang_rate: Probability of stalling for hang_seconds (client timeout testing)
+            hang_seconds: Duration of a stall
+            rules: Canned responses [{"match": regex, "content": text}], matched against the prompt text
+            default_content: Response when no rule matches
+            mode: "canned", "record" (forward to upstream and save) or "replay" (answer from recordings)
+            recordings_path: JSON Lines file of recorded responses
+            upstream_url: Real server base URL (e.g. http://host:11434/v1) for record mode
+            upstream_api_key: API key for the upstream server
+            seed: Random seed for reproducible latency and error sequences
+        """
+        if mode not in ("canned", "record", "replay"):
+            raise ValueError(f"Unknown mode: {mode}")
+        if mode == "record" and not upstream_url:
+            raise ValueError("Record mode needs an upstream_url")
+        if mode in ("record", "replay") and not recordings_path:
+            raise ValueError(f"{mode.capitalize()} mode needs a recordings_path")
+
+        # Own generator, so seeding does not touch the random state of the process
+        self.random = random.Random(seed)
+
+        self.host = host
+        self.port = port
+        self.sample_latency = parse_latency(latency, self.random)
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.error_codes = tuple(error_codes)
+        self.hang_rate = hang_rate
+        self.hang_seconds = hang_seconds
+        self.rules = [(re.compile(rule['match'], re.IGNORECASE | re.DOTALL), rule['content'])
+                      for rule in (rules or []) + DEFAULT_RULES]
+        self.default_content = default_content
+        self.mode = mode
+        self.recordings_path = recordings_path
+        self.upstream_url = upstream_url.rstrip('/') if upstream_url else None
+        self.upstream_api_key = upstream_api_key
+
+        self._slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency > 0 else None
+        self._bucket = TokenBucket(max_rps) if max_rps > 0 else None
+        self._lock = threading.Lock()
+        self._recordings: Dict[str, Dict[str, Any]] = self._load_recordings() if mode == "replay" else {}
+        self._request_count = 0
+        self.stats = {'requests': 0, 'completed': 0, 'errors_injected': 0, 'rate_limited': 0,
+                      'hangs': 0, 'replay_misses': 0, 'recorded': 0, 'active': 0, 'max_active': 0}
+
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    # -- lifecycle -------------------------------------------------------
+
+    def start(self) -> str:
+        """
+        Start serving in a background thread
+
+        Returns:
+            Base URL of the OpenAI-compatible API (…/v1)
+        """
+        handler = type('MockLLMHandler', (MockLLMHandler,), {'mock': self})
+        self._server = ThreadingHTTPServer((self.host, self.port), handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self) -> None:
+        """
+        Stop the server
+        """
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def serve_forever(self) -> None:
+        """
+        Serve in the current thread until interrupted
+        """
+        self.start()
+        try:
+            self._thread.join()
+        except KeyboardInterrupt:
+            self.stop()
+
+    @property
+    def base_url(self) -> str:
+        """Base URL to use as LLM_ENDPOINT_URL"""
+        return f"http://{self.host}:{self.port}/v1"
+
+    def __enter__(self) -> "MockLLMServer":
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop()
+
+    # -- record / replay -------------------------------------------------
+
+    def _load_recordings(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Read recorded responses from the JSON Lines file
+        """
+        recordings = {}
+        try:
+            with open(self.recordings_path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    if line.strip():
+                        entry = json.loads(line)
+                        recordings[entry['key']] = entry['response']
+        except FileNotFoundError:
+            pass
+        return recordings
+
+    def _record(self, key: str, response: Dict[str, Any]) -> None:
+        """
+        Append a response to the recordings file
+        """
+        with self._lock:
+            with open(self.recordings_path, 'a', encoding='utf-8') as file:
+                file.write(json.dumps({'key': key, 'response': response}, ensure_ascii=False) + "\n")
+            self.stats['recorded'] += 1
+
+    def _forward(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Send a (non-streaming) request to the upstream server
+        """
+        headers = {'Authorization': f"Bearer {self.upstream_api_key}"} if self.upstream_api_key else {}
+        response = httpx.post(f"{self.upstream_url}/chat/completions", json=dict(body, stream=False),
+                              headers=headers, timeout=600)
+        response.raise_for_status()
+        return response.json()
+
+    # -- request handling ------------------------------------------------
+
+    def _count(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self.stats[key] += amount
+            self.stats['max_active'] = max(self.stats['max_active'], self.stats['active'])
+
+    def canned_content(self, prompt_text: str) -> str:
+        """
+        Pick the canned response for a prompt
+
+        Args:
+            prompt_text: Text of all messages
+
+        Returns:
+            The content of the first matching rule, or the default content
+        """
+        for pattern, content in self.rules:
+            if pattern.search(prompt_text):
+                return content
+        return self.default_content
+
+    def build_completion(self, body: Dict[str, Any], content: str) -> Dict[str, Any]:
+        """
+        Build a chat.completion object, truncating the content to max_tokens
+
+        Args:
+            body: Request body
+            content: Response text
+
+        Returns:
+            OpenAI chat completion dictionary
+        """
+        prompt_text, images = message_text(body.get('messages', []))
+        max_tokens = body.get('max_tokens') or body.get('max_completion_tokens')
+        finish_reason = "stop"
+        if max_tokens and estimate_tokens(content) > max_tokens:
+            content = content[:max_tokens * 4]
+            finish_reason = "length"
+
+        with self._lock:
+            self._request_count += 1
+            request_id = self._request_count
+
+        prompt_tokens = estimate_tokens(prompt_text) + images * IMAGE_TOKENS
+        completion_tokens = estimate_tokens(content)
+        return {
+            'id': f"chatcmpl-mock-{request_id}",
+            'object': "chat.completion",
+            'created': int(time.time()),
+            'model': body.get('model', 'mock'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': finish_reason
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens
+            }
+        }
+
+    def complete(self, body: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        """
+        Produce the completion for a request according to the mode
+
+        Args:
+            body: Request body
+
+        Returns:
+            Tuple of (HTTP status, response body)
+        """
+        key = request_key(body)
+
+        if self.mode == "replay":
+            recorded = self._recordings.get(key)
+            if recorded is not None:
+                return 200, recorded
+            self._count('replay_misses')
+            prompt_text, _ = message_text(body.get('messages', []))
+            return 200, self.build_completion(body, self.canned_content(prompt_text))
+
+        if self.mode == "record":
+            try:
+                response = self._forward(body)
+            except httpx.HTTPError as e:
+                return 502, error_body(f"Upstream error: {e}", "upstream_error")
+            self._record(key, response)
+            return 200, response
+
+        prompt_text, _ = message_text(body.get('messages', []))
+        return 200, self.build_completion(body, self.canned_content(prompt_text))
+
+
+def error_body(message: str, error_type: str) -> Dict[str, Any]:
+    """
+    OpenAI-style error response body
+    """
+    return {'error': {'message': message, 'type': error_type, 'code': None}}
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    """
+    HTTP handler bound to a MockLLMServer through the `mock` class attribute
+    """
+
+    mock: MockLLMServer = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # Keep benchmark output readable
+        pass
+
+    def send_json(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        path = self.path.rstrip('/')
+        if path in ('/health', '/v1/health'):
+            self.send_json(200, {'status': 'ok'})
+        elif path in ('/stats', '/v1/stats'):
+            with self.mock._lock:
+                self.send_json(200, dict(self.mock.stats))
+        elif path in ('/models', '/v1/models'):
+            self.send_json(200, {'object': 'list', 'data': [{'id': 'mock', 'object': 'model', 'owned_by': 'mock'}]})
+        else:
+            self.send_json(404, error_body(f"Unknown path {self.path}", "not_found"))
+
+    def do_POST(self):
+        if self.path.rstrip('/') not in ('/v1/chat/completions', '/chat/completions'):
+            self.send_json(404, error_body(f"Unknown path {self.path}", "not_found"))
+            return
+
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError as e:
+            self.send_json(400, error_body(f"Invalid JSON: {e}", "invalid_request_error"))
+            return
+
+        mock = self.mock
+        mock._count('requests')
+
+        if mock._bucket is not None:
+            acquired, wait = mock._bucket.try_acquire()
+            if not acquired:
+                mock._count('rate_limited')
+                self.send_json(429, error_body("Rate limit exceeded", "rate_limit_error"),
+                               {'Retry-After': f"{wait:.2f}"})
+                return
+
+        if mock._slots is not None:
+            mock._slots.acquire()
+        mock._count('active')
+        try:
+            self.handle_completion(body)
+        finally:
+            mock._count('active', -1)
+            if mock._slots is not None:
+                mock._slots.release()
+
+    def handle_completion(self, body: Dict[str, Any]) -> None:
+        mock = self.mock
+
+        if mock.hang_rate and mock.random.random() < mock.hang_rate:
+            mock._count('hangs')
+            time.sleep(mock.hang_seconds)
+
+        # Simulated queueing / prefill time before the first token
+        time.sleep(mock.sample_latency())
+
+        if mock.error_rate and mock.random.random() < mock.error_rate:
+            mock._count('errors_injected')
+            status = mock.random.choice(mock.error_codes)
+            self.send_json(status, error_body(f"Injected error {status}", "server_error"))
+            return
+
+        status, response = mock.complete(body)
+        if status != 200:
+            self.send_json(status, response)
+            return
+
+        if body.get('stream'):
+            self.stream_completion(body, response)
+        else:
+            if mock.tokens_per_second > 0:
+                time.sleep(response.get('usage', {}).get('completion_tokens', 0) / mock.tokens_per_second)
+            self.send_json(200, response)
+        mock._count('completed')
+
+    def stream_completion(self, body: Dict[str, Any], response: Dict[str, Any]) -> None:
+        """
+        Send a completion as server-sent events, one chunk per word
+        """
+        mock = self.mock
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        content = response['choices'][0]['message']['content'] or ""
+        pieces = re.findall(r'\S+\s*|\s+', content) or [""]
+        delay = 1 / mock.tokens_per_second if mock.tokens_per_second > 0 else 0.0
+        base = {'id': response['id'], 'object': 'chat.completion.chunk',
+                'created': response['created'], 'model': response['model']}
+
+        def send_event(payload: Dict[str, Any]) -> None:
+            self.wfile.write(f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+
+        try:
+            for index, piece in enumerate(pieces):
+                delta = {'role': 'assistant', 'content': piece} if index == 0 else {'content': piece}
+                send_event(dict(base, choices=[{'index': 0, 'delta': delta, 'finish_reason': None}]))
+                if delay:
+                    time.sleep(delay * max(1, estimate_tokens(piece)))
+            send_event(dict(base, choices=[{'index': 0, 'delta': {},
+                                            'finish_reason': response['choices'][0]['finish_reason']}]))
+            if (body.get('stream_options') or {}).get('include_usage'):
+                send_event(dict(base, choices=[], usage=response['usage']))
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading (e.g. early stop on a streamed answer)
+            pass
+
+
+def main():
+    """
+    Run the mock server from the command line
+    """
+    parser = argparse.ArgumentParser(description="Local mock OpenAI-compatible chat completion server")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8008)
+    parser.add_argument('--latency', default="fixed:0", help="fixed:S | uniform:A,B | normal:M,S | lognormal:MU,SIGMA | exp:M")
+    parser.add_argument('--tokens-per-second', type=float, default=0.0)
+    parser.add_argument('--max-concurrency', type=int, default=0)
+    parser.add_argument('--max-rps', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-codes', default="500,503", help="Comma-separated HTTP statuses for injected errors")
+    parser.add_argument('--hang-rate', type=float, default=0.0)
+    parser.add_argument('--hang-seconds', type=float, default=600.0)
+    parser.add_argument('--rules', help='JSON file with canned responses [{"match": regex, "content": text}]')
+    parser.add_argument('--default-content', default="Mock response")
+    parser.add_argument('--mode', choices=["canned", "record", "replay"], default="canned")
+    parser.add_argument('--recordings', help="JSON Lines file for record/replay")
+    parser.add_argument('--upstream', help="Upstream server base URL for record mode")
+    parser.add_argument('--upstream-api-key')
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args()
+
+    rules = None
+    if args.rules:
+        with open(args.rules, 'r', encoding='utf-8') as file:
+            rules = json.load(file)
+
+    server = MockLLMServer(
+        host=args.host, port=args.port, latency=args.latency, tokens_per_second=args.tokens_per_second,
+        max_concurrency=args.max_concurrency, max_rps=args.max_rps, error_rate=args.error_rate,
+        error_codes=tuple(int(code) for code in args.error_codes.split(',')),
+        hang_rate=args.hang_rate, hang_seconds=args.hang_seconds, rules=rules,
+        default_content=args.default_content, mode=args.mode, recordings_path=args.recordings,
+        upstream_url=args.upstream, upstream_api_key=args.upstream_api_key, seed=args.seed
+    )
+    print(f"Mock LLM server listening on {server.base_url} (mode: {args.mode})")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,7 @@ and executing queries against them.
 
 import sys
 import os
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Union
 
 # Add the client directory to the Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'client'))
@@ -15,19 +15,22 @@ sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'client'))
 from llm_client import create_client, simple_query
 
 
-def setup_inference_server_connection(model_name: str = "qwen2.5-vl:32b") -> Dict[str, Any]:
+def setup_inference_server_connection(model_name: str = "qwen2.5-vl:32b",
+                                      endpoint_url: Optional[Union[str, List[str]]] = None) -> Dict[str, Any]:
     """
     Setup connection to the inference server at 148.253.83.132.
     Updated to use Qwen 2.5 VL model by default.
 
     Args:
         model_name: Name of the model to use (default: "qwen2.5-vl:32b")
+        endpoint_url: Endpoint, or several endpoints to load balance (list or comma-separated,
+            optional "|weight" suffix). Defaults to LLM_ENDPOINT_URLS, then the 148.253.83.132 server.
 
     Returns:
         Dict containing client and configuration information
     """
     # Configure for inference server - using the exact endpoint that works with curl
-    endpoint_url = "http://148.253.83.132:11434/v1"  # OpenAI-compatible endpoint
+    endpoint_url = endpoint_url or os.getenv('LLM_ENDPOINT_URLS') or "http://148.253.83.132:11434/v1"  # OpenAI-compatible endpoint
     api_key = ""  # Empty string for inference server (no API key required)
 
     print(f"Connecting to inference server with model '{model_name}'...")
@@ -4,6 +4,12 @@ Simple library to convert PDF files to JPEG images
 """
 
 from .pdf_converter import PDFToJPEGConverter, convert_pdfs
+from .document_session import PDFDocumentSession
+from .manifest import ConversionManifest
+from .page_preparation import PageImage, prepare_page_images, analyze_page_layout
+from .text_layer import classify_page, page_to_markdown, extract_page_markdown
 
 __version__ = "1.0.0"
-__all__ = ["PDFToJPEGConverter", "convert_pdfs"]
+__all__ = ["PDFToJPEGConverter", "convert_pdfs", "PDFDocumentSession", "ConversionManifest",
+           "PageImage", "prepare_page_images", "analyze_page_layout",
+           "classify_page", "page_to_markdown", "extract_page_markdown"]
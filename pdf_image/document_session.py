@@ -0,0 +1,212 @@
+"""
+PDF document session
+Keeps one open PyMuPDF document per PDF for the duration of a job and caches
+page text, rendered page images and metadata so every agent parses a PDF once
+"""
+
+import threading
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+import fitz  # PyMuPDF
+import logging
+
+from .page_preparation import PageImage, prepare_page_images
+from .text_layer import extract_page_markdown
+
+try:
+    from client.telemetry import track
+except ImportError:
+    # pdf_image used without the client package: no telemetry
+    from contextlib import nullcontext
+
+    def track(operation, **labels):
+        return nullcontext({})
+
+logger = logging.getLogger(__name__)
+
+
+class PDFDocumentSession:
+    """
+    Context manager holding a single open fitz.Document with lazy per-page caches.
+    Page numbers are 1-indexed, matching the page numbers reported by the agents.
+    """
+
+    def __init__(self, pdf_path, cache_images: bool = True):
+        """
+        Initialize the session for a PDF file (the document is opened lazily)
+
+        Args:
+            pdf_path: Path to the PDF file
+            cache_images: Keep rendered page images in memory for reuse
+        """
+        self.pdf_path = Path(pdf_path)
+        self.cache_images = cache_images
+
+        self._document: Optional[fitz.Document] = None
+        self._lock = threading.RLock()
+        self._text_cache: Dict[int, str] = {}
+        self._image_cache: Dict[Tuple[int, float, str], bytes] = {}
+        self._metadata: Optional[Dict[str, Any]] = None
+
+    def __enter__(self) -> "PDFDocumentSession":
+        # The document itself is opened on first use
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def open(self) -> fitz.Document:
+        """
+        Open the PDF if it is not open yet
+
+        Returns:
+            The open fitz.Document
+        """
+        with self._lock:
+            if self._document is None:
+                with track('pdf_open') as span:
+                    self._document = fitz.open(self.pdf_path)
+                    span['payload_bytes'] = self.pdf_path.stat().st_size
+                logger.debug(f"Opened {self.pdf_path.name} ({self._document.page_count} pages)")
+            return self._document
+
+    def close(self) -> None:
+        """
+        Close the document and drop all cached data
+        """
+        with self._lock:
+            if self._document is not None:
+                self._document.close()
+                self._document = None
+            self._text_cache.clear()
+            self._image_cache.clear()
+
+    @property
+    def document(self) -> fitz.Document:
+        """The open fitz.Document, opened on first access"""
+        return self.open()
+
+    @property
+    def page_count(self) -> int:
+        """Number of pages in the PDF"""
+        return self.document.page_count
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """Document metadata plus file name, file size and page count"""
+        with self._lock:
+            if self._metadata is None:
+                self._metadata = {
+                    **(self.document.metadata or {}),
+                    "file_name": self.pdf_path.name,
+                    "file_size": self.pdf_path.stat().st_size,
+                    "page_count": self.document.page_count
+                }
+            return self._metadata
+
+    def get_page(self, page_num: int) -> fitz.Page:
+        """
+        Get a page object
+
+        Args:
+            page_num: Page number (1-indexed)
+
+        Returns:
+            The fitz.Page
+        """
+        if not 1 <= page_num <= self.page_count:
+            raise IndexError(f"Page {page_num} out of range for {self.pdf_path.name} ({self.page_count} pages)")
+        return self.document[page_num - 1]
+
+    def get_page_text(self, page_num: int) -> str:
+        """
+        Get the plain text of a page, extracting it once
+
+        Args:
+            page_num: Page number (1-indexed)
+
+        Returns:
+            Page text
+        """
+        with self._lock:
+            if page_num not in self._text_cache:
+                self._text_cache[page_num] = self.get_page(page_num).get_text()
+            return self._text_cache[page_num]
+
+    def get_page_pixmap(self, page_num: int, zoom: float = 1.0) -> fitz.Pixmap:
+        """
+        Render a page to a pixmap (not cached)
+
+        Args:
+            page_num: Page number (1-indexed)
+            zoom: Zoom factor relative to 72 DPI
+
+        Returns:
+            The rendered fitz.Pixmap
+        """
+        with self._lock:
+            page = self.get_page(page_num)
+            with track('page_render', zoom=zoom):
+                if zoom == 1.0:
+                    return page.get_pixmap()
+                return page.get_pixmap(matrix=fitz.Matrix(zoom, zoom))
+
+    def get_page_image(self, page_num: int, zoom: float = 1.0, image_format: str = "png") -> bytes:
+        """
+        Get an encoded image of a page, rendering it once per zoom and format
+
+        Args:
+            page_num: Page number (1-indexed)
+            zoom: Zoom factor relative to 72 DPI
+            image_format: "png" or "jpeg"
+
+        Returns:
+            Encoded image bytes
+        """
+        key = (page_num, zoom, image_format)
+        with self._lock:
+            if key in self._image_cache:
+                return self._image_cache[key]
+
+            pix = self.get_page_pixmap(page_num, zoom)
+            with track('page_encode', image_format=image_format) as span:
+                data = pix.tobytes("jpg" if image_format in ("jpg", "jpeg") else image_format)
+                span['payload_bytes'] = len(data)
+
+            if self.cache_images:
+                self._image_cache[key] = data
+            return data
+
+    def get_page_images(self, page_num: int, **options) -> List[PageImage]:
+        """
+        Render a page for a vision model at a resolution fitted to its content (not cached)
+
+        Args:
+            page_num: Page number (1-indexed)
+            **options: Options of prepare_page_images (max_pixels, tile, crop, ...)
+
+        Returns:
+            Images of the page, from top to bottom
+        """
+        with self._lock:
+            return prepare_page_images(self.get_page(page_num), **options)
+
+    def get_page_markdown(self, page_num: int) -> Dict[str, Any]:
+        """
+        Classify a page and convert it to markdown from its text layer when it is born-digital (not cached)
+
+        Args:
+            page_num: Page number (1-indexed)
+
+        Returns:
+            Result of extract_page_markdown: page_type, markdown (None when the page needs a vision model), ...
+        """
+        with self._lock:
+            return extract_page_markdown(self.get_page(page_num))
+
+    def clear_image_cache(self) -> None:
+        """
+        Drop cached page images to release memory
+        """
+        with self._lock:
+            self._image_cache.clear()
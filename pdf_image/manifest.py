@@ -0,0 +1,219 @@
+"""
+Conversion manifest
+Records, per PDF, the source file hash, the settings used and the status of
+every page output so reruns skip unchanged pages and crashed runs resume
+"""
+
+import os
+import json
+import time
+import hashlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def hash_file(path, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Compute the SHA-256 of a file
+
+    Args:
+        path: File to hash
+        chunk_size: Read size in bytes
+
+    Returns:
+        Hex digest
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ConversionManifest:
+    """
+    JSON manifest tracking per-page outputs for one PDF.
+    Page entries are discarded when the PDF content or the settings change.
+    Output paths are stored relative to the manifest's directory, so runs from
+    another working directory (or a moved output folder) still find them.
+    """
+
+    def __init__(self, manifest_path, pdf_path, settings: Dict[str, Any]):
+        """
+        Load the manifest for a PDF, resetting it if the PDF or settings changed
+
+        Args:
+            manifest_path: Where the manifest JSON is stored
+            pdf_path: Source PDF file
+            settings: Settings that affect the outputs (model, DPI, format, ...)
+        """
+        self.manifest_path = Path(manifest_path)
+        self.pdf_path = Path(pdf_path)
+        self.settings = settings
+
+        file_hash = hash_file(self.pdf_path)
+        settings_hash = hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()
+
+        data = self._read()
+        if data.get("file_hash") != file_hash or data.get("settings_hash") != settings_hash:
+            if data:
+                logger.info(f"{self.pdf_path.name} or its settings changed, starting a new manifest")
+            data = {"pages": {}}
+
+        data.update({
+            "pdf": self.pdf_path.name,
+            "file_hash": file_hash,
+            "settings": settings,
+            "settings_hash": settings_hash
+        })
+        self.data = data
+
+    def _read(self) -> Dict[str, Any]:
+        """
+        Read the manifest file, returning an empty dict if missing or unreadable
+        """
+        if not self.manifest_path.exists():
+            return {}
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable manifest {self.manifest_path}: {e}")
+            return {}
+
+    def save(self) -> None:
+        """
+        Write the manifest atomically so a crash never leaves it half written
+        """
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.manifest_path.with_name(self.manifest_path.name + ".tmp")
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump(self.data, file, indent=2, ensure_ascii=False)
+        os.replace(temp_path, self.manifest_path)
+
+    def _output_path(self, entry: Dict[str, Any]) -> Path:
+        """
+        Resolve the output path of a page entry against the manifest's directory
+        """
+        return self.manifest_path.parent / entry["output"]
+
+    def set_page_count(self, page_count: int) -> None:
+        """
+        Record the number of pages in the PDF
+        """
+        self.data["page_count"] = page_count
+
+    def is_done(self, page_num: int) -> bool:
+        """
+        Check whether a page was completed and its output is still intact
+
+        Args:
+            page_num: Page number (1-indexed)
+
+        Returns:
+            True if the page can be skipped
+        """
+        entry = self.data["pages"].get(str(page_num))
+        if not entry or entry.get("status") != "done":
+            return False
+
+        output_path = self._output_path(entry)
+        if not output_path.exists():
+            return False
+        return hash_file(output_path) == entry.get("output_hash")
+
+    def is_skipped(self, page_num: int) -> bool:
+        """
+        Check whether a page was recorded as needing no output
+
+        Args:
+            page_num: Page number (1-indexed)
+
+        Returns:
+            True if the page was marked skipped
+        """
+        entry = self.data["pages"].get(str(page_num))
+        return bool(entry) and entry.get("status") == "skipped"
+
+    def pending_pages(self, page_numbers: Iterable[int]) -> List[int]:
+        """
+        Filter page numbers down to those that still need processing
+
+        Args:
+            page_numbers: Candidate page numbers (1-indexed)
+
+        Returns:
+            Page numbers that are not done
+        """
+        return [page_num for page_num in page_numbers if not self.is_done(page_num)]
+
+    def get_output(self, page_num: int) -> Optional[Path]:
+        """
+        Get the recorded output path of a page
+        """
+        entry = self.data["pages"].get(str(page_num))
+        return self._output_path(entry) if entry and entry.get("output") else None
+
+    def mark_done(self, page_num: int, output_path, seconds: float, save: bool = True) -> None:
+        """
+        Record a successfully written page output
+
+        Args:
+            page_num: Page number (1-indexed)
+            output_path: File written for the page
+            seconds: Time spent on the page
+            save: Write the manifest immediately
+        """
+        try:
+            stored_path = os.path.relpath(Path(output_path).resolve(), self.manifest_path.parent.resolve())
+        except ValueError:
+            # Output on another drive than the manifest (Windows)
+            stored_path = str(Path(output_path).resolve())
+        self.data["pages"][str(page_num)] = {
+            "status": "done",
+            "output": stored_path,
+            "output_hash": hash_file(output_path),
+            "seconds": round(seconds, 3),
+            "updated_at": time.time()
+        }
+        if save:
+            self.save()
+
+    def mark_skipped(self, page_num: int, reason: str, save: bool = True) -> None:
+        """
+        Record a page that needs no output (e.g. no table on it) so reruns do not analyze it again
+
+        Args:
+            page_num: Page number (1-indexed)
+            reason: Why the page has no output
+            save: Write the manifest immediately
+        """
+        self.data["pages"][str(page_num)] = {
+            "status": "skipped",
+            "reason": reason,
+            "updated_at": time.time()
+        }
+        if save:
+            self.save()
+
+    def mark_failed(self, page_num: int, error: str, seconds: float, save: bool = True) -> None:
+        """
+        Record a failed page so it is retried on the next run
+
+        Args:
+            page_num: Page number (1-indexed)
+            error: Error description
+            seconds: Time spent on the page
+            save: Write the manifest immediately
+        """
+        self.data["pages"][str(page_num)] = {
+            "status": "failed",
+            "error": error,
+            "seconds": round(seconds, 3),
+            "updated_at": time.time()
+        }
+        if save:
+            self.save()
@@ -0,0 +1,258 @@
+"""
+Page image preparation for vision models
+Picks the resolution of each page from its smallest font size and text density,
+crops blank margins, tiles pages too dense for one image and chooses PNG or
+JPEG by content, so pages cost as few vision tokens as their text allows
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+import fitz  # PyMuPDF
+
+try:
+    from client.telemetry import track
+except ImportError:
+    # pdf_image used without the client package: no telemetry
+    from contextlib import nullcontext
+
+    def track(operation, **labels):
+        return nullcontext({})
+
+# Height in pixels the smallest text is rendered at, enough for the model to read it
+TARGET_TEXT_HEIGHT_PX = 10
+
+# Resolution bounds; scanned pages (no text layer) get SCANNED_DPI
+MIN_DPI = 72
+MAX_DPI = 220
+SCANNED_DPI = 150
+
+# Pages with more characters per square inch of content are rendered at DENSE_TEXT_DPI or more
+DENSE_TEXT_CHARS_PER_SQIN = 150
+DENSE_TEXT_DPI = 110
+
+# Pixel budget per image: Qwen 2.5 VL downscales anything above 1280 patches of 28x28 pixels
+DEFAULT_MAX_PIXELS = 1280 * 28 * 28
+
+# Blank border kept around the content when cropping, in points
+CROP_MARGIN_PT = 8
+
+# Share of the content area covered by raster images above which JPEG is used
+PHOTO_COVERAGE = 0.35
+JPEG_QUALITY = 85
+
+# Vertical overlap between tiles, in points, so no text line is lost at a cut
+TILE_OVERLAP_PT = 6
+
+
+@dataclass
+class PageImage:
+    """
+    Encoded image of a page, or of one tile of a page
+    """
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+    dpi: int
+    clip: Tuple[float, float, float, float]
+    tile: int = 1
+    tile_count: int = 1
+
+    @property
+    def vision_tokens(self) -> int:
+        """Visual tokens the image costs on Qwen 2.5 VL (one per 28x28 pixel patch)"""
+        return math.ceil(self.width / 28) * math.ceil(self.height / 28)
+
+
+def analyze_page_layout(page: fitz.Page) -> Dict[str, Any]:
+    """
+    Measure what drives the rendering choices of a page
+
+    Args:
+        page: PyMuPDF page
+
+    Returns:
+        Dictionary with content_rect, smallest_font_size (None without text),
+        text_chars, text_density (characters per square inch of content),
+        image_coverage and line_spans (vertical extent of every text line)
+    """
+    page_rect = page.rect
+    page_area = page_rect.get_area()
+    content = fitz.Rect()
+    image_area = 0.0
+    for kind, bbox in page.get_bboxlog():
+        rect = fitz.Rect(bbox) & page_rect
+        if rect.is_empty:
+            continue
+        # Full-page backgrounds are not content
+        if kind.startswith("fill-path") and rect.get_area() > 0.9 * page_area:
+            continue
+        content |= rect
+        if "image" in kind:
+            image_area += rect.get_area()
+
+    sizes = []
+    line_spans = []
+    for block in page.get_text("dict")["blocks"]:
+        for line in block.get("lines", []):
+            line_chars = 0
+            for span in line["spans"]:
+                chars = len(span["text"].strip())
+                if chars:
+                    sizes.append((span["size"], chars))
+                    line_chars += chars
+            if line_chars:
+                line_spans.append((line["bbox"][1], line["bbox"][3]))
+
+    # Font size below which 5% of the characters are set, ignoring stray superscripts
+    smallest_font_size = None
+    text_chars = sum(chars for _, chars in sizes)
+    if sizes:
+        threshold = text_chars * 0.05
+        seen = 0
+        for size, chars in sorted(sizes):
+            seen += chars
+            if seen >= threshold:
+                smallest_font_size = size
+                break
+
+    if content.is_empty:
+        content = fitz.Rect(page_rect)
+    content_sqin = content.get_area() / (72 * 72)
+    return {
+        "content_rect": content,
+        "smallest_font_size": smallest_font_size,
+        "text_chars": text_chars,
+        "text_density": text_chars / content_sqin if content_sqin else 0.0,
+        "image_coverage": min(1.0, image_area / content.get_area()) if content.get_area() else 0.0,
+        "line_spans": line_spans,
+    }
+
+
+def choose_dpi(layout: Dict[str, Any], min_dpi: int = MIN_DPI, max_dpi: int = MAX_DPI) -> int:
+    """
+    Pick the lowest resolution at which the page's small text stays readable
+
+    Args:
+        layout: Result of analyze_page_layout
+        min_dpi: Lowest resolution
+        max_dpi: Highest resolution
+
+    Returns:
+        Resolution in DPI
+    """
+    font_size = layout["smallest_font_size"]
+    if font_size is None:
+        dpi = SCANNED_DPI if layout["image_coverage"] > 0 else min_dpi
+    else:
+        dpi = TARGET_TEXT_HEIGHT_PX * 72 / max(font_size, 1.0)
+        if layout["text_density"] >= DENSE_TEXT_CHARS_PER_SQIN:
+            dpi = max(dpi, DENSE_TEXT_DPI)
+    return int(round(min(max(dpi, min_dpi), max_dpi)))
+
+
+def choose_image_format(layout: Dict[str, Any]) -> str:
+    """
+    PNG keeps text and rulings sharp and small; photos and scans compress better as JPEG
+
+    Args:
+        layout: Result of analyze_page_layout
+
+    Returns:
+        "png" or "jpeg"
+    """
+    return "jpeg" if layout["image_coverage"] >= PHOTO_COVERAGE else "png"
+
+
+def split_into_tiles(clip: fitz.Rect, count: int, line_spans: List[Tuple[float, float]]) -> List[fitz.Rect]:
+    """
+    Split a region into horizontal strips, moving each cut into the nearest gap between text lines
+
+    Args:
+        clip: Region to split
+        count: Number of strips
+        line_spans: Vertical extent (y0, y1) of the text lines
+
+    Returns:
+        Strips from top to bottom, overlapping by TILE_OVERLAP_PT
+    """
+    height = clip.height / count
+    cuts = [clip.y0]
+    for index in range(1, count):
+        ideal = clip.y0 + index * height
+        cut = ideal
+        # Lines crossing the ideal cut push it below them, within a third of a strip
+        for y0, y1 in sorted(line_spans):
+            if y0 < cut < y1 and y1 - ideal < height / 3:
+                cut = y1
+        cuts.append(cut)
+    cuts.append(clip.y1)
+
+    return [fitz.Rect(clip.x0, max(clip.y0, top - TILE_OVERLAP_PT), clip.x1, min(clip.y1, bottom + TILE_OVERLAP_PT))
+            for top, bottom in zip(cuts, cuts[1:])]
+
+
+def prepare_page_images(page: fitz.Page, max_pixels: int = DEFAULT_MAX_PIXELS, tile: bool = False,
+                        max_tiles: int = 4, crop: bool = True, min_dpi: int = MIN_DPI,
+                        max_dpi: int = MAX_DPI, image_format: Optional[str] = None) -> List[PageImage]:
+    """
+    Render a page for a vision model
+
+    The resolution follows the smallest font and the text density, and is
+    lowered when the image would exceed max_pixels (the server would downscale
+    it anyway) unless tiling is enabled, in which case the page is cut into up
+    to max_tiles strips of at most max_pixels each.
+
+    Args:
+        page: PyMuPDF page
+        max_pixels: Pixel budget per image
+        tile: Split pages that need more than max_pixels into strips
+        max_tiles: Most strips per page
+        crop: Drop blank margins around the content
+        min_dpi: Lowest resolution
+        max_dpi: Highest resolution
+        image_format: "png" or "jpeg" (default: chosen from the content)
+
+    Returns:
+        Images of the page, from top to bottom
+    """
+    layout = analyze_page_layout(page)
+    clip = fitz.Rect(page.rect)
+    if crop:
+        margin = CROP_MARGIN_PT
+        clip = (layout["content_rect"] + (-margin, -margin, margin, margin)) & page.rect
+
+    dpi = choose_dpi(layout, min_dpi, max_dpi)
+    image_format = image_format or choose_image_format(layout)
+
+    pixels = clip.get_area() * (dpi / 72) ** 2
+    tile_count = 1
+    if pixels > max_pixels and tile:
+        tile_count = min(max_tiles, math.ceil(pixels / max_pixels))
+    if pixels / tile_count > max_pixels:
+        # Still over budget: scale down rather than let the server do it
+        dpi = max(1, int(dpi * math.sqrt(max_pixels * tile_count / pixels)))
+
+    tiles = split_into_tiles(clip, tile_count, layout["line_spans"]) if tile_count > 1 else [clip]
+
+    images = []
+    for index, rect in enumerate(tiles, 1):
+        with track("page_render", dpi=dpi, image_format=image_format) as span:
+            pix = page.get_pixmap(dpi=dpi, clip=rect, alpha=False)
+            if image_format == "jpeg":
+                data = pix.tobytes("jpg", jpg_quality=JPEG_QUALITY)
+            else:
+                data = pix.tobytes("png")
+            span["payload_bytes"] = len(data)
+        images.append(PageImage(
+            data=data,
+            mime_type=f"image/{image_format}",
+            width=pix.width,
+            height=pix.height,
+            dpi=dpi,
+            clip=tuple(rect),
+            tile=index,
+            tile_count=len(tiles),
+        ))
+    return images
@@ -5,34 +5,143 @@ Converts all PDF files in a directory to JPEG images (one per page)
 
 import os
 import sys
-import io
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Optional
+from typing import List, Optional, Tuple, Union
 import fitz  # PyMuPDF
 from PIL import Image
 import logging
 
+try:
+    from .manifest import ConversionManifest
+    from .page_preparation import analyze_page_layout, choose_dpi
+except ImportError:
+    # Run as a script (python pdf_converter.py) with the pdf_image directory on sys.path
+    from manifest import ConversionManifest
+    from page_preparation import analyze_page_layout, choose_dpi
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 
+# File extension and PIL format name for each supported output format
+IMAGE_FORMATS = {
+    "jpeg": (".jpg", "JPEG"),
+    "png": (".png", "PNG"),
+    "webp": (".webp", "WEBP"),
+}
+
+
+def render_page_image(pdf_document: fitz.Document, page_num: int, output_path: Path,
+                      dpi: Union[int, str] = 144, image_format: str = "jpeg", quality: int = 95,
+                      grayscale: bool = False) -> None:
+    """
+    Render one page of an open PDF document and save it as an image
+    
+    PIL reads the pixmap's samples in place through a memoryview (no PPM round
+    trip, no copy of the buffer), and PNG is written by PyMuPDF itself.
+    
+    Args:
+        pdf_document: Open PyMuPDF document
+        page_num: Page number (0-indexed)
+        output_path: Path of the image file to write
+        dpi: Rendering resolution (144 DPI matches the former 2x zoom), or "auto" to
+             fit it to the page's smallest font size and text density
+        image_format: "jpeg", "png" or "webp"
+        quality: JPEG/WebP quality (1-100)
+        grayscale: Render in grayscale, which suits text-only pages
+    """
+    page = pdf_document[page_num]
+    if dpi == "auto":
+        dpi = choose_dpi(analyze_page_layout(page))
+    colorspace = fitz.csGRAY if grayscale else fitz.csRGB
+    pix = page.get_pixmap(dpi=dpi, colorspace=colorspace, alpha=False)
+    
+    if image_format == "png":
+        pix.save(str(output_path))
+        return
+    
+    mode = "L" if grayscale else "RGB"
+    img = Image.frombuffer(mode, (pix.width, pix.height), pix.samples_mv, "raw", mode, pix.stride, 1)
+    # img shares the pixmap's memory: release it before the pixmap, once encoded
+    img.save(output_path, IMAGE_FORMATS[image_format][1], quality=quality)
+    del img
+    del pix
+
+
+def convert_page_range(pdf_path: str, output_dir: str, page_numbers: List[int], render_options: dict) -> Tuple[list, list]:
+    """
+    Worker entry point: open the PDF in this process and convert a range of pages
+    
+    Args:
+        pdf_path: Path to the PDF file
+        output_dir: Directory where this PDF's images are written
+        page_numbers: Page numbers (0-indexed) to convert
+        render_options: Keyword arguments for render_page_image
+        
+    Returns:
+        Tuple of (list of (page_num, output_path, seconds) for converted pages,
+        list of (page_num, error message, seconds) for failed pages)
+    """
+    pdf_name = Path(pdf_path).name
+    converted = []
+    errors = []
+    
+    with fitz.open(pdf_path) as pdf_document:
+        for page_num in page_numbers:
+            start_time = time.perf_counter()
+            try:
+                extension = IMAGE_FORMATS[render_options["image_format"]][0]
+                output_path = Path(output_dir) / f"page_{page_num + 1:03d}{extension}"
+                render_page_image(pdf_document, page_num, output_path, **render_options)
+                converted.append((page_num, str(output_path), time.perf_counter() - start_time))
+            except Exception as e:
+                errors.append((page_num, f"Error converting page {page_num + 1} of {pdf_name}: {e}",
+                               time.perf_counter() - start_time))
+    
+    return converted, errors
+
+
 class PDFToJPEGConverter:
     """
     Simple PDF to JPEG converter that processes all PDFs in a directory
     and exports each page as a separate JPEG image
     """
     
-    def __init__(self, input_dir: str, output_dir: str):
+    def __init__(self, input_dir: str, output_dir: str, workers: int = 1,
+                 image_format: str = "jpeg", quality: int = 95, dpi: Union[int, str] = 144, grayscale: bool = False,
+                 resume: bool = True):
         """
         Initialize the converter with input and output directories
         
         Args:
             input_dir: Directory containing PDF files
             output_dir: Directory where JPEG images will be saved
+            workers: Number of worker processes rendering pages in parallel (1 = serial)
+            image_format: Output format, "jpeg", "png" or "webp"
+            quality: JPEG/WebP quality (1-100)
+            dpi: Rendering resolution (144 DPI matches the former 2x zoom), or "auto" per page
+            grayscale: Render pages in grayscale
+            resume: Skip pages whose output is recorded in the PDF's manifest.json
+                    for the same PDF content and settings
         """
+        image_format = image_format.lower().replace("jpg", "jpeg")
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"Unsupported image format: {image_format}. Supported formats: {list(IMAGE_FORMATS)}")
+        
         self.input_dir = Path(input_dir)
         self.output_dir = Path(output_dir)
+        self.workers = max(1, workers)
+        self.resume = resume
+        self.render_options = {
+            "dpi": dpi,
+            "image_format": image_format,
+            "quality": quality,
+            "grayscale": grayscale
+        }
+        self.page_errors: List[str] = []
         
         # Create output directory if it doesn't exist
         self.output_dir.mkdir(parents=True, exist_ok=True)
@@ -52,6 +161,24 @@ class PDFToJPEGConverter:
         logger.info(f"Found {len(pdf_files)} PDF files in {self.input_dir}")
         return pdf_files
     
+    def open_manifest(self, pdf_path: Path, pdf_output_dir: Path, page_count: int) -> Optional[ConversionManifest]:
+        """
+        Load the conversion manifest of a PDF when resuming is enabled
+        
+        Args:
+            pdf_path: Path to the PDF file
+            pdf_output_dir: Directory holding this PDF's images
+            page_count: Number of pages in the PDF
+            
+        Returns:
+            The manifest, or None if resume is disabled
+        """
+        if not self.resume:
+            return None
+        manifest = ConversionManifest(pdf_output_dir / "manifest.json", pdf_path, self.render_options)
+        manifest.set_page_count(page_count)
+        return manifest
+    
     def convert_pdf_to_jpeg(self, pdf_path: Path) -> int:
         """
         Convert a single PDF file to JPEG images
@@ -62,6 +189,9 @@ class PDFToJPEGConverter:
         Returns:
             Number of pages converted
         """
+        if self.workers > 1:
+            return self.convert_pdfs_parallel([pdf_path]).get(pdf_path, 0)
+        
         try:
             # Open PDF document
             pdf_document = fitz.open(pdf_path)
@@ -74,31 +204,33 @@ class PDFToJPEGConverter:
             pdf_output_dir.mkdir(exist_ok=True)
             
             converted_pages = 0
+            manifest = self.open_manifest(pdf_path, pdf_output_dir, page_count)
             
             # Convert each page to JPEG
             for page_num in range(page_count):
+                if manifest and manifest.is_done(page_num + 1):
+                    converted_pages += 1
+                    logger.debug(f"Skipping unchanged page {page_num + 1}")
+                    continue
+                
+                start_time = time.perf_counter()
                 try:
-                    # Get page
-                    page = pdf_document[page_num]
-                    
-                    # Convert page to image (pixmap)
-                    mat = fitz.Matrix(2.0, 2.0)  # 2x zoom for better quality
-                    pix = page.get_pixmap(matrix=mat)
-                    
-                    # Convert to PIL Image
-                    img_data = pix.tobytes("ppm")
-                    img = Image.open(io.BytesIO(img_data))
-                    
-                    # Save as JPEG
-                    output_filename = f"page_{page_num + 1:03d}.jpg"
+                    extension = IMAGE_FORMATS[self.render_options["image_format"]][0]
+                    output_filename = f"page_{page_num + 1:03d}{extension}"
                     output_path = pdf_output_dir / output_filename
-                    img.save(output_path, "JPEG", quality=95)
+                    render_page_image(pdf_document, page_num, output_path, **self.render_options)
                     
                     converted_pages += 1
                     logger.debug(f"Converted page {page_num + 1} to {output_path}")
+                    if manifest:
+                        manifest.mark_done(page_num + 1, output_path, time.perf_counter() - start_time)
                     
                 except Exception as e:
-                    logger.error(f"Error converting page {page_num + 1} of {pdf_path.name}: {e}")
+                    error_msg = f"Error converting page {page_num + 1} of {pdf_path.name}: {e}"
+                    logger.error(error_msg)
+                    self.page_errors.append(error_msg)
+                    if manifest:
+                        manifest.mark_failed(page_num + 1, str(e), time.perf_counter() - start_time)
                     continue
             
             pdf_document.close()
@@ -109,6 +241,74 @@ class PDFToJPEGConverter:
             logger.error(f"Error converting PDF {pdf_path.name}: {e}")
             return 0
     
+    def convert_pdfs_parallel(self, pdf_files: List[Path]) -> dict:
+        """
+        Convert several PDF files with pages fanned out across a process pool
+        
+        Each worker opens its own fitz document and converts a contiguous range
+        of pages, so document parsing is amortized over the range.
+        
+        Args:
+            pdf_files: PDF files to convert
+            
+        Returns:
+            Dictionary mapping each PDF path to its number of converted pages
+        """
+        pages_converted = {pdf_path: 0 for pdf_path in pdf_files}
+        manifests = {}
+        
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            futures = {}
+            for pdf_path in pdf_files:
+                try:
+                    with fitz.open(pdf_path) as pdf_document:
+                        page_count = pdf_document.page_count
+                except Exception as e:
+                    logger.error(f"Error converting PDF {pdf_path.name}: {e}")
+                    continue
+                
+                logger.info(f"Converting {pdf_path.name} ({page_count} pages) with {self.workers} workers")
+                pdf_output_dir = self.output_dir / pdf_path.stem
+                pdf_output_dir.mkdir(exist_ok=True)
+                
+                manifest = self.open_manifest(pdf_path, pdf_output_dir, page_count)
+                manifests[pdf_path] = manifest
+                pending = list(range(page_count))
+                if manifest:
+                    pending = [page_num - 1 for page_num in manifest.pending_pages(range(1, page_count + 1))]
+                    pages_converted[pdf_path] = page_count - len(pending)
+                
+                # Several ranges per worker keep the pool busy when page costs vary
+                chunk_size = max(1, -(-len(pending) // (self.workers * 4)))
+                for start in range(0, len(pending), chunk_size):
+                    page_numbers = pending[start:start + chunk_size]
+                    future = executor.submit(convert_page_range, str(pdf_path), str(pdf_output_dir), page_numbers,
+                                             self.render_options)
+                    futures[future] = pdf_path
+            
+            for future in as_completed(futures):
+                pdf_path = futures[future]
+                manifest = manifests.get(pdf_path)
+                try:
+                    converted, errors = future.result()
+                except Exception as e:
+                    converted, errors = [], [(None, f"Error converting pages of {pdf_path.name}: {e}", 0.0)]
+                
+                pages_converted[pdf_path] += len(converted)
+                for page_num, error_msg, seconds in errors:
+                    logger.error(error_msg)
+                    self.page_errors.append(error_msg)
+                    if manifest and page_num is not None:
+                        manifest.mark_failed(page_num + 1, error_msg, seconds, save=False)
+                if manifest:
+                    for page_num, output_path, seconds in converted:
+                        manifest.mark_done(page_num + 1, output_path, seconds, save=False)
+                    manifest.save()
+        
+        for pdf_path, converted in pages_converted.items():
+            logger.info(f"Successfully converted {converted} pages from {pdf_path.name}")
+        return pages_converted
+    
     def convert_all_pdfs(self) -> dict:
         """
         Convert all PDF files in the input directory to JPEG images
@@ -129,6 +329,18 @@ class PDFToJPEGConverter:
             "errors": []
         }
         
+        self.page_errors = []
+        
+        if self.workers > 1:
+            for pdf_file, pages_converted in self.convert_pdfs_parallel(pdf_files).items():
+                if pages_converted > 0:
+                    results["converted_files"] += 1
+                    results["total_pages"] += pages_converted
+                else:
+                    results["errors"].append(f"Failed to convert {pdf_file.name}")
+            results["errors"].extend(self.page_errors)
+            return results
+        
         for pdf_file in pdf_files:
             try:
                 pages_converted = self.convert_pdf_to_jpeg(pdf_file)
@@ -142,36 +354,40 @@ class PDFToJPEGConverter:
                 logger.error(error_msg)
                 results["errors"].append(error_msg)
         
+        results["errors"].extend(self.page_errors)
         return results
 
 
-def convert_pdfs(input_dir: str, output_dir: str) -> dict:
+def convert_pdfs(input_dir: str, output_dir: str, workers: int = 1, **render_options) -> dict:
     """
     Simple function to convert all PDFs in a directory to JPEG images
     
     Args:
         input_dir: Directory containing PDF files
         output_dir: Directory where JPEG images will be saved
+        workers: Number of worker processes rendering pages in parallel (1 = serial)
+        **render_options: image_format, quality, dpi and grayscale for PDFToJPEGConverter
         
     Returns:
         Dictionary with conversion results
     """
-    converter = PDFToJPEGConverter(input_dir, output_dir)
+    converter = PDFToJPEGConverter(input_dir, output_dir, workers, **render_options)
     return converter.convert_all_pdfs()
 
 
 if __name__ == "__main__":
     # Example usage
-    if len(sys.argv) != 3:
-        print("Usage: python pdf_converter.py <input_dir> <output_dir>")
-        print("Example: python pdf_converter.py ./pdfs ./images")
+    if len(sys.argv) not in (3, 4):
+        print("Usage: python pdf_converter.py <input_dir> <output_dir> [workers]")
+        print("Example: python pdf_converter.py ./pdfs ./images 8")
         sys.exit(1)
     
     input_directory = sys.argv[1]
     output_directory = sys.argv[2]
+    worker_count = int(sys.argv[3]) if len(sys.argv) == 4 else 1
     
     print(f"Converting PDFs from {input_directory} to {output_directory}")
-    results = convert_pdfs(input_directory, output_directory)
+    results = convert_pdfs(input_directory, output_directory, worker_count)
     
     print(f"\nConversion Results:")
     print(f"Total PDF files: {results['total_files']}")
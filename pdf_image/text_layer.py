@@ -0,0 +1,375 @@
+"""
+Markdown from the PDF text layer
+Classifies pages as born-digital text, scanned, mixed or chart-heavy, and
+converts born-digital pages to markdown locally from their text layout and
+table structure, so only the pages that need a vision model are sent to one
+"""
+
+import re
+from statistics import median
+from typing import Any, Dict, List, Optional
+import fitz  # PyMuPDF
+
+from .page_preparation import analyze_page_layout
+
+try:
+    from client.telemetry import track
+except ImportError:
+    # pdf_image used without the client package: no telemetry
+    from contextlib import nullcontext
+
+    def track(operation, **labels):
+        return nullcontext({})
+
+PAGE_TYPES = ("born_digital", "scanned", "mixed", "chart_heavy")
+
+# Pages with fewer characters have no usable text layer
+MIN_TEXT_CHARS = 40
+
+# Share of unmapped glyphs (replacement or private use characters) above which the text layer is unusable
+MAX_GARBLED_RATIO = 0.05
+
+# Pages without text but with this many vector paths are outlined text, read like scans
+OUTLINED_TEXT_PATHS = 200
+
+# Share of the content area covered by raster images above which a page is mixed
+MIXED_IMAGE_COVERAGE = 0.15
+
+# Chart detection: clusters of graphic shapes labelled with numbers
+CHART_MIN_SHAPES = 2
+CHART_MIN_LABELS = 2
+CHART_MIN_AREA = 0.01
+CHART_CLUSTER_GAP_PT = 15
+
+# Shapes covering more of the page than this are backgrounds or frames
+MAX_SHAPE_AREA = 0.3
+
+# Heading levels by font size relative to the body text
+HEADING_RATIOS = ((1.6, "#"), (1.3, "##"), (1.15, "###"))
+
+# Lines of at most this many characters, set in bold, are headings
+MAX_BOLD_HEADING_CHARS = 80
+
+BULLET_CHARS = "•▪■●◦‣∙–-"
+
+# Drawn bullet marks are small filled shapes just left of the line they mark
+MAX_BULLET_MARK_PT = 6
+BULLET_MARK_GAP_PT = 12
+
+NUMBER_PATTERN = re.compile(r"^[(\-–+]?\d[\d\s.,]*%?\)?%?$")
+
+
+def _is_number(word: str) -> bool:
+    return bool(NUMBER_PATTERN.match(word))
+
+
+def _garbled_ratio(text: str) -> float:
+    """Share of characters the PDF fonts do not map to Unicode"""
+    chars = [char for char in text if not char.isspace()]
+    if not chars:
+        return 0.0
+    garbled = sum(1 for char in chars if char == "�" or 0xE000 <= ord(char) <= 0xF8FF)
+    return garbled / len(chars)
+
+
+def find_data_tables(page: fitz.Page) -> List[Any]:
+    """
+    Find the tables of a page, dropping the grids PyMuPDF reports for bar charts and diagrams
+
+    Args:
+        page: PyMuPDF page
+
+    Returns:
+        PyMuPDF Table objects with at least two rows and two columns, mostly filled
+        cells and some words (bar charts only hold their values)
+    """
+    tables = []
+    for table in page.find_tables().tables:
+        cells = [cell for row in table.extract() for cell in row]
+        filled = [cell for cell in cells if cell and cell.strip()]
+        worded = any(re.search(r"[^\W\d_]", cell) for cell in filled)
+        if table.row_count >= 2 and table.col_count >= 2 and worded \
+                and len(filled) >= 2 and len(filled) >= 0.3 * len(cells):
+            tables.append(table)
+    return tables
+
+
+def find_chart_regions(page: fitz.Page, tables: Optional[List[Any]] = None) -> List[fitz.Rect]:
+    """
+    Locate charts: clusters of filled or curved shapes with numeric labels in or around them
+
+    Shapes holding a line of several words are text boxes, and shapes
+    overlapping a table are its rulings, so neither counts. Single words
+    such as units ("Mds€") are chart labels.
+
+    Args:
+        page: PyMuPDF page
+        tables: Tables of the page (default: find_data_tables)
+
+    Returns:
+        Bounding boxes of the charts
+    """
+    if tables is None:
+        tables = find_data_tables(page)
+    table_rects = [fitz.Rect(table.bbox) for table in tables]
+    page_area = page.rect.get_area()
+
+    numbers = []
+    text_points = []
+    for x0, y0, x1, y1, word, block_no, line_no, _ in page.get_text("words"):
+        center = fitz.Point((x0 + x1) / 2, (y0 + y1) / 2)
+        if _is_number(word):
+            numbers.append(center)
+        else:
+            text_points.append((center, (block_no, line_no)))
+
+    shapes = []
+    for drawing in page.get_drawings():
+        rect = fitz.Rect(drawing["rect"])
+        if rect.is_empty or rect.get_area() > MAX_SHAPE_AREA * page_area:
+            continue
+        if any(rect.intersects(table_rect) for table_rect in table_rects):
+            continue
+        text_lines = [line for point, line in text_points if point in rect]
+        if len(text_lines) > len(set(text_lines)):
+            continue
+        fill = drawing.get("fill")
+        filled = fill is not None and tuple(fill) != (1.0, 1.0, 1.0)
+        curved = any(item[0] == "c" for item in drawing["items"])
+        if filled or curved:
+            shapes.append(rect)
+
+    # Merge shapes closer than CHART_CLUSTER_GAP_PT into clusters
+    gap = CHART_CLUSTER_GAP_PT
+    clusters = []
+    for rect in shapes:
+        region = rect + (-gap, -gap, gap, gap)
+        count = 1
+        for cluster in [cluster for cluster in clusters if cluster[0].intersects(region)]:
+            clusters.remove(cluster)
+            region |= cluster[0]
+            count += cluster[1]
+        clusters.append((region, count))
+
+    charts = []
+    for region, count in clusters:
+        labels = sum(1 for point in numbers if point in region)
+        if count >= CHART_MIN_SHAPES and labels >= CHART_MIN_LABELS \
+                and region.get_area() >= CHART_MIN_AREA * page_area:
+            charts.append(region & page.rect)
+    return charts
+
+
+def classify_page(page: fitz.Page) -> Dict[str, Any]:
+    """
+    Decide whether a page can be converted from its text layer
+
+    Args:
+        page: PyMuPDF page
+
+    Returns:
+        Dictionary with page_type (one of PAGE_TYPES), text_chars, image_coverage,
+        garbled_ratio, tables (PyMuPDF Table objects) and chart_regions
+    """
+    layout = analyze_page_layout(page)
+    garbled_ratio = _garbled_ratio(page.get_text())
+    result = {
+        "page_type": "born_digital",
+        "text_chars": layout["text_chars"],
+        "image_coverage": layout["image_coverage"],
+        "garbled_ratio": garbled_ratio,
+        "tables": [],
+        "chart_regions": [],
+    }
+
+    if layout["text_chars"] < MIN_TEXT_CHARS:
+        # Images or outlined glyphs without text are scans; a page with neither is blank
+        if layout["image_coverage"] > 0 or len(page.get_drawings()) >= OUTLINED_TEXT_PATHS:
+            result["page_type"] = "scanned"
+        return result
+    if garbled_ratio > MAX_GARBLED_RATIO:
+        result["page_type"] = "scanned"
+        return result
+
+    result["tables"] = find_data_tables(page)
+    result["chart_regions"] = find_chart_regions(page, result["tables"])
+    if result["chart_regions"]:
+        result["page_type"] = "chart_heavy"
+    elif layout["image_coverage"] >= MIXED_IMAGE_COVERAGE:
+        result["page_type"] = "mixed"
+    return result
+
+
+def _bullet_marks(page: fitz.Page) -> List[fitz.Rect]:
+    """Small filled shapes used as bullets instead of a bullet character"""
+    marks = []
+    for drawing in page.get_drawings():
+        rect = fitz.Rect(drawing["rect"])
+        if drawing.get("fill") is not None and 0 < rect.width <= MAX_BULLET_MARK_PT \
+                and 0 < rect.height <= MAX_BULLET_MARK_PT:
+            marks.append(rect)
+    return marks
+
+
+def _join_lines(lines: List[str]) -> str:
+    """Join the lines of a paragraph, undoing end-of-line hyphenation"""
+    text = ""
+    for line in lines:
+        if not text:
+            text = line
+        elif re.search(r"\w-$", text) and line[:1].islower():
+            text = text[:-1] + line
+        else:
+            text = f"{text} {line}"
+    return text
+
+
+def _table_markdown(table: Any) -> str:
+    """Markdown of a table, with the lines wrapped inside cells joined"""
+    return re.sub(r"\s*<br>\s*", " ", table.to_markdown()).strip()
+
+
+def page_to_markdown(page: fitz.Page, tables: Optional[List[Any]] = None,
+                     chart_regions: Optional[List[fitz.Rect]] = None) -> str:
+    """
+    Convert a born-digital page to markdown from its text layer
+
+    Headings come from font sizes relative to the body text, bullets from
+    bullet characters or drawn bullet marks, and tables from PyMuPDF's table
+    finder, placed in reading order. Lines split into blocks of their own
+    are joined back into their paragraph.
+
+    Args:
+        page: PyMuPDF page
+        tables: Tables of the page (default: find_data_tables)
+        chart_regions: Charts of the page, left out of the body text size (default: find_chart_regions)
+
+    Returns:
+        Markdown of the page
+    """
+    if tables is None:
+        tables = find_data_tables(page)
+    pending_tables = sorted(((fitz.Rect(table.bbox), table) for table in tables), key=lambda item: item[0].y0)
+    table_rects = [rect for rect, _ in pending_tables]
+    if chart_regions is None:
+        chart_regions = find_chart_regions(page, tables)
+    marks = _bullet_marks(page)
+
+    def center(bbox) -> fitz.Point:
+        return fitz.Point((bbox[0] + bbox[2]) / 2, (bbox[1] + bbox[3]) / 2)
+
+    blocks = [block for block in page.get_text("dict", sort=True)["blocks"] if block.get("type") == 0]
+    # Table cells and chart labels are set smaller than the body text
+    sizes = [(span["size"], len(span["text"].strip()))
+             for block in blocks for line in block["lines"] for span in line["spans"]
+             if span["text"].strip() and not any(center(span["bbox"]) in rect
+                                                 for rect in table_rects + chart_regions)]
+    if not sizes:
+        sizes = [(span["size"], len(span["text"].strip()))
+                 for block in blocks for line in block["lines"] for span in line["spans"] if span["text"].strip()]
+    if not sizes:
+        return "\n\n".join(_table_markdown(table) for _, table in pending_tables)
+    body_size = median([size for size, chars in sizes for _ in range(chars)])
+
+    # Items in reading order: [prefix, lines, last line rect], tables as ["table", [markdown], rect]
+    items = []
+    for block in blocks:
+        block_rect = fitz.Rect(block["bbox"])
+        # Text inside a table is rendered with the table
+        if any(center(block_rect) in rect for rect in table_rects):
+            continue
+        while pending_tables and pending_tables[0][0].y0 <= block_rect.y0:
+            rect, table = pending_tables.pop(0)
+            items.append(["table", [_table_markdown(table)], rect])
+
+        lines = []
+        for line in block["lines"]:
+            spans = [span for span in line["spans"] if span["text"].strip()]
+            if spans:
+                bold = all(span["flags"] & 16 or "bold" in span["font"].lower() for span in spans)
+                lines.append((line, spans, bold))
+        # Page numbers
+        if len(lines) == 1 and block_rect.y0 > page.rect.height * 0.9 \
+                and "".join(span["text"] for span in lines[0][1]).strip().isdigit():
+            continue
+        # A bold paragraph is emphasis, bold lines among regular ones are headings
+        all_bold = len(lines) > 2 and all(bold for _, _, bold in lines)
+
+        for index, (line, spans, bold) in enumerate(lines):
+            text = " ".join("".join(span["text"] for span in line["spans"]).split())
+            size = max(span["size"] for span in spans)
+            line_rect = fitz.Rect(line["bbox"])
+
+            prefix = ""
+            for ratio, marker in HEADING_RATIOS:
+                if size >= body_size * ratio:
+                    prefix = marker + " "
+                    break
+            if not prefix and bold and not all_bold and len(text) <= MAX_BOLD_HEADING_CHARS:
+                prefix = "### "
+
+            if text[0] in BULLET_CHARS and (len(text) == 1 or text[1] == " "):
+                prefix, text = "- ", text[1:].strip()
+            elif any(0 <= line_rect.x0 - mark.x1 <= BULLET_MARK_GAP_PT
+                     and mark.y0 < line_rect.y1 and mark.y1 > line_rect.y0 for mark in marks):
+                prefix = "- "
+            if not text:
+                continue
+
+            previous = items[-1] if items else None
+            if previous is None or previous[0] == "table":
+                continues = False
+            elif prefix:
+                # Heading lines continue the heading above
+                continues = prefix.startswith("#") and prefix == previous[0] and index > 0
+            elif previous[0].startswith("#"):
+                continues = False
+            elif index > 0:
+                continues = True
+            else:
+                # A block starting right under a paragraph, aligned with it, or under a bullet,
+                # indented like its text, wraps that paragraph or bullet
+                last_rect = previous[2]
+                aligned = abs(line_rect.x0 - last_rect.x0) <= 2 if previous[0] == "" \
+                    else line_rect.x0 >= last_rect.x0 - 2
+                continues = aligned and 0 <= line_rect.y0 - last_rect.y1 <= size * 0.8
+
+            if continues:
+                previous[1].append(text)
+                previous[2] = line_rect
+            else:
+                items.append([prefix, [text], line_rect])
+
+    for rect, table in pending_tables:
+        items.append(["table", [_table_markdown(table)], rect])
+
+    parts = []
+    for index, (prefix, lines, _) in enumerate(items):
+        text = lines[0] if prefix == "table" else _join_lines(lines)
+        if prefix == "table":
+            parts.append(text)
+        elif prefix == "- " and index and items[index - 1][0] == "- ":
+            parts[-1] += f"\n- {text}"
+        else:
+            parts.append(f"{prefix}{text}")
+    return "\n\n".join(part for part in parts if part)
+
+
+def extract_page_markdown(page: fitz.Page) -> Dict[str, Any]:
+    """
+    Classify a page and convert it locally when it is born-digital
+
+    Args:
+        page: PyMuPDF page
+
+    Returns:
+        The result of classify_page, plus markdown: the page's markdown for
+        born-digital pages, None for pages that need a vision model
+    """
+    result = classify_page(page)
+    result["markdown"] = None
+    if result["page_type"] == "born_digital":
+        with track("local_markdown") as span:
+            result["markdown"] = page_to_markdown(page, result["tables"], result["chart_regions"])
+            span["payload_bytes"] = len(result["markdown"].encode("utf-8"))
+    return result
@@ -0,0 +1,9 @@
+"""
+Page-level pipeline runner
+Runs the agents' steps as a graph of stages with bounded queues between them,
+see document_pipeline.py for the detect -> render -> parse -> check graph
+"""
+
+from .runner import PipelineRunner, Stage, Task
+
+__all__ = ["PipelineRunner", "Stage", "Task"]
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Page-level document pipeline: detect tables -> render -> parse -> check requirements.
+
+Runs the agents' steps as one graph of page tasks instead of separate scripts
+exchanging files: each document is fanned out into the pages to parse, pages
+are rendered (or converted from the text layer) by CPU workers while earlier
+pages wait on the LLM, and the parsed pages of a document are gathered back
+to check the requirements against them. Bounded queues between the stages
+keep at most a few rendered pages in memory per stage.
+
+Usage:
+    python pipeline/document_pipeline.py [pdf ...] [--pages tables|all] [--requirements JSON] [--no-check]
+"""
+
+import argparse
+import sys
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# Add the project root to the path to import the agents and the LLM client
+script_dir = Path(__file__).resolve().parent
+project_root = script_dir.parent
+sys.path.insert(0, str(project_root))
+
+from client.llm_client import create_client, get_config, get_cache_stats
+from client.telemetry import write_report, get_summary, start_metrics_server_from_env
+from pdf_image import PDFDocumentSession
+from retrieval import ReportRetriever, chunk_markdown
+from agents.where_is_tables.table_detector import detect_tables_in_pdf
+from agents.pdf_to_markdown_all.pdf_to_markdown_parser import (
+    PAGE_IMAGE_OPTIONS, parse_page_with_llm, save_markdown_page, markdown_page_path
+)
+from agents.tt_exigence_1_page.requirement_checker import ConformityRunner, OrderedCSVWriter, read_json_file
+from pipeline.runner import PipelineRunner
+
+DATA_DIR = project_root / "data"
+OUTPUT_DIR = project_root / "data-parsed" / "pipeline"
+REQUIREMENTS_JSON = project_root / "agents" / "image_to_json" / "output" / "page_006.json"
+DEFAULT_PDF = DATA_DIR / "malakoff-humanis-rapport-ESG-climat-article-29-loi-energie-climat-exercice-2022-mh-22365-2306-192.pdf"
+
+# Workers per stage: detection and checking are per document, rendering is CPU bound
+# and parsing mostly waits on the LLM server
+STAGE_WORKERS = {'detect': 1, 'render': 2, 'parse': 4, 'check': 1}
+
+# Tasks waiting in front of each stage (rendered pages are the large ones)
+QUEUE_SIZE = 8
+
+
+class DocumentPipeline:
+    """
+    Parses PDFs page by page and checks requirements against each parsed document.
+    """
+
+    def __init__(self, llm_client, model_name: str, output_dir: Path = OUTPUT_DIR, pages: Optional[str] = None,
+                 hybrid: bool = False, requirements: Optional[List[Any]] = None,
+                 workers: Optional[Dict[str, int]] = None, queue_size: int = QUEUE_SIZE,
+                 check_workers: int = 4, batch_size: int = 1):
+        """
+        Args:
+            llm_client: LLM client shared by every stage
+            model_name (str): Name of the model to use
+            output_dir (Path): Receives <pdf>/<pdf>_page_XXX.md files and <pdf>_conformity.csv
+            pages (str, optional): "tables" to parse only the pages where tables are detected, "all" for
+                every page. Defaults to "all" when requirements are checked, since answers can sit
+                in the text of any page, and to "tables" otherwise
+            hybrid (bool): Convert born-digital pages from their text layer instead of sending them to the LLM
+            requirements (List, optional): Requirement rows checked against every document; no check when omitted
+            workers (Dict[str, int], optional): Workers per stage, overriding STAGE_WORKERS
+            queue_size (int): Capacity of the queue in front of each stage
+            check_workers (int): Requirements checked in parallel within the check stage
+            batch_size (int): Maximum requirements per LLM call in the check stage
+        """
+        self.llm_client = llm_client
+        self.model_name = model_name
+        self.output_dir = Path(output_dir)
+        self.pages = pages or ("all" if requirements else "tables")
+        self.hybrid = hybrid
+        self.requirements = requirements
+        self.check_workers = check_workers
+        self.batch_size = batch_size
+
+        self._sessions: Dict[Path, PDFDocumentSession] = {}
+        self._sessions_lock = threading.Lock()
+
+        workers = {**STAGE_WORKERS, **(workers or {})}
+        self.runner = PipelineRunner()
+        self.runner.add_stage('detect', self.detect, workers['detect'], queue_size, fan_out=True)
+        self.runner.add_stage('render', self.render, workers['render'], queue_size, after=['detect'])
+        self.runner.add_stage('parse', self.parse, workers['parse'], queue_size, after=['render'])
+        self.runner.add_stage('check', self.check, workers['check'], queue_size, after=['parse'], join=True)
+
+    def document_dir(self, pdf_path: Path) -> Path:
+        """Directory of a document's parsed pages"""
+        return self.output_dir / pdf_path.stem.replace(' ', '_')
+
+    def detect(self, pdf_path: Path) -> List[Dict[str, Any]]:
+        """
+        Open a document and list the pages to parse.
+
+        Args:
+            pdf_path (Path): PDF file
+
+        Returns:
+            List[Dict]: One task per page, with pdf_path and page
+        """
+        session = PDFDocumentSession(pdf_path, cache_images=False)
+        session.open()
+        with self._sessions_lock:
+            self._sessions[pdf_path] = session
+        self.document_dir(pdf_path).mkdir(parents=True, exist_ok=True)
+
+        if self.pages == "all":
+            page_numbers = list(range(1, session.page_count + 1))
+        else:
+            page_numbers = detect_tables_in_pdf(pdf_path, self.llm_client, self.model_name, session)
+        print(f"📄 {pdf_path.name}: {len(page_numbers)}/{session.page_count} pages to parse")
+        return [{'pdf_path': pdf_path, 'page': page_num} for page_num in page_numbers]
+
+    def render(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Convert a born-digital page from its text layer, or render it for the vision model.
+
+        Args:
+            task (Dict): Page task
+
+        Returns:
+            Dict: The task with either markdown or images
+        """
+        session = self._sessions[task['pdf_path']]
+        if self.hybrid:
+            try:
+                local_page = session.get_page_markdown(task['page'])
+            except Exception as e:
+                print(f"⚠️ Page {task['page']}: text layer conversion failed, sending to the LLM: {e}")
+                local_page = None
+            if local_page:
+                task['page_type'] = local_page['page_type']
+                if local_page['markdown'] is not None:
+                    task['markdown'] = local_page['markdown']
+                    return task
+        task['images'] = session.get_page_images(task['page'], **PAGE_IMAGE_OPTIONS)
+        return task
+
+    def parse(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Parse a rendered page with the LLM and save the page's markdown.
+
+        Args:
+            task (Dict): Page task from the render stage
+
+        Returns:
+            Dict: The task with markdown and output (the saved file)
+        """
+        pdf_path = task['pdf_path']
+        if 'markdown' not in task:
+            images = task.pop('images')
+            content = parse_page_with_llm(self.llm_client, self.model_name, pdf_path, task['page'], None, images)
+            if not content or content.startswith("Error"):
+                raise RuntimeError(content or f"No content for page {task['page']}")
+            task['markdown'] = content
+        task['output'] = save_markdown_page(task['markdown'], pdf_path.name, task['page'], self.document_dir(pdf_path))
+        return task
+
+    def check(self, pdf_path: Path, pages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Check the requirements against the parsed pages of a document.
+
+        Args:
+            pdf_path (Path): PDF file
+            pages (List[Dict]): Parsed page tasks, in page order
+
+        Returns:
+            Dict: pdf_path, pages (parsed page numbers), outputs (markdown files),
+                csv (conformity results, when requirements are checked) and results
+        """
+        self.close_session(pdf_path)
+        summary = {
+            'pdf_path': pdf_path,
+            'pages': [page['page'] for page in pages],
+            'outputs': [page['output'] for page in pages if page.get('output')],
+            'csv': None,
+            'results': []
+        }
+        if not self.requirements or not pages:
+            return summary
+
+        chunks = []
+        for page in pages:
+            source = markdown_page_path(pdf_path.name, page['page'], self.document_dir(pdf_path)).name
+            chunks.extend(chunk_markdown(page['markdown'], source, page['page']))
+        runner = ConformityRunner(retriever=ReportRetriever(chunks), client=self.llm_client)
+
+        csv_path = self.output_dir / f"{pdf_path.stem.replace(' ', '_')}_conformity.csv"
+        with OrderedCSVWriter(str(csv_path)) as writer:
+            summary['results'] = runner.check_many(
+                self.requirements,
+                max_workers=self.check_workers,
+                on_result=lambda index, row, result: writer.add(index, result, row),
+                batch_size=self.batch_size
+            )
+        summary['csv'] = csv_path
+        return summary
+
+    def close_session(self, pdf_path: Path) -> None:
+        """Close the open document of a PDF, if any"""
+        with self._sessions_lock:
+            session = self._sessions.pop(pdf_path, None)
+        if session is not None:
+            session.close()
+
+    def run(self, pdf_paths: List[Path]) -> List[Dict[str, Any]]:
+        """
+        Run every PDF through the pipeline.
+
+        Args:
+            pdf_paths (List[Path]): PDF files
+
+        Returns:
+            List[Dict]: One summary per document (see check), with error set when it failed
+        """
+        try:
+            tasks = self.runner.run([Path(pdf_path) for pdf_path in pdf_paths], key=lambda path: path.name)
+        finally:
+            for pdf_path in list(self._sessions):
+                self.close_session(pdf_path)
+
+        summaries = []
+        for task in tasks:
+            if task.error:
+                pdf_path = task.payload[0] if isinstance(task.payload, tuple) else task.payload
+                summaries.append({'pdf_path': pdf_path, 'error': task.error})
+            else:
+                summaries.append(dict(task.payload, timings=task.timings))
+        return summaries
+
+
+def main(argv: Optional[List[str]] = None):
+    """
+    Main function - run the pipeline over PDFs
+    """
+    parser = argparse.ArgumentParser(description="Detect, render, parse and check PDFs as one page-level pipeline")
+    parser.add_argument('pdfs', nargs='*', type=Path, default=[DEFAULT_PDF], help="PDF files (default: the ESG report)")
+    parser.add_argument('--pages', choices=['tables', 'all'],
+                        help="Parse only the pages with tables, or every page (default: all when checking, "
+                             "tables with --no-check)")
+    parser.add_argument('--requirements', type=Path, default=REQUIREMENTS_JSON,
+                        help="JSON table of requirements to check (image_to_json output)")
+    parser.add_argument('--no-check', action='store_true', help="Parse only, do not check requirements")
+    parser.add_argument('--hybrid', action='store_true',
+                        help="Convert born-digital pages from their text layer instead of sending them to the LLM")
+    parser.add_argument('--output', type=Path, default=OUTPUT_DIR, help="Output directory")
+    parser.add_argument('--render-workers', type=int, default=STAGE_WORKERS['render'])
+    parser.add_argument('--parse-workers', type=int, default=STAGE_WORKERS['parse'])
+    parser.add_argument('--queue-size', type=int, default=QUEUE_SIZE)
+    parser.add_argument('--batch-size', type=int, default=1, help="Requirements per LLM call when checking")
+    args = parser.parse_args(argv)
+
+    print("🔀 Document Pipeline - detect → render → parse → check")
+    print("=" * 50)
+
+    missing = [pdf_path for pdf_path in args.pdfs if not pdf_path.exists()]
+    if missing:
+        print(f"❌ PDF not found: {', '.join(str(pdf_path) for pdf_path in missing)}")
+        return
+
+    requirements = None
+    if not args.no_check:
+        data = read_json_file(str(args.requirements))
+        requirements = data.get('data', {}).get('table', {}).get('rows', [])
+        if not requirements:
+            print(f"❌ No requirement rows in {args.requirements}")
+            return
+        print(f"📋 {len(requirements)} requirements from {args.requirements.name}")
+
+    # Serve live metrics when TELEMETRY_PORT is set
+    start_metrics_server_from_env()
+
+    config = get_config()
+    llm_client = create_client(
+        endpoint_url=config['endpoint_url'],
+        model_name=config['model_name'],
+        api_key=config['api_key']
+    )
+    print(f"🤖 LLM Client ready: {config['model_name']}")
+    print(f"   Endpoint: {config['endpoint_url']}")
+
+    pipeline = DocumentPipeline(
+        llm_client,
+        config['model_name'],
+        output_dir=args.output,
+        pages=args.pages,
+        hybrid=args.hybrid,
+        requirements=requirements,
+        workers={'render': args.render_workers, 'parse': args.parse_workers},
+        queue_size=args.queue_size,
+        batch_size=args.batch_size
+    )
+    summaries = pipeline.run(args.pdfs)
+
+    print(f"\n📊 Summary")
+    print("=" * 20)
+    for summary in summaries:
+        if summary.get('error'):
+            print(f"❌ {summary['pdf_path']}: {summary['error']}")
+            continue
+        print(f"✅ {summary['pdf_path'].name}: {len(summary['outputs'])} pages parsed")
+        if summary['csv']:
+            print(f"   📝 {summary['csv']}")
+
+    # Busy time above wall time is the overlap between stages
+    stats = pipeline.runner.stats()
+    print(f"⏱️  Wall time {stats['wall_seconds']}s, stage time {stats['busy_seconds']}s")
+    for name, stage in stats['stages'].items():
+        print(f"   {name}: {stage['processed']} x, {stage['busy_seconds']}s busy, "
+              f"{stage['errors']} errors, queue up to {stage['max_queue_depth']}")
+
+    cache_stats = get_cache_stats()
+    if cache_stats:
+        print(f"💾 LLM cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
+
+    telemetry_files = write_report(args.output / "telemetry")
+    print(f"⏱️  Telemetry report: {telemetry_files['json']}")
+    for operation, operation_stats in get_summary().items():
+        print(f"   {operation}: {operation_stats['count']} x, {operation_stats['total_seconds']}s total")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,296 @@
+"""
+Threaded DAG runner with bounded queues between stages.
+
+Every stage has its own worker threads and input queue, so different items
+are in different stages at the same time: page 2 renders while page 1 waits
+on the LLM. A full queue blocks the stage feeding it, which bounds memory
+(rendered pages waiting for a slow LLM) and lets the slowest stage set the
+pace instead of piling up work.
+
+Stages can fan out (one document becomes its pages) and join (the pages of
+a document are gathered back before a document-level step). A task whose
+stage fails carries its error to the end of the graph, so joins always see
+every member of their group.
+"""
+
+import time
+import queue
+import logging
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+try:
+    from client.telemetry import track
+except ImportError:
+    # pipeline used without the client package: no telemetry
+    from contextlib import nullcontext
+
+    def track(operation, **labels):
+        return nullcontext({})
+
+logger = logging.getLogger(__name__)
+
+# Marks the end of a stage's input
+_DONE = object()
+
+
+@dataclass
+class Task:
+    """
+    One unit of work travelling through the graph.
+    """
+    key: str
+    payload: Any
+    # Fan-out children: key of the parent task, position and number of siblings (0 for an empty fan-out)
+    group: Optional[str] = None
+    index: int = 0
+    group_size: int = 1
+    # Payload of the task that fanned out, handed to the join
+    parent: Any = None
+    error: Optional[str] = None
+    timings: Dict[str, float] = field(default_factory=dict)
+
+
+class Stage:
+    """
+    A step of the graph and its workers.
+    """
+
+    def __init__(self, name: str, func: Callable, workers: int = 1, queue_size: int = 8,
+                 after: Optional[List[str]] = None, fan_out: bool = False, join: bool = False):
+        """
+        Args:
+            name: Stage name, used by `after` and in the statistics
+            func: Called with a task payload, returns the new payload; fan-out stages return
+                a list of child payloads, join stages are called with the payload that was
+                fanned out and the list of its children's payloads (failed ones left out)
+                and return one payload
+            workers: Threads running the stage
+            queue_size: Capacity of the input queue; producers block when it is full
+            after: Upstream stages (default: none, the stage receives the input items)
+            fan_out: func returns several payloads per input
+            join: func gets all payloads fanned out from the same task at once (one upstream stage only)
+        """
+        self.name = name
+        self.func = func
+        self.workers = workers
+        self.after = list(after or [])
+        self.fan_out = fan_out
+        self.join = join
+        self.queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self.downstream: List["Stage"] = []
+
+        self._lock = threading.Lock()
+        self._open_upstreams = 0
+        self._running_workers = 0
+        self._groups: Dict[str, List[Task]] = {}
+        self.processed = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.max_queue_depth = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters of the stage"""
+        return {
+            'processed': self.processed,
+            'errors': self.errors,
+            'workers': self.workers,
+            'busy_seconds': round(self.busy_seconds, 3),
+            'blocked_seconds': round(self.wait_seconds, 3),
+            'max_queue_depth': self.max_queue_depth
+        }
+
+
+class PipelineRunner:
+    """
+    Runs items through a DAG of stages, each stage in its own thread pool.
+
+    Usage:
+        runner = PipelineRunner()
+        runner.add_stage('render', render_page, workers=2)
+        runner.add_stage('parse', parse_page, workers=4, after=['render'])
+        results = runner.run(pages)
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, Stage] = {}
+        self.results: List[Task] = []
+        self.wall_seconds = 0.0
+        self._results_lock = threading.Lock()
+
+    def add_stage(self, name: str, func: Callable, workers: int = 1, queue_size: int = 8,
+                  after: Optional[List[str]] = None, fan_out: bool = False, join: bool = False) -> Stage:
+        """
+        Add a stage, see Stage for the arguments. Upstream stages must be added first.
+
+        Returns:
+            The new stage
+        """
+        if name in self.stages:
+            raise ValueError(f"Stage {name} already exists")
+        stage = Stage(name, func, workers, queue_size, after, fan_out, join)
+        if join and len(stage.after) != 1:
+            # With several branches every child would arrive once per branch
+            raise ValueError(f"Join stage {name} needs exactly one upstream stage")
+        for upstream in stage.after:
+            if upstream not in self.stages:
+                raise ValueError(f"Stage {name} runs after unknown stage {upstream}")
+            self.stages[upstream].downstream.append(stage)
+        self.stages[name] = stage
+        return stage
+
+    def _put(self, stage: Stage, task: Any) -> None:
+        """Queue a task for a stage, blocking while its queue is full"""
+        start = time.perf_counter()
+        stage.queue.put(task)
+        waited = time.perf_counter() - start
+        with stage._lock:
+            stage.wait_seconds += waited
+            stage.max_queue_depth = max(stage.max_queue_depth, stage.queue.qsize())
+
+    def _emit(self, stage: Stage, task: Task) -> None:
+        """Send a finished task downstream, or to the results when the stage is a sink"""
+        if not stage.downstream:
+            with self._results_lock:
+                self.results.append(task)
+            return
+        for index, downstream in enumerate(stage.downstream):
+            # Each branch gets its own copy so stages cannot see each other's changes
+            copy = task if index == 0 else Task(task.key, task.payload, task.group, task.index, task.group_size,
+                                                task.parent, task.error, dict(task.timings))
+            self._put(downstream, copy)
+
+    def _process(self, stage: Stage, task: Task) -> List[Task]:
+        """Run the stage function on a task, returning the tasks it produces"""
+        if stage.join:
+            with stage._lock:
+                members = stage._groups.setdefault(task.group or task.key, [])
+                members.append(task)
+                if len(members) < max(task.group_size, 1):
+                    return []
+                del stage._groups[task.group or task.key]
+            members.sort(key=lambda member: member.index)
+            failed = [member for member in members if member.error]
+            payload = [member.payload for member in members if not member.error and member.group_size]
+            parent = Task(task.group or task.key, (task.parent if task.group else task.payload, payload))
+            for member in members:
+                for name, seconds in member.timings.items():
+                    parent.timings[name] = parent.timings.get(name, 0.0) + seconds
+            if failed:
+                logger.warning(f"{stage.name}: {len(failed)}/{len(members)} tasks of {parent.key} failed upstream")
+                if len(failed) == len(members):
+                    parent.error = failed[0].error
+                    return [parent]
+            task = parent
+        elif task.error or not task.group_size:
+            # Carry failures and empty fan-outs to the end of the graph
+            return [task]
+
+        start = time.perf_counter()
+        try:
+            with track('pipeline_stage', stage=stage.name):
+                output = stage.func(*task.payload) if stage.join else stage.func(task.payload)
+        except Exception as e:
+            logger.error(f"{stage.name} failed on {task.key}: {e}")
+            task.error = f"{stage.name}: {e}"
+            with stage._lock:
+                stage.errors += 1
+            output = task.payload
+        elapsed = time.perf_counter() - start
+        with stage._lock:
+            stage.processed += 1
+            stage.busy_seconds += elapsed
+        task.timings[stage.name] = task.timings.get(stage.name, 0.0) + elapsed
+
+        if not stage.fan_out or task.error:
+            task.payload = output
+            return [task]
+
+        children = list(output or [])
+        if not children:
+            # Nothing to fan out: the parent goes on as an empty group so joins still complete
+            return [Task(task.key, None, task.key, 0, 0, task.payload, None, task.timings)]
+        return [Task(f"{task.key}/{index}", child, task.key, index, len(children), task.payload, None,
+                     dict(task.timings))
+                for index, child in enumerate(children)]
+
+    def _worker(self, stage: Stage) -> None:
+        while True:
+            task = stage.queue.get()
+            if task is _DONE:
+                break
+            for produced in self._process(stage, task):
+                self._emit(stage, produced)
+
+        # The last worker of a stage closes the stages downstream of it
+        with stage._lock:
+            stage._running_workers -= 1
+            last = stage._running_workers == 0
+        if last:
+            for downstream in stage.downstream:
+                self._close_upstream(downstream)
+
+    def _close_upstream(self, stage: Stage) -> None:
+        with stage._lock:
+            stage._open_upstreams -= 1
+            closed = stage._open_upstreams == 0
+        if closed:
+            for _ in range(stage.workers):
+                stage.queue.put(_DONE)
+
+    def run(self, items: Iterable[Any], key: Optional[Callable[[Any], str]] = None) -> List[Task]:
+        """
+        Run items through the graph and wait for every stage to finish.
+
+        Args:
+            items: Inputs of the stages without upstream stages
+            key: Names an item in logs and results (default: str)
+
+        Returns:
+            Tasks that left the sink stages, in completion order; failed ones have error set
+        """
+        if not self.stages:
+            raise ValueError("The pipeline has no stages")
+        key = key or str
+        self.results = []
+        sources = [stage for stage in self.stages.values() if not stage.after]
+
+        threads = []
+        for stage in self.stages.values():
+            stage._open_upstreams = len(stage.after)
+            stage._running_workers = stage.workers
+            for number in range(stage.workers):
+                thread = threading.Thread(target=self._worker, args=(stage,), daemon=True,
+                                          name=f"pipeline-{stage.name}-{number}")
+                thread.start()
+                threads.append(thread)
+
+        start = time.perf_counter()
+        for item in items:
+            for stage in sources:
+                self._put(stage, Task(key(item), item))
+        for stage in sources:
+            for _ in range(stage.workers):
+                stage.queue.put(_DONE)
+
+        for thread in threads:
+            thread.join()
+        self.wall_seconds = time.perf_counter() - start
+        return self.results
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Statistics of the last run.
+
+        Returns:
+            Dict with wall_seconds, busy_seconds (summed over stages; above wall_seconds when
+            stages overlapped) and per-stage counters
+        """
+        stages = {name: stage.stats() for name, stage in self.stages.items()}
+        return {
+            'wall_seconds': round(self.wall_seconds, 3),
+            'busy_seconds': round(sum(stage['busy_seconds'] for stage in stages.values()), 3),
+            'stages': stages
+        }
@@ -0,0 +1,16 @@
+from .chunker import chunk_markdown, load_parsed_reports, page_from_filename
+from .bm25 import BM25Index, tokenize
+from .embeddings import EmbeddingBackend, embeddings_available
+from .retriever import ReportRetriever, requirement_to_query
+
+__all__ = [
+    'chunk_markdown',
+    'load_parsed_reports',
+    'page_from_filename',
+    'BM25Index',
+    'tokenize',
+    'EmbeddingBackend',
+    'embeddings_available',
+    'ReportRetriever',
+    'requirement_to_query'
+]
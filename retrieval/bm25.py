@@ -0,0 +1,156 @@
+"""
+BM25 inverted index
+Lexical ranking of report chunks, persisted to disk as JSON
+"""
+
+import re
+import json
+import math
+import unicodedata
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Any, Tuple
+
+# Frequent French and English words that carry no retrieval signal
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'by', 'for', 'from', 'in', 'is', 'it', 'of', 'on',
+    'or', 'that', 'the', 'to', 'with', 'au', 'aux', 'avec', 'ce', 'ces', 'dans', 'de', 'des', 'du',
+    'en', 'est', 'et', 'la', 'le', 'les', 'leur', 'leurs', 'par', 'pour', 'qui', 'que', 'sur', 'un',
+    'une', 'l', 'd'
+}
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Normalize text into index terms: lowercase, accents removed, stopwords dropped,
+    and a plural "s" stripped so "emissions" and "émission" match.
+
+    Args:
+        text (str): Text to tokenize
+
+    Returns:
+        List[str]: Index terms
+    """
+    normalized = unicodedata.normalize('NFKD', text.lower())
+    normalized = ''.join(char for char in normalized if not unicodedata.combining(char))
+
+    terms = []
+    for token in TOKEN_PATTERN.findall(normalized):
+        if token in STOPWORDS:
+            continue
+        if len(token) > 3 and token.endswith('s') and not token.isdigit():
+            token = token[:-1]
+        terms.append(token)
+    return terms
+
+
+class BM25Index:
+    """
+    Okapi BM25 over a list of chunks, with an inverted index of term frequencies
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """
+        Create an empty index
+
+        Args:
+            k1: Term frequency saturation
+            b: Document length normalization
+        """
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[int, int]] = {}
+        self.doc_lengths: List[int] = []
+        self.average_length = 0.0
+
+    def build(self, texts: List[str]) -> "BM25Index":
+        """
+        Index a list of documents (chunk texts), replacing any previous content
+
+        Args:
+            texts: Document texts; their positions are the document ids
+
+        Returns:
+            The index itself
+        """
+        self.postings = {}
+        self.doc_lengths = []
+        for doc_id, text in enumerate(texts):
+            terms = tokenize(text)
+            self.doc_lengths.append(len(terms))
+            for term, count in Counter(terms).items():
+                self.postings.setdefault(term, {})[doc_id] = count
+        self.average_length = sum(self.doc_lengths) / len(self.doc_lengths) if self.doc_lengths else 0.0
+        return self
+
+    def idf(self, term: str) -> float:
+        """
+        Inverse document frequency of a term (BM25+ style, never negative)
+        """
+        doc_count = len(self.postings.get(term, {}))
+        total = len(self.doc_lengths)
+        return math.log(1 + (total - doc_count + 0.5) / (doc_count + 0.5))
+
+    def search(self, query: str, top_k: int = 8) -> List[Tuple[int, float]]:
+        """
+        Rank documents against a query
+
+        Args:
+            query: Query text
+            top_k: Number of results to return
+
+        Returns:
+            List of (document id, score), best first
+        """
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf(term)
+            for doc_id, frequency in postings.items():
+                length_norm = 1 - self.b + self.b * self.doc_lengths[doc_id] / (self.average_length or 1)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Serialize the index to a JSON-compatible dictionary
+        """
+        return {
+            'k1': self.k1,
+            'b': self.b,
+            'doc_lengths': self.doc_lengths,
+            'postings': {term: {str(doc_id): count for doc_id, count in postings.items()}
+                         for term, postings in self.postings.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BM25Index":
+        """
+        Restore an index serialized with to_dict
+        """
+        index = cls(data['k1'], data['b'])
+        index.doc_lengths = data['doc_lengths']
+        index.postings = {term: {int(doc_id): count for doc_id, count in postings.items()}
+                          for term, postings in data['postings'].items()}
+        index.average_length = sum(index.doc_lengths) / len(index.doc_lengths) if index.doc_lengths else 0.0
+        return index
+
+    def save(self, path) -> None:
+        """
+        Write the index to a JSON file
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.to_dict(), file)
+
+    @classmethod
+    def load(cls, path) -> "BM25Index":
+        """
+        Read an index written by save
+        """
+        with open(path, 'r', encoding='utf-8') as file:
+            return cls.from_dict(json.load(file))
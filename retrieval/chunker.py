@@ -0,0 +1,126 @@
+"""
+Markdown chunker
+Splits parsed report pages (data-parsed/*.md) into overlapping chunks that keep
+their source file and page number for provenance
+"""
+
+import re
+from pathlib import Path
+from typing import Dict, List, Optional, Any
+
+# Page number embedded by the markdown parsers: <pdf>_page_051.md
+PAGE_FILENAME_PATTERN = re.compile(r'_page_(\d+)\.md$')
+
+
+def page_from_filename(file_name: str) -> Optional[int]:
+    """
+    Extract the page number from a parsed page file name.
+
+    Args:
+        file_name (str): File name such as "report_page_051.md"
+
+    Returns:
+        Optional[int]: The page number, or None if the name has none
+    """
+    match = PAGE_FILENAME_PATTERN.search(file_name)
+    return int(match.group(1)) if match else None
+
+
+def split_long_text(text: str, max_chars: int, overlap: int) -> List[str]:
+    """
+    Split text that exceeds max_chars into whitespace-aligned windows with overlap.
+
+    Args:
+        text (str): Text to split
+        max_chars (int): Maximum characters per window
+        overlap (int): Characters shared by consecutive windows
+
+    Returns:
+        List[str]: Text windows
+    """
+    windows = []
+    start = 0
+    while start < len(text):
+        end = min(start + max_chars, len(text))
+        if end < len(text):
+            # Break on the last whitespace inside the window when there is one
+            space = text.rfind(' ', start + max_chars // 2, end)
+            if space != -1:
+                end = space
+        windows.append(text[start:end].strip())
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return [window for window in windows if window]
+
+
+def chunk_markdown(text: str, source: str, page: Optional[int] = None,
+                   max_chars: int = 1500, overlap: int = 200) -> List[Dict[str, Any]]:
+    """
+    Split a markdown document into chunks along headings and paragraphs.
+
+    Paragraphs are packed together up to max_chars; a single paragraph longer
+    than max_chars (e.g. a flattened table) is split into overlapping windows.
+
+    Args:
+        text (str): Markdown content
+        source (str): Source file name recorded on every chunk
+        page (int, optional): Page number recorded on every chunk
+        max_chars (int): Maximum characters per chunk
+        overlap (int): Overlap between windows of an oversized paragraph
+
+    Returns:
+        List[Dict]: Chunks with 'id', 'source', 'page' and 'text'
+    """
+    paragraphs = [part.strip() for part in re.split(r'\n\s*\n|\n(?=#{1,6} )', text) if part.strip()]
+
+    pieces = []
+    current = ""
+    for paragraph in paragraphs:
+        if len(paragraph) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.extend(split_long_text(paragraph, max_chars, overlap))
+        elif current and len(current) + len(paragraph) + 2 > max_chars:
+            pieces.append(current)
+            current = paragraph
+        else:
+            current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        pieces.append(current)
+
+    return [
+        {
+            'id': f"{source}#{index}",
+            'source': source,
+            'page': page,
+            'text': piece
+        }
+        for index, piece in enumerate(pieces)
+    ]
+
+
+def load_parsed_reports(directory: str, pattern: str = "*.md", skip_errors: bool = True,
+                        max_chars: int = 1500, overlap: int = 200) -> List[Dict[str, Any]]:
+    """
+    Chunk every markdown file of a parsed-report directory.
+
+    Args:
+        directory (str): Directory containing parsed markdown files
+        pattern (str): Glob pattern for the files to include
+        skip_errors (bool): Skip pages whose content is an LLM error message
+        max_chars (int): Maximum characters per chunk
+        overlap (int): Overlap between windows of an oversized paragraph
+
+    Returns:
+        List[Dict]: Chunks of all files, in file name order
+    """
+    chunks = []
+    for file_path in sorted(Path(directory).glob(pattern)):
+        text = file_path.read_text(encoding='utf-8')
+        if skip_errors and text.lstrip().startswith("Error"):
+            continue
+        chunks.extend(chunk_markdown(text, file_path.name, page_from_filename(file_path.name),
+                                     max_chars, overlap))
+    return chunks
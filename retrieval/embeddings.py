@@ -0,0 +1,69 @@
+"""
+Optional local embedding backend
+Uses sentence-transformers when installed; retrieval falls back to BM25 only otherwise
+"""
+
+import math
+from typing import List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+try:
+    from sentence_transformers import SentenceTransformer
+except ImportError:
+    SentenceTransformer = None
+
+# Multilingual model so English requirements match French report text
+DEFAULT_EMBEDDING_MODEL = "paraphrase-multilingual-MiniLM-L12-v2"
+
+
+def embeddings_available() -> bool:
+    """
+    Check whether the optional sentence-transformers dependency is installed
+    """
+    return SentenceTransformer is not None
+
+
+class EmbeddingBackend:
+    """
+    Local sentence embedding model producing L2-normalized vectors
+    """
+
+    def __init__(self, model_name: str = DEFAULT_EMBEDDING_MODEL, device: Optional[str] = None):
+        """
+        Load the embedding model
+
+        Args:
+            model_name: sentence-transformers model name or local path
+            device: Torch device ("cpu", "cuda", ...), auto-selected when None
+        """
+        if SentenceTransformer is None:
+            raise ImportError("sentence-transformers is required for embeddings: pip install sentence-transformers")
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name, device=device)
+        logger.info(f"Loaded embedding model {model_name}")
+
+    def encode(self, texts: List[str], batch_size: int = 32) -> List[List[float]]:
+        """
+        Embed texts
+
+        Args:
+            texts: Texts to embed
+            batch_size: Encoding batch size
+
+        Returns:
+            One normalized vector per text
+        """
+        vectors = self.model.encode(texts, batch_size=batch_size, normalize_embeddings=True,
+                                    show_progress_bar=False)
+        return [list(map(float, vector)) for vector in vectors]
+
+
+def cosine_similarity(a: List[float], b: List[float]) -> float:
+    """
+    Cosine similarity of two vectors
+    """
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
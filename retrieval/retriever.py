@@ -0,0 +1,245 @@
+"""
+Report retriever
+Selects the report chunks most relevant to a requirement so the conformity
+checkers send a few pages of context instead of the whole report
+"""
+
+import os
+import json
+import hashlib
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Union
+import logging
+
+from .chunker import load_parsed_reports
+from .bm25 import BM25Index
+from .embeddings import EmbeddingBackend, cosine_similarity
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+
+# Requirement row fields used to build the retrieval query, most specific first
+QUERY_FIELDS = ['TOPIC', 'METRIC', 'CATEGORY', 'UNIT OF MEASURE', 'CODE']
+
+
+def requirement_to_query(requirement: Union[str, Dict[str, Any]]) -> str:
+    """
+    Build a retrieval query from a requirement.
+
+    Args:
+        requirement (Union[str, Dict]): Requirement text, or a requirement row with
+            TOPIC / METRIC / CATEGORY / UNIT OF MEASURE / CODE fields (any case)
+
+    Returns:
+        str: Query text
+    """
+    if isinstance(requirement, dict):
+        fields = {str(key).upper(): value for key, value in requirement.items()}
+        return " ".join(str(fields[name]) for name in QUERY_FIELDS if fields.get(name))
+    return str(requirement)
+
+
+def fingerprint_directory(directory: str, pattern: str = "*.md") -> str:
+    """
+    Fingerprint the files of a directory by name, size and modification time.
+
+    Args:
+        directory (str): Directory to fingerprint
+        pattern (str): Glob pattern for the files to include
+
+    Returns:
+        str: Hex digest that changes whenever a file is added, removed or modified
+    """
+    digest = hashlib.sha256()
+    for file_path in sorted(Path(directory).glob(pattern)):
+        stat = file_path.stat()
+        digest.update(f"{file_path.name}:{stat.st_size}:{stat.st_mtime_ns}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+class ReportRetriever:
+    """
+    Hybrid BM25 / embedding retriever over chunks of parsed report pages
+    """
+
+    def __init__(self, chunks: List[Dict[str, Any]], bm25: Optional[BM25Index] = None,
+                 embedding_backend: Optional[EmbeddingBackend] = None,
+                 embeddings: Optional[List[List[float]]] = None, embedding_weight: float = 0.5):
+        """
+        Create a retriever over chunks, building the indexes that are not supplied
+
+        Args:
+            chunks: Chunks produced by retrieval.chunker
+            bm25: Prebuilt BM25 index over the chunk texts
+            embedding_backend: Optional embedding model for semantic scoring
+            embeddings: Precomputed chunk embeddings matching embedding_backend
+            embedding_weight: Share of the embedding score in the hybrid score (0-1)
+        """
+        self.chunks = chunks
+        self.bm25 = bm25 or BM25Index().build([chunk['text'] for chunk in chunks])
+        self.embedding_backend = embedding_backend
+        self.embedding_weight = embedding_weight
+        self.embeddings = embeddings
+        if embedding_backend is not None and embeddings is None:
+            self.embeddings = embedding_backend.encode([chunk['text'] for chunk in chunks])
+
+    @classmethod
+    def from_directory(cls, directory: str, index_path: Optional[str] = None,
+                       embedding_backend: Optional[EmbeddingBackend] = None,
+                       **chunk_options) -> "ReportRetriever":
+        """
+        Load the persisted index of a parsed-report directory, rebuilding it when
+        the markdown files changed since it was written.
+
+        Args:
+            directory (str): Directory containing parsed markdown pages
+            index_path (str, optional): Index file (default: <directory>/.retrieval_index.json)
+            embedding_backend (EmbeddingBackend, optional): Enables hybrid scoring
+            **chunk_options: max_chars / overlap passed to the chunker
+
+        Returns:
+            ReportRetriever: Retriever ready for queries
+        """
+        index_path = Path(index_path or os.path.join(directory, ".retrieval_index.json"))
+        fingerprint = fingerprint_directory(directory)
+        embedding_model = embedding_backend.model_name if embedding_backend else None
+
+        if index_path.exists():
+            try:
+                with open(index_path, 'r', encoding='utf-8') as file:
+                    data = json.load(file)
+                if (data.get('version') == INDEX_VERSION and data.get('fingerprint') == fingerprint
+                        and data.get('chunk_options') == chunk_options
+                        and (embedding_model is None or data.get('embedding_model') == embedding_model)):
+                    logger.info(f"Loaded retrieval index {index_path} ({len(data['chunks'])} chunks)")
+                    return cls(data['chunks'], BM25Index.from_dict(data['bm25']), embedding_backend,
+                               data.get('embeddings') if embedding_model else None)
+            except (OSError, json.JSONDecodeError, KeyError) as e:
+                logger.warning(f"Ignoring unreadable retrieval index {index_path}: {e}")
+
+        chunks = load_parsed_reports(directory, **chunk_options)
+        retriever = cls(chunks, embedding_backend=embedding_backend)
+        retriever.save(index_path, fingerprint, chunk_options)
+        logger.info(f"Built retrieval index {index_path} ({len(chunks)} chunks)")
+        return retriever
+
+    def save(self, index_path, fingerprint: str = "", chunk_options: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Persist chunks, BM25 postings and embeddings to a JSON file
+
+        Args:
+            index_path: Destination file
+            fingerprint: Fingerprint of the source directory
+            chunk_options: Chunker options used to build the chunks
+        """
+        index_path = Path(index_path)
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            'version': INDEX_VERSION,
+            'fingerprint': fingerprint,
+            'chunk_options': chunk_options or {},
+            'chunks': self.chunks,
+            'bm25': self.bm25.to_dict(),
+            'embedding_model': self.embedding_backend.model_name if self.embedding_backend else None,
+            'embeddings': self.embeddings
+        }
+        temp_path = index_path.with_name(index_path.name + ".tmp")
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump(data, file, ensure_ascii=False)
+        os.replace(temp_path, index_path)
+
+    def retrieve(self, requirement: Union[str, Dict[str, Any]], top_k: int = 8) -> List[Dict[str, Any]]:
+        """
+        Select the chunks most relevant to a requirement
+
+        Args:
+            requirement: Requirement text or requirement row
+            top_k: Number of chunks to return
+
+        Returns:
+            Chunks with an added 'score', best first
+        """
+        query = requirement_to_query(requirement)
+        if not self.chunks or not query.strip():
+            return []
+
+        if self.embedding_backend is None or not self.embeddings:
+            ranked = self.bm25.search(query, top_k)
+        else:
+            # Hybrid: max-normalized BM25 blended with cosine similarity over all chunks
+            lexical = dict(self.bm25.search(query, len(self.chunks)))
+            best_lexical = max(lexical.values(), default=0.0) or 1.0
+            query_vector = self.embedding_backend.encode([query])[0]
+            scores = {
+                doc_id: (1 - self.embedding_weight) * lexical.get(doc_id, 0.0) / best_lexical
+                + self.embedding_weight * cosine_similarity(query_vector, vector)
+                for doc_id, vector in enumerate(self.embeddings)
+            }
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+        return [dict(self.chunks[doc_id], score=round(score, 4)) for doc_id, score in ranked]
+
+    def retrieve_many(self, requirements: List[Union[str, Dict[str, Any]]], top_k: int = 8) -> List[Dict[str, Any]]:
+        """
+        Union of the top chunks of several requirements, each chunk kept once
+
+        Args:
+            requirements: Requirement texts or rows
+            top_k: Number of chunks per requirement
+
+        Returns:
+            Unique chunks, keeping their best score
+        """
+        best: Dict[str, Dict[str, Any]] = {}
+        for requirement in requirements:
+            for chunk in self.retrieve(requirement, top_k):
+                if chunk['id'] not in best or chunk['score'] > best[chunk['id']]['score']:
+                    best[chunk['id']] = chunk
+        return list(best.values())
+
+    @staticmethod
+    def format_context(chunks: List[Dict[str, Any]]) -> str:
+        """
+        Format chunks for a prompt in page order, each headed by its source and page
+        so the LLM can fill the Page column
+
+        Args:
+            chunks: Chunks to include
+
+        Returns:
+            Context text
+        """
+        chunks = sorted(chunks, key=lambda chunk: (chunk['source'], chunk['page'] or 0))
+
+        sections = []
+        for chunk in chunks:
+            page = f"Page {chunk['page']}" if chunk['page'] is not None else "Page unknown"
+            sections.append(f"[{page} | {chunk['source']}]\n{chunk['text']}")
+        return "\n\n---\n\n".join(sections)
+
+    def build_context(self, requirement: Union[str, Dict[str, Any]], top_k: int = 8) -> str:
+        """
+        Format the top chunks of a requirement for a prompt
+
+        Args:
+            requirement: Requirement text or requirement row
+            top_k: Number of chunks to include
+
+        Returns:
+            Context text, in page order
+        """
+        return self.format_context(self.retrieve(requirement, top_k))
+
+    def build_group_context(self, requirements: List[Union[str, Dict[str, Any]]], top_k: int = 8) -> str:
+        """
+        Format the union of the top chunks of several requirements for one prompt
+
+        Args:
+            requirements: Requirement texts or rows
+            top_k: Number of chunks per requirement
+
+        Returns:
+            Context text, in page order
+        """
+        return self.format_context(self.retrieve_many(requirements, top_k))
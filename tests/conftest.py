@@ -0,0 +1,9 @@
+"""
+Shared pytest setup: make the project packages importable from the tests
+"""
+
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(project_root))
@@ -0,0 +1,101 @@
+"""
+Conversion manifest: resume state and relative output paths
+"""
+
+import json
+import shutil
+
+import pytest
+
+from pdf_image.manifest import ConversionManifest
+
+SETTINGS = {"dpi": 150, "format": "png"}
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    path = tmp_path / "report.pdf"
+    path.write_bytes(b"%PDF-1.4 fake report")
+    return path
+
+
+def convert_page(output_dir, page_num, content=b"image"):
+    output_dir.mkdir(parents=True, exist_ok=True)
+    path = output_dir / f"page_{page_num:03d}.png"
+    path.write_bytes(content)
+    return path
+
+
+def test_round_trip(tmp_path, pdf):
+    output_dir = tmp_path / "out"
+    manifest = ConversionManifest(output_dir / "manifest.json", pdf, SETTINGS)
+    manifest.set_page_count(3)
+    manifest.mark_done(1, convert_page(output_dir, 1), 0.5)
+    manifest.mark_failed(2, "render error", 0.1)
+
+    reloaded = ConversionManifest(output_dir / "manifest.json", pdf, SETTINGS)
+    assert reloaded.data["page_count"] == 3
+    assert reloaded.is_done(1)
+    assert reloaded.data["pages"]["2"]["error"] == "render error"
+    assert reloaded.pending_pages([1, 2, 3]) == [2, 3]
+    assert reloaded.get_output(1) == output_dir / "page_001.png"
+
+
+def test_output_paths_are_relative_to_the_manifest(tmp_path, pdf, monkeypatch):
+    output_dir = tmp_path / "out"
+    convert_page(output_dir, 1)
+    manifest = ConversionManifest(output_dir / "manifest.json", pdf, SETTINGS)
+    monkeypatch.chdir(tmp_path)
+    manifest.mark_done(1, "out/page_001.png", 0.5)
+
+    stored = json.loads((output_dir / "manifest.json").read_text(encoding="utf-8"))
+    assert stored["pages"]["1"]["output"] == "page_001.png"
+
+    # Moving the output folder and running from elsewhere keeps the page done
+    moved_dir = tmp_path / "moved"
+    shutil.move(str(output_dir), str(moved_dir))
+    monkeypatch.chdir(moved_dir)
+    reloaded = ConversionManifest(moved_dir / "manifest.json", pdf, SETTINGS)
+    assert reloaded.is_done(1)
+    assert reloaded.get_output(1) == moved_dir / "page_001.png"
+
+
+def test_changed_output_is_redone(tmp_path, pdf):
+    output_dir = tmp_path / "out"
+    manifest = ConversionManifest(output_dir / "manifest.json", pdf, SETTINGS)
+    page = convert_page(output_dir, 1)
+    manifest.mark_done(1, page, 0.5)
+
+    page.write_bytes(b"truncated")
+    assert not manifest.is_done(1)
+    page.unlink()
+    assert not manifest.is_done(1)
+
+
+def test_changed_pdf_or_settings_reset_the_pages(tmp_path, pdf):
+    output_dir = tmp_path / "out"
+    manifest = ConversionManifest(output_dir / "manifest.json", pdf, SETTINGS)
+    manifest.mark_done(1, convert_page(output_dir, 1), 0.5)
+
+    assert ConversionManifest(output_dir / "manifest.json", pdf, dict(SETTINGS, dpi=300)).data["pages"] == {}
+
+    pdf.write_bytes(b"%PDF-1.4 new edition")
+    assert ConversionManifest(output_dir / "manifest.json", pdf, SETTINGS).data["pages"] == {}
+
+
+def test_unreadable_manifest_starts_over(tmp_path, pdf):
+    manifest_path = tmp_path / "manifest.json"
+    manifest_path.write_text("{not json", encoding="utf-8")
+
+    assert ConversionManifest(manifest_path, pdf, SETTINGS).data["pages"] == {}
+
+
+def test_skipped_pages_are_neither_done_nor_redetected(tmp_path, pdf):
+    manifest_path = tmp_path / "out" / "report.manifest.json"
+    manifest = ConversionManifest(manifest_path, pdf, SETTINGS)
+    manifest.mark_skipped(3, "no table")
+
+    reloaded = ConversionManifest(manifest_path, pdf, SETTINGS)
+    assert reloaded.is_skipped(3)
+    assert not reloaded.is_done(3)
+    assert not reloaded.is_skipped(4)
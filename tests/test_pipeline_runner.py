@@ -0,0 +1,112 @@
+"""
+PipelineRunner: linear stages, fan-out / join and error propagation
+"""
+
+import threading
+
+import pytest
+
+from pipeline import PipelineRunner
+
+
+def by_key(results):
+    return {task.key: task for task in results}
+
+
+def test_linear_stages_process_every_item():
+    runner = PipelineRunner()
+    runner.add_stage("double", lambda value: value * 2, workers=3, queue_size=2)
+    runner.add_stage("label", lambda value: f"page {value}", after=["double"])
+
+    results = runner.run(range(10))
+
+    assert sorted(task.payload for task in results) == sorted(f"page {value * 2}" for value in range(10))
+    assert runner.stats()["stages"]["double"]["processed"] == 10
+    assert all("double" in task.timings and "label" in task.timings for task in results)
+
+
+def test_fan_out_and_join_gather_children_in_order():
+    joined = []
+    lock = threading.Lock()
+
+    def join(document, pages):
+        with lock:
+            joined.append(document)
+        return f"{document}: " + "|".join(pages)
+
+    runner = PipelineRunner()
+    runner.add_stage("split", lambda document: [f"{document}-p{page}" for page in range(1, 4)], fan_out=True)
+    runner.add_stage("parse", str.upper, workers=4, after=["split"])
+    runner.add_stage("merge", join, after=["parse"], join=True)
+
+    results = by_key(runner.run(["a", "b"]))
+
+    assert results["a"].payload == "a: A-P1|A-P2|A-P3"
+    assert results["b"].payload == "b: B-P1|B-P2|B-P3"
+    assert sorted(joined) == ["a", "b"]
+    assert runner.stats()["stages"]["parse"]["processed"] == 6
+
+
+def test_empty_fan_out_still_reaches_the_join():
+    runner = PipelineRunner()
+    runner.add_stage("split", lambda document: [] if document == "empty" else [document], fan_out=True)
+    runner.add_stage("parse", str.upper, after=["split"])
+    runner.add_stage("merge", lambda document, pages: (document, pages), after=["parse"], join=True)
+
+    results = by_key(runner.run(["empty", "full"]))
+
+    assert results["empty"].payload == ("empty", [])
+    assert results["empty"].error is None
+    assert results["full"].payload == ("full", ["FULL"])
+    assert runner.stats()["stages"]["parse"]["processed"] == 1
+
+
+def test_failed_stage_is_carried_to_the_end():
+    def parse(page):
+        if page.endswith("p2"):
+            raise ValueError("unreadable page")
+        return page.upper()
+
+    runner = PipelineRunner()
+    runner.add_stage("split", lambda document: [f"{document}-p1", f"{document}-p2"], fan_out=True)
+    runner.add_stage("parse", parse, after=["split"])
+    runner.add_stage("merge", lambda document, pages: pages, after=["parse"], join=True)
+
+    [result] = runner.run(["doc"])
+
+    # The join still completes, without the failed page
+    assert result.payload == ["DOC-P1"]
+    assert result.error is None
+    assert runner.stats()["stages"]["parse"]["errors"] == 1
+
+
+def test_join_fails_when_every_child_failed():
+    def parse(page):
+        raise ValueError("LLM down")
+
+    downstream = []
+    runner = PipelineRunner()
+    runner.add_stage("split", lambda document: [1, 2], fan_out=True)
+    runner.add_stage("parse", parse, after=["split"])
+    runner.add_stage("merge", lambda document, pages: pages, after=["parse"], join=True)
+    runner.add_stage("report", downstream.append, after=["merge"])
+
+    [result] = runner.run(["doc"])
+
+    assert result.error == "parse: LLM down"
+    assert downstream == []
+
+
+def test_invalid_graphs_are_rejected():
+    runner = PipelineRunner()
+    with pytest.raises(ValueError):
+        runner.run([1])
+
+    runner.add_stage("a", str)
+    runner.add_stage("b", str)
+    with pytest.raises(ValueError):
+        runner.add_stage("a", str)
+    with pytest.raises(ValueError):
+        runner.add_stage("c", str, after=["missing"])
+    with pytest.raises(ValueError):
+        runner.add_stage("join", lambda parent, children: children, after=["a", "b"], join=True)
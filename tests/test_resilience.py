@@ -0,0 +1,126 @@
+"""
+Retry backoff, retry classification and the token bucket rate limiter
+"""
+
+import httpx
+import openai
+import pytest
+
+from client import resilience
+from client.resilience import RetryPolicy, TokenBucket, call_with_retries
+
+
+class Clock:
+    """Manual replacement for time.monotonic"""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(resilience.time, "monotonic", clock)
+    return clock
+
+
+def status_error(status_code, headers=None):
+    request = httpx.Request("POST", "http://llm.test/v1/chat/completions")
+    response = httpx.Response(status_code, headers=headers, request=request)
+    return openai.APIStatusError(f"HTTP {status_code}", response=response, body=None)
+
+
+def test_backoff_grows_exponentially_up_to_max_delay(monkeypatch):
+    monkeypatch.setattr(resilience.random, "uniform", lambda low, high: high)
+    policy = RetryPolicy(max_retries=5, base_delay=0.5, max_delay=3.0)
+
+    assert [policy.delay(attempt) for attempt in range(5)] == [0.5, 1.0, 2.0, 3.0, 3.0]
+
+
+def test_backoff_uses_full_jitter():
+    policy = RetryPolicy(base_delay=1.0, max_delay=30.0)
+
+    delays = [policy.delay(2) for _ in range(200)]
+    assert all(0.0 <= delay <= 4.0 for delay in delays)
+    assert len(set(delays)) > 1
+
+
+def test_retry_after_is_a_capped_minimum():
+    policy = RetryPolicy(base_delay=0.1, max_delay=5.0)
+
+    assert policy.delay(0, retry_after=2.0) >= 2.0
+    assert policy.delay(0, retry_after=60.0) == 5.0
+    assert resilience.retry_after_seconds(status_error(429, {"retry-after": "7"})) == 7.0
+
+
+def test_error_classification():
+    assert resilience.is_retryable(status_error(503))
+    assert resilience.is_retryable(status_error(429))
+    assert not resilience.is_retryable(status_error(400))
+    assert not resilience.is_retryable(ValueError("bad prompt"))
+    assert resilience.is_overload(status_error(429))
+    assert not resilience.is_overload(status_error(500))
+
+
+def test_call_with_retries_retries_transient_errors(monkeypatch):
+    monkeypatch.setattr(resilience.time, "sleep", lambda seconds: None)
+    failures = [status_error(503), status_error(502)]
+
+    def request():
+        if failures:
+            raise failures.pop(0)
+        return "ok"
+
+    retries = []
+    result = call_with_retries(request, RetryPolicy(max_retries=3),
+                               on_retry=lambda error, delay: retries.append(error.status_code))
+    assert result == "ok"
+    assert retries == [503, 502]
+
+
+def test_call_with_retries_stops_on_fatal_errors_and_exhaustion(monkeypatch):
+    monkeypatch.setattr(resilience.time, "sleep", lambda seconds: None)
+    calls = []
+
+    def failing(status_code):
+        def request():
+            calls.append(status_code)
+            raise status_error(status_code)
+        return request
+
+    with pytest.raises(openai.APIStatusError):
+        call_with_retries(failing(401), RetryPolicy(max_retries=3))
+    assert calls == [401]
+
+    with pytest.raises(openai.APIStatusError):
+        call_with_retries(failing(503), RetryPolicy(max_retries=2))
+    assert calls == [401, 503, 503, 503]
+
+
+def test_token_bucket_allows_a_burst_then_refills(clock):
+    bucket = TokenBucket(rate=2.0, capacity=2)
+
+    assert bucket.try_acquire() == (True, 0.0)
+    assert bucket.try_acquire() == (True, 0.0)
+    acquired, wait = bucket.try_acquire()
+    assert not acquired
+    assert wait == pytest.approx(0.5)
+
+    clock.now += 0.5
+    assert bucket.try_acquire()[0]
+
+    # Idle time never stores more than the burst capacity
+    clock.now += 60
+    assert [bucket.try_acquire()[0] for _ in range(3)] == [True, True, False]
+
+
+def test_token_bucket_reserve_goes_into_debt(clock):
+    bucket = TokenBucket(rate=4.0)
+
+    assert [bucket.reserve() for _ in range(4)] == [0.0, 0.0, 0.0, 0.0]
+    assert bucket.reserve() == pytest.approx(0.25)
+    assert bucket.reserve() == pytest.approx(0.5)
+    assert bucket.try_acquire()[0] is False
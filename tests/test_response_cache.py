@@ -0,0 +1,98 @@
+"""
+SQLite response cache: keys, TTL expiry and LRU eviction
+"""
+
+import json
+
+import pytest
+
+from client import response_cache
+from client.response_cache import ResponseCache, make_cache_key
+
+MESSAGES = [{"role": "user", "content": "Extract the financed emissions"}]
+
+
+class Clock:
+    """Manual replacement for time.time"""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(response_cache.time, "time", clock)
+    return clock
+
+
+def response(content):
+    return {"success": True, "content": content}
+
+
+def size_of(content):
+    return len(json.dumps(response(content), ensure_ascii=False).encode("utf-8"))
+
+
+def test_cache_key_covers_the_whole_request():
+    key = make_cache_key("model", MESSAGES, 0.1, 2000)
+
+    assert key == make_cache_key("model", [dict(MESSAGES[0])], 0.1, 2000)
+    assert key != make_cache_key("other", MESSAGES, 0.1, 2000)
+    assert key != make_cache_key("model", MESSAGES, 0.2, 2000)
+    assert key != make_cache_key("model", MESSAGES, 0.1, 1000)
+    assert key != make_cache_key("model", MESSAGES, 0.1, 2000, response_format={"type": "json_object"})
+
+
+def test_entries_expire_after_the_ttl(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), ttl=60)
+    cache.put("key", response("1 430,43"))
+
+    clock.now += 59
+    assert cache.get("key") == response("1 430,43")
+
+    clock.now += 2
+    assert cache.get("key") is None
+    assert cache.stats()["entries"] == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_without_ttl_entries_never_expire(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), ttl=None)
+    cache.put("key", response("kept"))
+
+    clock.now += 365 * 24 * 3600
+    assert cache.get("key") == response("kept")
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_bytes=2 * size_of("aaaa"))
+    cache.put("a", response("aaaa"))
+    clock.now += 1
+    cache.put("b", response("bbbb"))
+    clock.now += 1
+    assert cache.get("a") is not None
+
+    clock.now += 1
+    cache.put("c", response("cccc"))
+
+    assert cache.get("b") is None
+    assert cache.get("a") == response("aaaa")
+    assert cache.get("c") == response("cccc")
+    assert cache.stats()["evictions"] == 1
+    assert cache.stats()["bytes"] <= cache.max_bytes
+
+
+def test_entries_survive_reopening(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path)
+    cache.put("key", response("persisted"))
+    cache.close()
+
+    reopened = ResponseCache(path)
+    assert reopened.get("key") == response("persisted")
+    reopened.clear()
+    assert reopened.get("key") is None
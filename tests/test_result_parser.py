@@ -0,0 +1,125 @@
+"""
+Parsing and repair of conformity check responses
+"""
+
+import pytest
+
+from agents.tt_exigence_1_page import result_parser
+from agents.tt_exigence_1_page.result_parser import (
+    ConformityParseError, normalize_number, parse_conformity_response, parse_csv_records, repair_response
+)
+from client.llm_client import create_client
+from llm_server.mock_server import MockLLMServer
+
+FULL_ROW = 'C1,Banks,Financed Emissions,Scope 1,FN-IN-410c.1,12,Table 3,"1 430,43",tCO2e,t CO2-e,TRUE'
+SHORT_ROW_WITH_PAGE = 'Financed Emissions,Scope 1,FN-IN-410c.1,p. 12,Table 3,3.5 millions,tCO2e,t CO2-e,Oui'
+SHORT_ROW = 'Financed Emissions,Scope 1,FN-IN-410c.1,Table 3,N/A,N/A,t CO2-e,FALSE'
+
+
+def test_parse_full_layout():
+    [record] = parse_csv_records(FULL_ROW)
+
+    assert record.cid == "C1"
+    assert record.code == "FN-IN-410c.1"
+    assert record.page == 12
+    assert record.value == "1 430,43"
+    assert record.value_number == pytest.approx(1430.43)
+    assert record.complete is True
+
+
+def test_parse_short_layout_with_page():
+    [record] = parse_csv_records(SHORT_ROW_WITH_PAGE)
+
+    assert record.cid == ""
+    assert record.topic == "Financed Emissions"
+    assert record.page == 12
+    assert record.value_number == pytest.approx(3.5e6)
+    assert record.complete is True
+
+
+def test_parse_short_layout():
+    [record] = parse_csv_records(SHORT_ROW)
+
+    assert record.page is None
+    assert record.fragment == "Table 3"
+    assert record.value_number is None
+    assert record.complete is False
+
+
+def test_header_row_names_the_columns():
+    [record] = parse_csv_records("CID,Code,Topic,Complete\nC9,FN-IN-410c.3,Financed Emissions,TRUE\n")
+
+    assert record.cid == "C9"
+    assert record.code == "FN-IN-410c.3"
+    assert record.topic == "Financed Emissions"
+
+
+def test_malformed_rows():
+    bad_columns = "Financed Emissions,Scope 1,FN-IN-410c.1"
+    bad_complete = FULL_ROW.replace("TRUE", "maybe")
+    bad_page = FULL_ROW.replace(",12,", ",twelve,")
+
+    for text in (bad_columns, bad_complete, bad_page):
+        with pytest.raises(ConformityParseError):
+            parse_csv_records(text)
+
+    assert parse_csv_records(bad_columns + "\n" + FULL_ROW, strict=False)[0].cid == "C1"
+    [lenient] = parse_csv_records(bad_complete, strict=False)
+    assert lenient.complete is None
+
+
+def test_parse_response_formats():
+    fenced = "```csv\n" + FULL_ROW + "\n```"
+    json_text = '{"records": [{"Code": "FN-IN-410c.4", "Value": "N/A", "Complete": "FALSE"}]}'
+
+    assert parse_conformity_response(fenced)[0].page == 12
+    assert parse_conformity_response(json_text)[0].code == "FN-IN-410c.4"
+    assert parse_conformity_response("  ") == []
+    assert parse_conformity_response("Error: timeout", strict=False) == []
+    with pytest.raises(ConformityParseError):
+        parse_conformity_response("Error: timeout")
+    with pytest.raises(ConformityParseError):
+        parse_conformity_response('{"records": [')
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("1 430,43", 1430.43),
+    ("3,472 millions", 3.472e6),
+    ("13,1 Md", 13.1e9),
+    ("2.5 bn", 2.5e9),
+    ("12 Mn", 12e6),
+    ("1,234.5", 1234.5),
+    ("1.234.567", 1234567),
+    ("-4,2 %", -4.2),
+    ("5m", 5e6),
+    ("5 M", 5e6),
+    ("100 m", 100),
+    ("5 m²", 5),
+    ("20 m3", 20),
+])
+def test_normalize_number(text, expected):
+    assert normalize_number(text) == pytest.approx(expected)
+
+
+def test_normalize_number_without_number():
+    assert normalize_number("") is None
+    assert normalize_number("N/A") is None
+    assert normalize_number("1,5", decimal_comma=False) == 15
+
+
+def test_repair_response_sends_only_the_broken_output():
+    broken = "Financed Emissions;Scope 1;FN-IN-410c.1"
+    with MockLLMServer(rules=[{"match": "OUTPUT TO FIX", "content": FULL_ROW}]) as server:
+        client = create_client(server.base_url, "mock", api_key="x")
+        repaired = repair_response(client, "mock", broken, "Unexpected number of columns (1)")
+
+    assert repaired == FULL_ROW
+    assert parse_conformity_response(repaired)[0].code == "FN-IN-410c.1"
+
+
+def test_repair_prompt_lists_the_columns():
+    prompt = result_parser.create_repair_prompt("bad", "Invalid Page value")
+
+    assert ",".join(result_parser.RESULT_COLUMNS) in prompt
+    assert "Invalid Page value" in prompt
+    assert prompt.rstrip().endswith("bad")
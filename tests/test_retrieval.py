@@ -0,0 +1,89 @@
+"""
+BM25 ranking and the persisted retrieval index
+"""
+
+import json
+import os
+
+from retrieval import BM25Index, ReportRetriever, tokenize
+
+DOCUMENTS = [
+    "Our financed emissions reached 12 Mt CO2e, split by Scope 1, Scope 2 and Scope 3.",
+    "La gouvernance du groupe repose sur un conseil d'administration indépendant.",
+    "Les émissions financées couvrent 85 % de l'exposition brute du portefeuille.",
+    "Employee headcount and training hours by region.",
+]
+
+
+def test_tokenize_normalizes_accents_plurals_and_stopwords():
+    assert tokenize("Les émissions financées") == ["emission", "financee"]
+    assert tokenize("The 2024 emissions") == ["2024", "emission"]
+
+
+def test_bm25_ranks_matching_documents_first():
+    index = BM25Index().build(DOCUMENTS)
+
+    ranked = [doc_id for doc_id, _ in index.search("financed emissions scope 3", top_k=4)]
+    assert ranked[0] == 0
+    assert 1 not in ranked and 3 not in ranked
+
+    # French query matches the English and French pages through accent and plural folding
+    assert {doc_id for doc_id, _ in index.search("émissions", top_k=4)} == {0, 2}
+
+
+def test_bm25_rare_terms_weigh_more():
+    index = BM25Index().build(["scope scope gouvernance", "scope", "scope", "scope"])
+
+    assert index.idf("gouvernance") > index.idf("scope")
+    assert index.search("scope gouvernance", top_k=1)[0][0] == 0
+
+
+def test_bm25_round_trip(tmp_path):
+    index = BM25Index(k1=1.2, b=0.5).build(DOCUMENTS)
+    path = tmp_path / "bm25.json"
+    index.save(path)
+
+    restored = BM25Index.load(path)
+    assert (restored.k1, restored.b) == (1.2, 0.5)
+    assert restored.search("exposition brute") == index.search("exposition brute")
+
+
+def write_pages(directory):
+    directory.mkdir()
+    for number, text in enumerate(DOCUMENTS, start=1):
+        (directory / f"report_page_{number:03d}.md").write_text(f"# Page {number}\n\n{text}\n", encoding="utf-8")
+
+
+def test_index_is_reused_until_the_pages_change(tmp_path):
+    pages = tmp_path / "parsed"
+    write_pages(pages)
+    index_path = pages / ".retrieval_index.json"
+
+    first = ReportRetriever.from_directory(str(pages))
+    assert first.retrieve("headcount", top_k=1)[0]["page"] == 4
+    fingerprint = json.loads(index_path.read_text(encoding="utf-8"))["fingerprint"]
+
+    # Unchanged pages: the persisted index is loaded as is
+    ReportRetriever.from_directory(str(pages))
+    assert json.loads(index_path.read_text(encoding="utf-8"))["fingerprint"] == fingerprint
+
+    page = pages / "report_page_004.md"
+    page.write_text("# Page 4\n\nBiodiversity commitments and deforestation policy.\n", encoding="utf-8")
+    stat = page.stat()
+    os.utime(page, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    rebuilt = ReportRetriever.from_directory(str(pages))
+    assert json.loads(index_path.read_text(encoding="utf-8"))["fingerprint"] != fingerprint
+    assert rebuilt.retrieve("headcount") == []
+    assert rebuilt.retrieve("deforestation", top_k=1)[0]["page"] == 4
+
+
+def test_index_is_rebuilt_when_chunk_options_change(tmp_path):
+    pages = tmp_path / "parsed"
+    write_pages(pages)
+
+    ReportRetriever.from_directory(str(pages))
+    ReportRetriever.from_directory(str(pages), max_chars=40, overlap=10)
+
+    data = json.loads((pages / ".retrieval_index.json").read_text(encoding="utf-8"))
+    assert data["chunk_options"] == {"max_chars": 40, "overlap": 10}
@@ -0,0 +1,54 @@
+"""
+Response caching of streamed completions stopped early by a stop condition
+"""
+
+import pytest
+
+from client import llm_client
+from llm_server.mock_server import MockLLMServer
+
+MESSAGES = [{"role": "user", "content": "Does this page contain tables?"}]
+
+
+def answered_yes_no(text: str) -> bool:
+    return text.strip().upper().startswith(("YES", "NO"))
+
+
+@pytest.fixture
+def server():
+    with MockLLMServer(rules=[{"match": "tables", "content": "YES. The page holds a table of emissions by scope."}]) as mock:
+        yield mock
+
+
+@pytest.fixture
+def cache(tmp_path):
+    yield llm_client.enable_response_cache(str(tmp_path / "responses.sqlite"))
+    llm_client.disable_response_cache()
+
+
+def test_stopped_stream_is_cached(server, cache):
+    client = llm_client.create_client(server.base_url, "mock", api_key="x")
+
+    first = llm_client.stream_chat_completion(client, "mock", MESSAGES, temperature=0.0,
+                                              stop_condition=answered_yes_no)
+    second = llm_client.stream_chat_completion(client, "mock", MESSAGES, temperature=0.0,
+                                               stop_condition=answered_yes_no)
+
+    assert first["finish_reason"] == "stop_condition"
+    assert first["content"].startswith("YES")
+    assert second.get("cached") is True
+    assert second["content"] == first["content"]
+    assert server.stats["requests"] == 1
+
+
+def test_stopped_response_not_served_without_stop_condition(server, cache):
+    client = llm_client.create_client(server.base_url, "mock", api_key="x")
+
+    stopped = llm_client.stream_chat_completion(client, "mock", MESSAGES, temperature=0.0,
+                                                stop_condition=answered_yes_no)
+    full = llm_client.stream_chat_completion(client, "mock", MESSAGES, temperature=0.0)
+
+    assert full.get("cached") is not True
+    assert full["content"] == "YES. The page holds a table of emissions by scope."
+    assert len(stopped["content"]) < len(full["content"])
+    assert server.stats["requests"] == 2